@@ -8,6 +8,13 @@ st.set_page_config(
 from datetime import datetime
 import time 
 import os
+from services.metrics import span, start_exporter
+from services.warmup import start_warm_up
+
+# Preload shared caches and deferred imports in the background, once per server process
+start_warm_up()
+# Export the performance metrics (Data/metrics/app.prom, and over HTTP when METRICS_PORT is set)
+start_exporter()
 
 col1, col2 = st.columns([1, 9], vertical_alignment="bottom")
 with col1:
@@ -41,12 +48,16 @@ pages = {
         st.Page("pages/revenue_calculator.py", title="Revenue Calculator", icon="💵"),
     ],
     "Download Stock Data": [
-        st.Page("pages/stock_data.py", title="Download Stock Data", icon="⬇️")]
+        st.Page("pages/stock_data.py", title="Download Stock Data", icon="⬇️")],
+    "Performance": [
+        st.Page("pages/performance.py", title="Performance", icon="⏱️")]
    
 }
 
 pg = st.navigation(pages)
-pg.run()
+# Time every page run for the Performance page
+with span('page_run', page=pg.title):
+    pg.run()
 
 def save_text_to_file(text):
     with open("Insights.txt", "a") as file:
@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 from datetime import date
 import plotly.graph_objs as go
+from services.price_store import get_price_matrix
+from services.charts import line_trace
+from services.metrics import span
+from services.return_index import get_return_index
+from services.ticker_universe import get_universe
 
 def add_arrow_marks(fig, data, percent_change, threshold):
     # Add up arrows for rapid stock increases
@@ -17,19 +21,20 @@ def add_arrow_marks(fig, data, percent_change, threshold):
 
 # Define function to compare multiple stocks
 def compare_stocks(tickers, start_date, end_date, threshold):
-    data = pd.DataFrame()
-    for ticker in tickers:
-        stock_data = yf.download(ticker, start=start_date, end=end_date)['Close']
-        data[ticker] = stock_data
+    data = get_price_matrix(tickers, start_date, end_date, 'Close')
+    for ticker, error in data.attrs.get('failed', {}).items():
+        st.warning(f"Prices for {ticker} could not be downloaded: {error}")
 
-    # Calculate percentage change in closing prices for the entire data
-    percent_change = data.pct_change() * 100
+    # Calculate percentage change in closing prices for the entire data, per ticker from its return index
+    percent_change = pd.DataFrame({
+        ticker: get_return_index(ticker).daily_returns(start_date, end_date) * 100 for ticker in tickers
+    }).reindex(data.index)
 
     fig = go.Figure()
 
     # Add line traces for each stock
     for ticker in tickers:
-        fig.add_trace(go.Scatter(x=data.index, y=data[ticker], mode='lines', name=ticker))
+        fig.add_trace(line_trace(data.index, data[ticker], name=ticker))
 
         # Add arrow marks for rapid stock changes for each stock
         add_arrow_marks(fig, data[ticker], percent_change[ticker], threshold)
@@ -40,12 +45,13 @@ def compare_stocks(tickers, start_date, end_date, threshold):
     fig.update_layout(legend=dict(orientation='h', yanchor='top', y=-0.2))
 
     # Display plot
-    st.plotly_chart(fig)
+    with span('chart_render', page='comparison'):
+        st.plotly_chart(fig)
 st.subheader("Stock Price Comparison")
-stock_ticker_file = 'Tickers\Stock_Tickers'
-stock_list = pd.read_csv(stock_ticker_file).squeeze().tolist()
+universe = get_universe()
+stock_list = universe.symbols
 
-user_input = st.multiselect('Select stocks to analyze', stock_list,  default=['GOOGL', 'AMZN'])
+user_input = st.multiselect('Select stocks to analyze', stock_list,  default=['GOOGL', 'AMZN'], format_func=universe.label)
 # Add date input widgets for start and end dates
 today = date.today()
 col1,col2 = st.columns(2)
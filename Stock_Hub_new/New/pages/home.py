@@ -1,18 +1,30 @@
 import streamlit as st
-import yfinance as yf
-import pandas as pd
 import math
+from services.company_profiles import get_profiles, prefetch_profiles
+from services.ticker_universe import get_universe, record_profiles
+from services.ticker_report import REPORT_DATASETS, REPORT_SECTIONS, get_sections
 
-ticker_list = pd.read_csv('Tickers\Stock_Tickers').squeeze().tolist()
+universe = get_universe()
+ticker_list = universe.symbols
 
 tab1, tab2= st.tabs(["Company Insights", "Ticker Insights Report"])
 with tab1:
+    col1, col2 = st.columns(2, gap="large")
+    with col1:
+        selected_sectors = st.multiselect('Filter by sector', universe.sectors())
+    with col2:
+        search_query = st.text_input('Search by symbol or company name')
+    sector_tickers = universe.filter(selected_sectors)
+    if search_query:
+        matches = set(universe.search(search_query, limit=len(ticker_list)))
+        sector_tickers = [ticker for ticker in sector_tickers if ticker in matches]
+
     col1, col2, col3,col4 = st.columns([3, 1, 1, 1],gap="large")
     with col1:
-        selected_tickers = st.multiselect('Search and Select Stock Ticker(s)', ticker_list)
+        selected_tickers = st.multiselect('Search and Select Stock Ticker(s)', sector_tickers, format_func=universe.label)
 
     if len(selected_tickers) == 0:
-        selected_tickers = ticker_list
+        selected_tickers = sector_tickers
 
     tickers_per_page = 9
     total_pages = math.ceil(len(selected_tickers) / tickers_per_page)
@@ -38,26 +50,32 @@ with tab1:
     end_index = start_index + tickers_per_page
     current_tickers = selected_tickers[start_index:end_index]
 
+    # Fetch the whole page of profiles at once and warm the cache for the next page
+    profiles = get_profiles(current_tickers)
+    prefetch_profiles(selected_tickers[end_index:end_index + tickers_per_page])
+    # Profiles of tickers without metadata yet fill in the sector filter as pages are browsed
+    record_profiles({ticker: profile for ticker, profile in profiles.items() if not universe.metadata.get(ticker)})
+
     for i in range(0, len(current_tickers), 3):
         cols = st.columns(3)
         for j in range(3):
             if i + j < len(current_tickers):
                 tickerSymbol = current_tickers[i + j]
-                tickerData = yf.Ticker(tickerSymbol)
-                string_name = tickerData.info.get('longName')
-                symbol = tickerData.info.get('symbol')
-                address1 = tickerData.info.get('address1')
-                city = tickerData.info.get('city')
-                state = tickerData.info.get('state')
-                country = tickerData.info.get('country')
-                industry = tickerData.info.get('industry')
-                sector = tickerData.info.get('sector')
-                previousClose = str(tickerData.info.get('previousClose'))
-                exchange = str(tickerData.info.get('exchange'))
-                full_time_employees = str(tickerData.info.get('fullTimeEmployees'))
-                website = tickerData.info.get('website')
-                longBusinessSummary = tickerData.info.get('longBusinessSummary')
-                companyOfficers = tickerData.info.get('companyOfficers')
+                profile = profiles[tickerSymbol]
+                string_name = profile.get('longName')
+                symbol = profile.get('symbol')
+                address1 = profile.get('address1')
+                city = profile.get('city')
+                state = profile.get('state')
+                country = profile.get('country')
+                industry = profile.get('industry')
+                sector = profile.get('sector')
+                previousClose = str(profile.get('previousClose'))
+                exchange = str(profile.get('exchange'))
+                full_time_employees = str(profile.get('fullTimeEmployees'))
+                website = profile.get('website')
+                longBusinessSummary = profile.get('longBusinessSummary')
+                companyOfficers = profile.get('companyOfficers')
 
                 with cols[j]:
                     with st.container(border=True):
@@ -84,45 +102,23 @@ with tab1:
                             st.markdown(f'**Website :** [{string_name}]({website})')
 
 with tab2:
-    tickerSymbols = st.multiselect('Select stock tickers', ticker_list, default=['GOOGL', 'AMZN', 'NVDA', 'MSFT']) 
+    tickerSymbols = st.multiselect('Select stock tickers', ticker_list, default=['GOOGL', 'AMZN', 'NVDA', 'MSFT'], format_func=universe.label)
     for tickerSymbol in tickerSymbols:
-        tickerData = yf.Ticker(tickerSymbol) 
         with st.expander(f'{tickerSymbol}', expanded=False, icon=":material/account_tree:"):
-            st.write(tickerData.info)
-            
-            st.markdown(f'##### {tickerSymbol} Income Statement')
-            st.write(tickerData.income_stmt)
-
-            st.markdown(f'##### {tickerSymbol} Balance Sheet')
-            st.write(tickerData.balance_sheet)
-
-            st.markdown(f'##### {tickerSymbol} Latest News')
-            st.dataframe(tickerData.news)
-
-            st.markdown(f'##### {tickerSymbol} Major Holders')
-            st.write(tickerData.major_holders)
-        
-            st.markdown(f'##### {tickerSymbol} Institutional Holders')
-            st.write(tickerData.institutional_holders)
-            
-            st.markdown(f'##### {tickerSymbol} Mutual Fund Holders')
-            st.write(tickerData.mutualfund_holders)
-            
-            st.markdown(f'##### {tickerSymbol} Insider Transactions')
-            st.write(tickerData.insider_transactions)
-            
-            st.markdown(f'##### {tickerSymbol} Insider Purchases')
-            st.write(tickerData.insider_purchases)
-            
-            st.markdown(f'##### {tickerSymbol} Insider Roster Holders')
-            st.write(tickerData.insider_roster_holders)
-            
-            st.markdown(f'##### {tickerSymbol} Recommendations')
-            st.write(tickerData.recommendations)
-            
-            st.markdown(f'##### {tickerSymbol} Recommendations Summary')
-            st.write(tickerData.recommendations_summary)
-            
-            st.markdown(f'##### {tickerSymbol} Upgrades and Downgrades')
-            st.write(tickerData.upgrades_downgrades)
+            # Only the sections switched on here are fetched
+            open_sections = [section for section in REPORT_SECTIONS
+                             if st.toggle(section, key=f'{tickerSymbol}-{section}')]
+            datasets = get_sections(tickerSymbol, open_sections)
 
+            for name, value in datasets.items():
+                title = REPORT_DATASETS[name][0]
+                if isinstance(value, Exception):
+                    st.warning(f"Unable to load {title} for {tickerSymbol}: {value}")
+                elif name == 'info':
+                    st.write(value)
+                elif name == 'news':
+                    st.markdown(f'##### {tickerSymbol} {title}')
+                    st.dataframe(value)
+                else:
+                    st.markdown(f'##### {tickerSymbol} {title}')
+                    st.write(value)
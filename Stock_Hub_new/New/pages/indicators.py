@@ -1,139 +1,127 @@
 import streamlit as st
-import pandas as pd
-import pandas_datareader as data
-import yfinance as yf
-import ta
-import base64
-from datetime import date
-import plotly.graph_objs as go
+from datetime import date, timedelta
+from services.price_store import get_price_history
+from services.charts import panel_figure
+from services.export import show_export
+from services.indicator_engine import TECHNICAL_INDICATORS
+from services.indicator_state import cached_indicators
+from services.metrics import span
+from services.screener import OPERATORS, SCREEN_COLUMNS, load_universe, screen
+from services.ticker_universe import get_universe
 st.subheader("Stock Technical Indicators")
 # Define function to add technical indicators
-def add_technical_indicators(data, selected_indicators):
-    for indicator in selected_indicators:
-        if indicator == "Moving average of 20":
-            data['Moving average of 20'] = ta.trend.sma_indicator(data['Close'], window=20)
-        elif indicator == "Moving average of 50":
-            data['Moving average of 50'] = ta.trend.sma_indicator(data['Close'], window=50)
-        elif indicator == "Standard deviation":
-            data['Standard deviation'] = ta.volatility.bollinger_mavg(data['Close'], window=20, fillna=True) - ta.volatility.bollinger_lband(data['Close'], window=20, window_dev=2, fillna=True)
-        elif indicator == "Relative Strength Index":
-            data['Relative Strength Index'] = ta.momentum.rsi(data['Close'], window=14)
-        elif indicator == "Moving average convergence divergence":
-            data['Moving average convergence divergence'] = ta.trend.macd(data['Close'])
-        elif indicator == "Average Directional Index":
-            try:
-                data['Average Directional Index'] = ta.trend.adx(data['High'], data['Low'], data['Close'], window=14)
-            except ValueError as e:
-                st.warning(f"Unable to calculate ADX for {data['Ticker'][0]}: {e}")
-                data.drop(columns=["Average Directional Index"], inplace=True)
-        elif indicator == "Stochastic Oscillator (%K)":
-            data['Stochastic Oscillator (%K)'] = ta.momentum.stoch(data['High'], data['Low'], data['Close'], window=14, smooth_window=3)
-        elif indicator == "Stochastic Oscillator (%D)":
-            data['Stochastic Oscillator (%D)'] = ta.momentum.stoch_signal(data['High'], data['Low'], data['Close'], window=14, smooth_window=3)
-        elif indicator == "Bollinger Bands (bb_bbm)":
-            data['Bollinger Bands (bb_bbm)'] = ta.volatility.bollinger_mavg(data['Close'], window=20)
-        elif indicator == "Bollinger Bands (bb_bbh)":
-            data['Bollinger Bands (bb_bbh)'] = ta.volatility.bollinger_hband(data['Close'], window=20, window_dev=2)
-        elif indicator == "Bollinger Bands (bb_bbl)":
-            data['Bollinger Bands (bb_bbl)'] = ta.volatility.bollinger_lband(data['Close'], window=20, window_dev=2)
-        elif indicator == "Money Flow Index":
-            data['Money Flow Index'] = ta.volume.money_flow_index(data['High'], data['Low'], data['Close'], data['Volume'], window=14)
+def add_technical_indicators(data, ticker, start_date, selected_indicators):
+    # Indicators saved for this ticker are reused, and only bars added since the last run are computed
+    results = cached_indicators(ticker, start_date, data, selected_indicators)
+    for indicator, values in results.items():
+        if isinstance(values, Exception):
+            st.warning(f"Unable to calculate {indicator} for {ticker}: {values}")
+        else:
+            data[indicator] = values
 
     return data
 
 # Define function to retrieve stock data within a specified date range
 def get_stock_data(ticker, start_date, end_date):
-    stock = yf.Ticker(ticker)
-    df = stock.history(period="1d", start=start_date, end=end_date)
+    df = get_price_history(ticker, start_date, end_date, adjusted=True)
     df['Ticker'] = ticker  # Add a column for the stock ticker symbol
     return df
 
+# Indicators on the price scale are drawn over the close; the others get a panel each
+INDICATOR_PANELS = [
+    ("Close", ["Close", "Moving average of 20", "Moving average of 50", "Bollinger Bands (bb_bbm)",
+               "Bollinger Bands (bb_bbh)", "Bollinger Bands (bb_bbl)"]),
+    ("Standard deviation", ["Standard deviation"]),
+    ("Relative Strength Index (RSI)", ["Relative Strength Index"]),
+    ("Moving average convergence divergence (MACD)", ["Moving average convergence divergence"]),
+    ("Average Directional Index (ADX)", ["Average Directional Index"]),
+    ("Stochastic Oscillator", ["Stochastic Oscillator (%K)", "Stochastic Oscillator (%D)"]),
+    ("Money Flow Index (MFI)", ["Money Flow Index"]),
+]
+
 # Define function to display stock chart with technical indicators
 def display_stock_chart(ticker, data, selected_indicators):
     st.subheader(f"Close values for {ticker}")
-    fig = go.Figure(data=go.Scatter(x=data.index, y=data['Close']))
-    st.plotly_chart(fig)
-
-    for indicator in selected_indicators:
-        if indicator == "Moving average of 20":
-            st.subheader(f"Moving average of 20 for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Moving average of 20'], name='SMA20'))
-            st.plotly_chart(fig)
-
-        if indicator == "Moving average of 50":
-            st.subheader(f"Moving average of 50 for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Moving average of 50'], name='SMA50'))
-            st.plotly_chart(fig)
-
-        if indicator == "Standard deviation":
-            st.subheader(f"Standard deviation for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Standard deviation']))
-            st.plotly_chart(fig)
-
-        if indicator == "Relative Strength Index":
-            st.subheader(f"Relative Strength Index (RSI) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Relative Strength Index']))
-            st.plotly_chart(fig)
-
-        if indicator == "Moving average convergence divergence":
-            st.subheader(f"Moving average convergence divergence (MACD) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Moving average convergence divergence']))
-            st.plotly_chart(fig)
-
-        if indicator == "Average Directional Index":
-            st.subheader(f"Average Directional Index (ADX) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Average Directional Index']))
-            st.plotly_chart(fig)
-
-        if indicator == "Stochastic Oscillator (%K)":
-            st.subheader(f"Stochastic Oscillator (%K) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Stochastic Oscillator (%K)']))
-            st.plotly_chart(fig)
-
-        if indicator == "Stochastic Oscillator (%D)":
-            st.subheader(f"Stochastic Oscillator (%D) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Stochastic Oscillator (%D)']))
-            st.plotly_chart(fig)
-
-        if indicator == "Bollinger Bands (bb_bbm)":
-            st.subheader(f"Bollinger Bands (bb_bbm) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Bollinger Bands (bb_bbm)']))
-            st.plotly_chart(fig)
-
-        if indicator == "Bollinger Bands (bb_bbh)":
-            st.subheader(f"Bollinger Bands (bb_bbh) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Bollinger Bands (bb_bbh)']))
-            st.plotly_chart(fig)
-
-        if indicator == "Bollinger Bands (bb_bbl)":
-            st.subheader(f"Bollinger Bands (bb_bbl) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Bollinger Bands (bb_bbl)']))
-            st.plotly_chart(fig)
-
-        if indicator == "Money Flow Index":
-            st.subheader(f"Money Flow Index (MFI) for {ticker}")
-            fig = go.Figure(data=go.Scatter(x=data.index, y=data['Money Flow Index']))
-            st.plotly_chart(fig)
-
-# Define function to export data as CSV file
-def export_to_csv(data, ticker, selected_indicators):
-    if not selected_indicators:
-        return None
-
-    selected_data = data[['Open', 'Close', 'High', 'Low', 'Volume'] + selected_indicators]
-    csv = selected_data.to_csv(index=True)
-    b64 = base64.b64encode(csv.encode()).decode()
-    href = f'<a href="data:file/csv;base64,{b64}" download="{ticker}_indicators.csv"><button style="background-color: #FF4B4B; color: white; padding: 0.5em 1em; border: none; border-radius: 4px; cursor: pointer;">Download {ticker} Indicators</button></a>'
-    return href
-
-stock_ticker_file = 'Tickers\Stock_Tickers'
-stock_list = pd.read_csv(stock_ticker_file).squeeze().tolist()
+    # One figure with a panel per indicator group, downsampled for long date ranges
+    fig = panel_figure(data[['Close'] + selected_indicators], INDICATOR_PANELS)
+    with span('chart_render', page='indicators'):
+        st.plotly_chart(fig, use_container_width=True)
+
+# Define function to load the screening universe, reused for 15 minutes like the live price bars
+@st.cache_data(ttl=900, show_spinner=False)
+def get_screen_universe(tickers, end_date):
+    return load_universe(list(tickers), end_date)
+
+# Define function to screen the whole ticker list on the latest indicator values
+def show_screener(ticker_universe):
+    st.write("Screen every ticker on its latest technical indicator values.")
+    sectors = st.multiselect("Sectors", ticker_universe.sectors(), key="screen_sectors")
+    stock_list = ticker_universe.filter(sectors)
+    end_date = st.date_input("As of", today, max_value=today, key="screen_end")
+    condition_count = st.number_input("Number of conditions", min_value=1, max_value=4, value=2)
+
+    defaults = [("Relative Strength Index", "<", None, 30.0), ("Close", ">", "Moving average of 50", 0.0)]
+    conditions = []
+    for position in range(condition_count):
+        default_left, default_symbol, default_right, default_value = defaults[position] if position < len(defaults) else ("Close", ">", None, 0.0)
+        col1, col2, col3, col4 = st.columns([3, 1, 3, 2])
+        with col1:
+            left = st.selectbox("Indicator", SCREEN_COLUMNS, index=SCREEN_COLUMNS.index(default_left), key=f"screen_left_{position}")
+        with col2:
+            symbol = st.selectbox("Operator", list(OPERATORS), index=list(OPERATORS).index(default_symbol), key=f"screen_op_{position}")
+        targets = ["Value"] + SCREEN_COLUMNS
+        with col3:
+            target = st.selectbox("Compared to", targets, index=targets.index(default_right or "Value"), key=f"screen_right_{position}")
+        with col4:
+            value = st.number_input("Value", value=default_value, disabled=target != "Value", key=f"screen_value_{position}")
+        conditions.append((left, symbol, value if target == "Value" else target))
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        rank_by = st.selectbox("Rank by", SCREEN_COLUMNS, index=SCREEN_COLUMNS.index("Relative Strength Index"))
+    with col2:
+        ascending = st.checkbox("Ascending", value=True)
+
+    if st.button("Run screener"):
+        with st.spinner(f"Screening {len(stock_list)} tickers..."):
+            universe = get_screen_universe(tuple(stock_list), end_date + timedelta(days=1))
+        if universe['failed']:
+            # Drop the cached universe so the next run downloads the failed tickers again
+            get_screen_universe.clear()
+            st.warning(f"Prices could not be downloaded for {', '.join(universe['failed'])}")
+        if len(universe['dates']) == 0 or not universe['tickers']:
+            st.info("No ticker has complete price data for the screening window. "
+                    "Please choose other sectors or an earlier date.")
+            return
+        with st.spinner("Screening..."):
+            try:
+                matches = screen(universe, conditions, rank_by, ascending)
+            except ValueError as error:
+                st.error(str(error))
+                return
+        st.write(f"{len(matches)} of {len(universe['tickers'])} tickers match "
+                 f"(as of {universe['dates'][-1]:%Y-%m-%d})")
+        if universe['source'] == 'snapshot':
+            st.caption("Indicator values from the precomputed nightly snapshot.")
+        matches.insert(0, "Sector", [ticker_universe.metadata[ticker].get("sector") for ticker in matches.index])
+        st.dataframe(matches.round(2), use_container_width=True)
+        if universe['skipped']:
+            st.caption(f"Skipped for missing bars: {', '.join(universe['skipped'])}")
+
+ticker_universe = get_universe()
+stock_list = ticker_universe.symbols
+today = date.today()
+
+# Choose between charting a few stocks and screening the whole ticker list
+mode = st.radio("Mode", ["Charts", "Screener"], horizontal=True)
+if mode == "Screener":
+    show_screener(ticker_universe)
+    st.stop()
 
 # Add user input for selecting stocks to analyze
-selected_stocks = st.multiselect('Select stocks to analyze', stock_list,  default=['GOOGL', 'AMZN'])
+selected_stocks = st.multiselect('Select stocks to analyze', stock_list,  default=['GOOGL', 'AMZN'], format_func=ticker_universe.label)
 
 # Add user input for selecting start and end dates
-today = date.today()
 col1,col2 = st.columns(2)
 with col1:
     start = st.date_input("Start date", date(2012, 1, 1), max_value=today)
@@ -141,23 +129,30 @@ with col2:
     end = st.date_input("End date", date(2022, 12, 31), max_value=today)
 
 # Add multi-select input widget for technical indicators
-technical_indicators = ["Moving average of 20", "Moving average of 50", "Standard deviation", "Relative Strength Index", "Moving average convergence divergence", "Average Directional Index", "Stochastic Oscillator (%K)", "Stochastic Oscillator (%D)", "Bollinger Bands (bb_bbm)", "Bollinger Bands (bb_bbh)", "Bollinger Bands (bb_bbl)", "Money Flow Index"]
+technical_indicators = TECHNICAL_INDICATORS
 selected_indicators = st.multiselect("Select technical indicators to display and download", technical_indicators)
 
 # If at least one stock is selected, analyze them
 if selected_stocks:
+    exports = {}
     for ticker in selected_stocks:
         # Retrieve stock data within the specified date range
         data = get_stock_data(ticker, start, end)
         # Add technical indicators to the data
-        data = add_technical_indicators(data, selected_indicators)
+        data = add_technical_indicators(data, ticker, start, selected_indicators)
+        computed_indicators = [indicator for indicator in selected_indicators if indicator in data]
         # Display stock chart with selected technical indicators
         st.write(f"## {ticker} Stock Price with Technical Indicators")
-        display_stock_chart(ticker, data, selected_indicators)
+        display_stock_chart(ticker, data, computed_indicators)
+
+        # Offer the selected technical indicators for download
+        if computed_indicators:
+            exports[ticker] = data[['Open', 'Close', 'High', 'Low', 'Volume'] + computed_indicators]
+            show_export({ticker: exports[ticker]}, f"{ticker}_indicators", f"{ticker} Indicators", f"export_{ticker}")
 
-        # Export selected technical indicators as a CSV file and display download button
-        csv_link = export_to_csv(data, ticker, selected_indicators)
-        if csv_link:
-            st.markdown(csv_link, unsafe_allow_html=True)
+    # Several tickers can also be downloaded together as one archive
+    if len(exports) > 1:
+        st.write("## Download all selected stocks")
+        show_export(exports, "stock_indicators", "all indicators", "export_all")
 else:
     st.write('Please select at least one stock to analyze.')
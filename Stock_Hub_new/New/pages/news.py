@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from textblob import TextBlob
-from newsapi import NewsApiClient
+import plotly.graph_objs as go
 import math
+import asyncio
+from services.news_feed import get_news_feed, make_client
+from services.metrics import span
+from services.news_watchlist import WatchlistFeed, stream_watchlist_news
+from services.ticker_universe import get_universe
+from services.sentiment import SCORERS, daily_sentiment, score_articles
 
 # Set up the Streamlit app
 st.subheader("Stock News")
@@ -17,45 +22,70 @@ def get_sentiment_emoji(sentiment_score):
     else:
         return "😐 (Neutral Sentiment)"
 
-# Function to fetch news articles
+# Function to fetch news articles; the feed is cached per ticker and date window, so page flips reuse it
 def fetch_news_articles(ticker, api_key, date_range):
-    news_api = NewsApiClient(api_key=api_key)
-    return news_api.get_everything(
-        q=ticker,
-        language='en',
-        from_param=date_range['from_date'],
-        to=date_range['to_date'],
-        sort_by='relevancy',
-        page_size=100
-    )
+    return get_news_feed(ticker, date_range['from_date'], date_range['to_date'], make_client(api_key))
 
 # Function to display articles
-def display_articles(articles, start_index, end_index, total_articles):
-    for article in articles:
+def display_articles(articles, start_index, end_index, total_articles, scorer):
+    # Score the whole page in one batch; articles scored before come from the cache
+    sentiment_scores = score_articles(articles, scorer)
+    for article, sentiment_score in zip(articles, sentiment_scores):
         st.write('---')
         st.write(f"**Title:** [{article['title']}]({article['url']})")
-        st.write(f"**Description:** {article['description']}")
+        st.write(f"**Description:** {article['description'] or 'No description available.'}")
         st.write(f"**Source:** {article['source']['name']}")
 
-        # Perform sentiment analysis
-        sentiment_analysis = TextBlob(article['description'])
-        sentiment_score = sentiment_analysis.sentiment.polarity
+        # Show the sentiment analysis
         sentiment_emoji = get_sentiment_emoji(sentiment_score)
         st.write(f"**Sentiment:** {sentiment_score:.2f} {sentiment_emoji}")
 
     st.write(f"Showing articles {start_index + 1} - {end_index} out of {total_articles}")
 
-# Load stock tickers
-stock_ticker_file = 'Tickers\Stock_Tickers'
-stock_list = pd.read_csv(stock_ticker_file).squeeze().tolist()
+# Function to chart the daily average sentiment of the articles fetched so far
+def display_daily_sentiment(ticker, articles, scorer):
+    daily = daily_sentiment(articles, scorer)
+    if daily.empty:
+        return
+    fig = go.Figure(go.Bar(x=daily.index, y=daily['Sentiment'], customdata=daily['Articles'],
+                           marker_color=['green' if score > 0 else 'red' for score in daily['Sentiment']],
+                           hovertemplate='%{x|%Y-%m-%d}: %{y:.2f} (%{customdata} articles)<extra></extra>'))
+    fig.update_layout(title=f"Daily news sentiment for {ticker}", xaxis_title="Date", yaxis_title="Average sentiment",
+                      height=300)
+    with span('chart_render', page='news'):
+        st.plotly_chart(fig, use_container_width=True)
 
-# User input
-selected_ticker = st.selectbox('Select stocks to analyze', stock_list)
-st.subheader(f"News articles related to {selected_ticker}")
+# Function to show the merged news of several tickers, redrawn as each ticker's news arrives,
+# so the first results show while slower tickers are still loading
+def show_watchlist_news(tickers, api_key, date_range, scorer, per_ticker, shown_articles):
+    watchlist = WatchlistFeed()
+    status = st.empty()
+    placeholder = st.empty()
 
-# Initialize session state
-if 'current_page' not in st.session_state:
-    st.session_state.current_page = 1
+    async def collect():
+        stream = stream_watchlist_news(tickers, date_range['from_date'], date_range['to_date'],
+                                       make_client(api_key), per_ticker=per_ticker)
+        async for ticker, articles in stream:
+            watchlist.add(ticker, articles)
+            status.write(f"Loaded news for {len(watchlist.finished)} of {len(tickers)} tickers")
+            articles = watchlist.articles[:shown_articles]
+            with placeholder.container():
+                for article, sentiment_score in zip(articles, score_articles(articles, scorer)):
+                    st.write('---')
+                    st.write(f"**Title:** [{article['title']}]({article['url']})")
+                    st.write(f"**Tickers:** {', '.join(article['tickers'])} · **Source:** {article['source']['name']}"
+                             f" · **Published:** {(article.get('publishedAt') or '')[:16].replace('T', ' ')}")
+                    st.write(f"**Sentiment:** {sentiment_score:.2f} {get_sentiment_emoji(sentiment_score)}")
+
+    asyncio.run(collect())
+    if watchlist.errors:
+        st.warning("Could not load news for: " + ', '.join(sorted(watchlist.errors)))
+    if not watchlist.articles:
+        placeholder.write('No news articles found')
+
+# Load stock tickers
+universe = get_universe()
+stock_list = universe.symbols
 
 # Initialize parameters
 api_key = '517da00e19094775ae25b3cbf6dfaa80'
@@ -64,16 +94,39 @@ date_range = {
     'to_date': datetime.now().strftime('%Y-%m-%d')
 }
 
+# User input
+mode = st.radio('Mode', ['Single ticker', 'Watchlist'], horizontal=True)
+scorer_label = st.radio('Sentiment scorer', list(SCORERS), horizontal=True)
+scorer = SCORERS[scorer_label]()
+
+if mode == 'Watchlist':
+    sectors = st.multiselect('Filter by sector', universe.sectors())
+    sector_tickers = universe.filter(sectors)
+    watchlist_tickers = st.multiselect('Select stocks to follow', sector_tickers, default=sector_tickers[:5],
+                                       format_func=universe.label)
+    col1, col2 = st.columns(2)
+    per_ticker = col1.number_input('Articles per ticker', min_value=5, max_value=100, value=20, step=5)
+    shown_articles = col2.number_input('Articles to show', min_value=10, max_value=200, value=30, step=10)
+    if watchlist_tickers:
+        st.subheader(f"Latest news for {len(watchlist_tickers)} tickers")
+        show_watchlist_news(watchlist_tickers, api_key, date_range, scorer, int(per_ticker), int(shown_articles))
+    st.stop()
+
+selected_ticker = st.selectbox('Select stocks to analyze', stock_list, format_func=universe.label)
+st.subheader(f"News articles related to {selected_ticker}")
+
+# Initialize session state
+if 'current_page' not in st.session_state:
+    st.session_state.current_page = 1
+
 # Fetch news articles
-news_data = fetch_news_articles(selected_ticker, api_key, date_range)
+news_feed = fetch_news_articles(selected_ticker, api_key, date_range)
 
 # Handle pagination
-if news_data['totalResults'] == 0:
+if news_feed.total == 0:
     st.write('No news articles found')
 else:
-    total_articles = news_data["totalResults"]
     articles_per_page = 5
-    num_of_pages = math.ceil(total_articles / articles_per_page)
 
     # Pagination controls
     col1, col2 = st.columns([9, 1])
@@ -81,12 +134,14 @@ else:
         if st.button('Previous') and st.session_state.current_page > 1:
             st.session_state.current_page -= 1
     with col2:
-        if st.button('Next') and st.session_state.current_page < num_of_pages:
+        if st.button('Next') and st.session_state.current_page < math.ceil(news_feed.total / articles_per_page):
             st.session_state.current_page += 1
 
-    # Display current page articles
+    # Display current page articles; only pages past the articles already fetched call the API
     start_index = (st.session_state.current_page - 1) * articles_per_page
-    end_index = start_index + articles_per_page
-    articles = news_data['articles'][start_index:end_index]
+    articles = news_feed.get_articles(start_index, start_index + articles_per_page)
+    total_articles = news_feed.total
+    end_index = start_index + len(articles)
 
-    display_articles(articles, start_index, end_index, total_articles)
+    display_daily_sentiment(selected_ticker, news_feed.fetched_articles(), scorer)
+    display_articles(articles, start_index, end_index, total_articles, scorer)
@@ -0,0 +1,72 @@
+import os
+import streamlit as st
+import pandas as pd
+from services.metrics import METRICS_DIR, METRICS_PORT, cache_summary, counter_summary, prometheus_text, span_summary, write_prometheus
+
+st.subheader("Performance")
+st.write("Timings and cache hit rates collected by this server process since it started. "
+         "Latencies are percentiles of the most recent runs.")
+
+if st.button("Refresh"):
+    st.rerun()
+
+spans = pd.DataFrame(span_summary())
+number_format = st.column_config.NumberColumn(format="%.1f")
+latency_columns = {"p50_ms": "p50 (ms)", "p90_ms": "p90 (ms)", "p99_ms": "p99 (ms)", "max_ms": "Max (ms)", "mean_ms": "Mean (ms)"}
+
+# Page latency: one span per page run, recorded by app.py
+st.markdown("#### Page latency")
+page_runs = spans[spans["span"] == "page_run"] if not spans.empty else spans
+if page_runs.empty:
+    st.info("No page runs recorded yet.")
+else:
+    page_table = pd.DataFrame({"Page": [labels.get("page") for labels in page_runs["labels"]], "Runs": page_runs["count"]})
+    page_table = page_table.join(page_runs[list(latency_columns)].rename(columns=latency_columns))
+    st.dataframe(page_table.sort_values("p90 (ms)", ascending=False), hide_index=True, use_container_width=True,
+                 column_config={column: number_format for column in latency_columns.values()})
+
+# Cache hit rates
+st.markdown("#### Caches")
+caches = pd.DataFrame(cache_summary())
+if caches.empty:
+    st.info("No cache lookups recorded yet.")
+else:
+    caches.columns = ["Cache", "Hits", "Misses", "Hit rate"]
+    caches["Hit rate"] = caches["Hit rate"] * 100
+    st.dataframe(caches, hide_index=True, use_container_width=True,
+                 column_config={"Hit rate": st.column_config.ProgressColumn(format="%.0f%%", min_value=0, max_value=100)})
+
+# Every other span: data fetches, indicator computation, model fits and inference, chart rendering...
+st.markdown("#### Operations")
+operations = spans[spans["span"] != "page_run"] if not spans.empty else spans
+if operations.empty:
+    st.info("No operations recorded yet.")
+else:
+    operation_table = pd.DataFrame({
+        "Operation": operations["span"],
+        "Labels": [", ".join(f"{label}={value}" for label, value in labels.items()) for labels in operations["labels"]],
+        "Count": operations["count"],
+    }).join(operations[list(latency_columns)].rename(columns=latency_columns))
+    operation_table["Total (s)"] = operations["mean_ms"] * operations["count"] / 1000
+    st.dataframe(operation_table.sort_values("Total (s)", ascending=False), hide_index=True, use_container_width=True,
+                 column_config={column: number_format for column in list(latency_columns.values()) + ["Total (s)"]})
+
+counters = counter_summary()
+if counters:
+    st.markdown("#### Counters")
+    st.dataframe(pd.DataFrame(counters), hide_index=True, use_container_width=True)
+
+# Prometheus export
+st.markdown("#### Prometheus export")
+metrics_path = os.path.join(METRICS_DIR, "app.prom")
+st.write(f"The metrics are written to `{metrics_path}` every few seconds"
+         + (f" and served at `http://<host>:{METRICS_PORT}/metrics`." if METRICS_PORT else
+            ". Set the `METRICS_PORT` environment variable to also serve them over HTTP."))
+col1, col2 = st.columns(2)
+with col1:
+    if st.button("Write metrics file now"):
+        st.success(f"Written to {write_prometheus(metrics_path)}")
+with col2:
+    st.download_button("Download metrics", prometheus_text(), file_name="stock_hub.prom", mime="text/plain")
+with st.expander("Prometheus text"):
+    st.code(prometheus_text(), language="text")
@@ -1,14 +1,15 @@
 
 import streamlit as st
-import yfinance as yf
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import plotly.graph_objs as go
 from datetime import date, datetime, timedelta
-import tensorflow as tf
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import mean_squared_error, r2_score
+from services.price_store import get_price_history
+from services.datasets import make_windows
+from services.forecasters import FORECASTERS, MAX_HORIZON, MIN_HORIZON, LSTMForecaster, regression_metrics
+from services.lstm_model import DEFAULT_HYPERPARAMS, DEFAULT_START, PREDICTION_TICKERS, training_length
+from services.metrics import span
+from services.training_queue import DONE, FAILED, ensure_worker, find_job, submit_job
 
 # Set page config
 # st.set_page_config(
@@ -18,6 +19,31 @@ from sklearn.metrics import mean_squared_error, r2_score
 #     initial_sidebar_state="expanded"
 # )
 
+# Function to queue training for a model and show its progress until the model is ready
+@st.fragment(run_every=1)
+def show_training_progress(ticker, start, end):
+    job = find_job(ticker, start, end)
+    if job is not None and job['status'] == FAILED:
+        st.error(f"Training the {ticker} model failed: {job['error']}")
+        if st.button('Retry training'):
+            submit_job(ticker, start, end)
+        return
+    if job is not None and job['status'] == DONE:
+        # Rerun the page once to pick up the model; queue a new run if it still is not usable
+        if st.session_state.get('finished_training_job') != (job['id'], job.get('finished_at')):
+            st.session_state.finished_training_job = (job['id'], job.get('finished_at'))
+            st.rerun()
+        job = None
+    if job is None:
+        job = submit_job(ticker, start, end)
+    ensure_worker()
+
+    progress = job['progress']
+    status_text = f"Training the {ticker} model in the background: epoch {progress['epoch']} of {progress['epochs']}"
+    if progress['loss'] is not None:
+        status_text += f" (loss {progress['loss']:.5f})"
+    st.progress(progress['epoch'] / progress['epochs'], text=status_text)
+
 # Title
 st.title("Stock Price Prediction")
 
@@ -25,7 +51,7 @@ st.title("Stock Price Prediction")
 today = date.today()
 col1, col2 = st.columns(2)
 with col1:
-    start = st.date_input("Start date", date(2022, 1, 1), max_value=today)
+    start = st.date_input("Start date", DEFAULT_START, max_value=today)
 with col2:
     end = st.date_input("End date", date.today(), max_value=today)
 
@@ -38,13 +64,16 @@ else:
     st.success(f'Start date: `{start}`\n\nEnd date: `{end}`')
 
     # Stock selection
-    stock_list = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "JPM", "JNJ", "NVDA", "V", "NFLX"]
+    stock_list = PREDICTION_TICKERS
     user_input = st.selectbox('Select stock to analyze', stock_list)
+    backend = st.selectbox('Forecasting model', list(FORECASTERS),
+                           help='The Bidirectional LSTM is the most expensive model and is trained in the background.')
+    future_days = st.slider('Days to forecast', min_value=MIN_HORIZON, max_value=MAX_HORIZON, value=7)
 
     # Download data
     @st.cache_data
     def load_data(ticker, start, end):
-        return yf.download(ticker, start=start, end=end)
+        return get_price_history(ticker, start, end)
 
     df = load_data(user_input, start, end)
 
@@ -58,7 +87,8 @@ else:
         fig = go.Figure()
         fig.add_trace(go.Scatter(x=df.index, y=df.Close, mode='lines', name='Close'))
         fig.update_layout(title='Closing Price vs Time', xaxis_title='Time', yaxis_title='Closing Price')
-        st.plotly_chart(fig, use_container_width=True)
+        with span('chart_render', page='prediction'):
+            st.plotly_chart(fig, use_container_width=True)
 
         # Candlestick chart
         fig = go.Figure(data=[go.Candlestick(x=df.index,
@@ -67,97 +97,81 @@ else:
                                              low=df['Low'],
                                              close=df['Close'])])
         fig.update_layout(title='Candlestick Chart', xaxis_title='Time', yaxis_title='Price')
-        st.plotly_chart(fig, use_container_width=True)
-
-        # Prepare data for model
-        scaler = MinMaxScaler()
-        scaled_data = scaler.fit_transform(df['Close'].values.reshape(-1, 1))
-        training_data_len = int(np.ceil(len(scaled_data) * .95))
-        train_data = scaled_data[0:training_data_len, :]
-        x_train, y_train = [], []
-
-        for i in range(60, len(train_data)):
-            x_train.append(train_data[i-60:i, 0])
-            y_train.append(train_data[i, 0])
-
-        x_train, y_train = np.array(x_train), np.array(y_train)
-        x_train = np.reshape(x_train, (x_train.shape[0], x_train.shape[1], 1))
-
-        # Create and train model
-        model = tf.keras.Sequential([
-            tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(64, return_sequences=True, input_shape=(x_train.shape[1], 1))),
-            tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(64)),
-            tf.keras.layers.Dense(32),
-            tf.keras.layers.Dense(1)
-        ])
-        model.compile(optimizer='adam', loss='mean_squared_error')
-
-        history = model.fit(x_train, y_train, batch_size=32, epochs=10, validation_split=0.1, verbose=0)
-
-        # Prepare test data
-        test_data = scaled_data[training_data_len - 60:, :]
-        x_test = []
-        y_test = df['Close'][training_data_len:].values
-
-        for i in range(60, len(test_data)):
-            x_test.append(test_data[i-60:i, 0])
-
-        x_test = np.array(x_test)
-        x_test = np.reshape(x_test, (x_test.shape[0], x_test.shape[1], 1))
-
-        # Make predictions
-        predictions = model.predict(x_test)
-        predictions = scaler.inverse_transform(predictions)
-
-        # Calculate metrics
-        mse = mean_squared_error(y_test, predictions)
-        rmse = np.sqrt(mse)
-        mape = np.mean(np.abs((y_test - predictions.flatten()) / y_test)) * 100
-        r2 = r2_score(y_test, predictions)
-
-        st.subheader('Model Performance Metrics')
-        st.write(f'Root Mean Square Error (RMSE): {rmse:.2f}')
-        st.write(f'Mean Absolute Percentage Error (MAPE): {mape:.2f}%')
-        st.write(f'R2 Score: {r2:.2f}')
-
-        # Plot training history
-        st.subheader('Training History')
-        fig, ax = plt.subplots()
-        ax.plot(history.history['loss'], label='Training Loss')
-        ax.plot(history.history['val_loss'], label='Validation Loss')
-        ax.set_xlabel('Epoch')
-        ax.set_ylabel('Loss')
-        ax.legend()
-        st.pyplot(fig)
-
-        # Plot actual vs predicted prices
-        train = df[:training_data_len]
-        valid = df[training_data_len:]
-        valid['Predictions'] = predictions
-
-        st.subheader('Actual vs Predicted Prices')
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=train.index, y=train['Close'], mode='lines', name='Actual Train Price'))
-        fig.add_trace(go.Scatter(x=valid.index, y=valid['Close'], mode='lines', name='Actual Test Price'))
-        fig.add_trace(go.Scatter(x=valid.index, y=valid['Predictions'], mode='lines', name='Predicted Test Price'))
-        st.plotly_chart(fig, use_container_width=True)
-
-        # Future price prediction
-        future_days = 7
-        last_days = df['Close'].tail(60).values.reshape(-1, 1)
-        last_days_scaled = scaler.transform(last_days)
-
-        future_predictions = []
-        for _ in range(future_days):
-            x_future = last_days_scaled[-60:].reshape(1, 60, 1)
-            future_prediction = model.predict(x_future)[0]
-            future_predictions.append(future_prediction)
-            last_days_scaled = np.append(last_days_scaled, future_prediction).reshape(-1, 1)
-
-        future_predictions = scaler.inverse_transform(np.array(future_predictions).reshape(-1, 1))
-
-        future_dates = pd.date_range(start=df.index[-1] + pd.Timedelta(days=1), periods=future_days)
-
-        st.subheader('Future Price Predictions for the Next 7 Days')
-        future_df = pd.DataFrame({'Date': future_dates, 'Predicted Close Price': future_predictions.flatten()})
-        st.table(future_df)
\ No newline at end of file
+        with span('chart_render', page='prediction'):
+            st.plotly_chart(fig, use_container_width=True)
+
+        close = df['Close'].values
+        training_data_len = training_length(len(close), DEFAULT_HYPERPARAMS)
+        lookback = DEFAULT_HYPERPARAMS['lookback']
+        predictions, future_predictions, history = None, None, None
+
+        if backend == LSTMForecaster.label:
+            from services.forecasting import forecast_prices
+            from services.model_registry import load_model
+
+            # Use the saved (or quickly fine-tuned) model; full training runs in the background worker
+            model_result = load_model(user_input, start, end, close)
+            if model_result is None:
+                show_training_progress(user_input, start, end)
+            else:
+                model, scaler, history, model_status = model_result
+                st.caption(f'Prediction model {model_status}.')
+
+                # Prepare test data and make predictions
+                scaled_data = scaler.transform(close.reshape(-1, 1))
+                x_test, _ = make_windows(scaled_data[training_data_len - lookback:, :], lookback)
+                with span('model_inference', model='lstm'):
+                    predictions = scaler.inverse_transform(model.predict(x_test)).flatten()
+
+                    # Future price prediction, all days in one compiled forecast call
+                    future_predictions = forecast_prices({user_input: (model, scaler, close)}, future_days)[user_input]
+        else:
+            # CPU backends train in milliseconds, so they are fitted on every run
+            with span('model_fit', model=backend, kind='train'):
+                forecaster = FORECASTERS[backend]().fit(close[:training_data_len])
+            with span('model_inference', model=backend):
+                predictions = forecaster.predict_one_step(close, training_data_len)
+                future_predictions = forecaster.forecast(close, future_days)
+
+        if predictions is not None:
+            # Calculate metrics
+            y_test = close[training_data_len:]
+            metrics = regression_metrics(y_test, predictions)
+
+            st.subheader('Model Performance Metrics')
+            st.write(f'Root Mean Square Error (RMSE): {metrics["rmse"]:.2f}')
+            st.write(f'Mean Absolute Percentage Error (MAPE): {metrics["mape"]:.2f}%')
+            st.write(f'R2 Score: {metrics["r2"]:.2f}')
+
+            # Plot training history
+            if history is not None:
+                import matplotlib.pyplot as plt
+
+                st.subheader('Training History')
+                fig, ax = plt.subplots()
+                ax.plot(history['loss'], label='Training Loss')
+                if 'val_loss' in history:
+                    ax.plot(history['val_loss'], label='Validation Loss')
+                ax.set_xlabel('Epoch')
+                ax.set_ylabel('Loss')
+                ax.legend()
+                st.pyplot(fig)
+
+            # Plot actual vs predicted prices
+            train = df[:training_data_len]
+            valid = df[training_data_len:].copy()
+            valid['Predictions'] = predictions
+
+            st.subheader('Actual vs Predicted Prices')
+            fig = go.Figure()
+            fig.add_trace(go.Scatter(x=train.index, y=train['Close'], mode='lines', name='Actual Train Price'))
+            fig.add_trace(go.Scatter(x=valid.index, y=valid['Close'], mode='lines', name='Actual Test Price'))
+            fig.add_trace(go.Scatter(x=valid.index, y=valid['Predictions'], mode='lines', name='Predicted Test Price'))
+            with span('chart_render', page='prediction'):
+                st.plotly_chart(fig, use_container_width=True)
+
+            future_dates = pd.date_range(start=df.index[-1] + pd.Timedelta(days=1), periods=future_days)
+
+            st.subheader(f'Future Price Predictions for the Next {future_days} Days')
+            future_df = pd.DataFrame({'Date': future_dates, 'Predicted Close Price': future_predictions})
+            st.table(future_df)
@@ -1,38 +1,164 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 from datetime import datetime, timedelta
+import plotly.graph_objs as go
+from services.price_store import get_price_matrix
+from services.return_index import get_return_index
+from services.investment_returns import portfolio_returns, return_statistics, rolling_entry_returns
+from services.charts import line_trace
+from services.metrics import span
+from services.ticker_universe import get_universe
 
 # Set up the subheader
 st.subheader("Stock Revenue Calculator")
 
-# Path to the file containing stock tickers
-ticker_file_path = 'Tickers\Stock_Tickers'
-stock_tickers = pd.read_csv(ticker_file_path).squeeze().tolist()
+# Stock tickers from the shared ticker universe
+stock_tickers = get_universe().symbols
 
 # Function to calculate return and final amount
 def calculate_investment_return(ticker_symbol, start_date, end_date, invested_amount):
-    stock_data = yf.download(ticker_symbol, start=start_date, end=end_date)
-    if stock_data.empty:
-        return None, None
-    closing_prices = stock_data['Close']
-    if len(closing_prices) < 2:
+    # The ticker's cumulative return index answers any date range with two array reads
+    return_index = get_return_index(ticker_symbol, start_date, end_date)
+    return_rate, _, _ = return_index.range_return(start_date, end_date)
+    if return_rate is None:
         st.error("Not enough data to calculate returns. Please choose a different date range.")
         return None, None
-    initial_price = closing_prices.iloc[0]
-    final_price = closing_prices.iloc[-1]
-    return_rate, final_amount = compute_total_return(initial_price, final_price, invested_amount)
+    final_amount = invested_amount * (1 + return_rate)
     return return_rate, final_amount
 
-# Function to compute total return and final amount
-def compute_total_return(initial_price, final_price, initial_investment):
-    return_rate = (final_price / initial_price) - 1
-    final_amount = initial_investment * (1 + return_rate)
-    return return_rate, final_amount
+# Function to load one aligned price matrix for all the tickers of a calculation, reused for 15 minutes
+@st.cache_data(ttl=900, show_spinner=False)
+def get_aligned_prices(tickers, start_date, end_date, field):
+    return get_price_matrix(list(tickers), start_date, end_date, field)
+
+# Function to warn about tickers whose download failed; the cached matrix is dropped so the next run retries them
+def warn_failed_downloads(prices):
+    failed = prices.attrs.get("failed")
+    if failed:
+        st.warning("Prices could not be downloaded for " + ", ".join(f"{ticker} ({error})" for ticker, error in failed.items()))
+        get_aligned_prices.clear()
+
+# Function to display a table of scenario results with dates, prices, amounts and returns formatted
+def show_scenario_table(table):
+    table = table.assign(Return=table["Return"] * 100).rename(columns={"Return": "Return (%)"})
+    money = st.column_config.NumberColumn(format="$%.2f")
+    st.dataframe(table, use_container_width=True, column_config={
+        "Start": st.column_config.DateColumn(format="YYYY-MM-DD"),
+        "End": st.column_config.DateColumn(format="YYYY-MM-DD"),
+        "Start Date": st.column_config.DateColumn(format="YYYY-MM-DD"),
+        "End Date": st.column_config.DateColumn(format="YYYY-MM-DD"),
+        "Entry Price": st.column_config.NumberColumn(format="%.2f"),
+        "Exit Price": st.column_config.NumberColumn(format="%.2f"),
+        "Invested Amount": money,
+        "Final Amount": money,
+        "Profit/Loss": money,
+        "Return (%)": st.column_config.NumberColumn(format="%.2f%%"),
+    })
+
+# Function to evaluate many holdings over many periods in one pass
+def show_portfolio_mode(stock_tickers, max_date):
+    st.write("Holdings")
+    holdings = st.data_editor(
+        pd.DataFrame({"Stock Ticker": stock_tickers[:2], "Invested Amount": [1000.0, 1000.0]}),
+        num_rows="dynamic", use_container_width=True, key="portfolio_holdings",
+        column_config={
+            "Stock Ticker": st.column_config.SelectboxColumn(options=stock_tickers, required=True),
+            "Invested Amount": st.column_config.NumberColumn(min_value=0.0, format="$%.2f", required=True),
+        },
+    )
+    st.write("Periods")
+    periods = st.data_editor(
+        pd.DataFrame({"Start Date": [datetime(2019, 1, 1).date(), datetime(2020, 1, 1).date()],
+                      "End Date": [datetime(2023, 12, 31).date(), max_date]}),
+        num_rows="dynamic", use_container_width=True, key="portfolio_periods",
+        column_config={
+            "Start Date": st.column_config.DateColumn(max_value=max_date, required=True),
+            "End Date": st.column_config.DateColumn(max_value=max_date, required=True),
+        },
+    )
+    reinvest = st.checkbox("Reinvest dividends (use adjusted close)", value=True, key="portfolio_reinvest")
+
+    if st.button("Calculate Portfolio"):
+        holdings = holdings.dropna().groupby("Stock Ticker")["Invested Amount"].sum()
+        periods = periods.dropna()
+        if holdings.empty or periods.empty:
+            st.error("Please enter at least one holding and one period.")
+            return
+        # End dates are inclusive on the page, like the single investment mode
+        period_list = [(pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1))
+                       for start, end in zip(periods["Start Date"], periods["End Date"])]
+        prices = get_aligned_prices(tuple(holdings.index), min(start for start, _ in period_list).date(),
+                                    max(end for _, end in period_list).date(), "Adj Close" if reinvest else "Close")
+        warn_failed_downloads(prices)
+        try:
+            table, summary = portfolio_returns(prices, holdings.to_dict(), period_list)
+        except ValueError as error:
+            st.error(str(error))
+            return
+        summary["End"] = summary["End"] - pd.Timedelta(days=1)
+        st.write("Portfolio by period:")
+        show_scenario_table(summary)
+        st.write("Holdings by period:")
+        show_scenario_table(table)
+
+# Function to evaluate buying on every trading day of an entry window
+def show_rolling_entry_mode(stock_tickers, max_date):
+    ticker = st.selectbox("Select Stock Ticker", stock_tickers, key="rolling_ticker")
+    column1, column2 = st.columns(2)
+    with column1:
+        entry_start = st.date_input("First entry date", datetime(2020, 1, 1).date(), max_value=max_date)
+    with column2:
+        entry_end = st.date_input("Last entry date", datetime(2020, 12, 31).date(), max_value=max_date)
+    exit_rule = st.radio("Sell", ["After a holding period", "On a fixed date"], horizontal=True)
+    if exit_rule == "After a holding period":
+        hold_days = st.number_input("Holding period (calendar days)", min_value=1, value=365)
+        exit_date = None
+        last_date = entry_end + timedelta(days=int(hold_days) + 1)
+    else:
+        hold_days = None
+        exit_date = st.date_input("Sell date", max_date, max_value=max_date) + timedelta(days=1)
+        last_date = exit_date
+    amount = st.number_input("Invested Amount (in dollars)", min_value=0.0, value=1000.0, format="%.2f",
+                             key="rolling_amount")
+    reinvest = st.checkbox("Reinvest dividends (use adjusted close)", value=True, key="rolling_reinvest")
+
+    if st.button("Calculate Scenarios"):
+        prices = get_aligned_prices((ticker,), entry_start, min(last_date, max_date + timedelta(days=1)),
+                                    "Adj Close" if reinvest else "Close")
+        warn_failed_downloads(prices)
+        try:
+            scenarios = rolling_entry_returns(prices, ticker, entry_start, entry_end + timedelta(days=1), amount,
+                                              hold_days=hold_days, exit_date=exit_date)
+        except ValueError as error:
+            st.error(str(error))
+            return
+        statistics = return_statistics(scenarios["Return"])
+        if not statistics:
+            st.write("No complete scenarios for these dates. Please choose an earlier entry window.")
+            return
+        columns = st.columns(len(statistics))
+        for column, (name, value) in zip(columns, statistics.items()):
+            column.metric(name, f"{value:,}" if name == "Scenarios" else f"{value:.2%}")
+
+        fig = go.Figure(line_trace(scenarios["Start Date"], scenarios["Final Amount"], name="Final Amount"))
+        fig.add_hline(y=amount, line_dash="dash", line_color="gray")
+        fig.update_layout(title=f"Final value of ${amount:,.2f} in {ticker} by entry date",
+                          xaxis_title="Entry date", yaxis_title="Final amount ($)")
+        with span('chart_render', page='revenue_calculator'):
+            st.plotly_chart(fig, use_container_width=True)
+        show_scenario_table(scenarios)
+
+max_date = datetime.now().date()
+mode = st.radio("Mode", ["Single investment", "Portfolio", "Rolling entry"], horizontal=True)
+if mode == "Portfolio":
+    show_portfolio_mode(stock_tickers, max_date)
+    st.stop()
+if mode == "Rolling entry":
+    show_rolling_entry_mode(stock_tickers, max_date)
+    st.stop()
 
 # User inputs for stock ticker and dates
 selected_ticker = st.selectbox("Select Stock Ticker", stock_tickers)
-max_date = datetime.now().date()
 column1, column2 = st.columns(2)
 
 with column1:
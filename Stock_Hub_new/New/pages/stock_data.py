@@ -1,20 +1,61 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import plotly.graph_objs as go
 from datetime import datetime, timedelta
+from services.price_store import get_price_history
+from services.charts import line_trace
+from services.metrics import span
+from services.export import show_export
+from services.bulk_download import BULK_DIR, bulk_download
+from services.ticker_universe import get_universe
 
 st.subheader("Download Historical Stock Data")
 
-# Load stock tickers from CSV file
-stock_ticker_file = 'Tickers\Stock_Tickers'
-stock_tickers = pd.read_csv(stock_ticker_file).squeeze().tolist()
+# Stock tickers from the shared ticker universe
+universe = get_universe()
+stock_tickers = universe.symbols
 
 # Function to retrieve stock data
 def fetch_stock_data(ticker_symbol, start_date, end_date, selected_attributes):
-    stock_data = yf.download(ticker_symbol, start=start_date, end=end_date)
+    stock_data = get_price_history(ticker_symbol, start_date, end_date)
     return stock_data[selected_attributes]
 
+# Function to download many tickers over a long range into the bulk dataset
+def show_bulk_download(stock_tickers):
+    st.write(f"Daily bars are saved as a Parquet dataset (one folder per ticker) in `{BULK_DIR}`. "
+             "Years already downloaded are skipped, so an interrupted download can be resumed.")
+    sectors = st.multiselect("Filter by sector", universe.sectors(), key="bulk_sectors")
+    stock_tickers = universe.filter(sectors)
+    all_tickers = st.checkbox(f"All {len(stock_tickers)} tickers" + (" in these sectors" if sectors else " in the list"), value=False)
+    tickers = stock_tickers if all_tickers else st.multiselect("Select Stock Tickers", stock_tickers, format_func=universe.label)
+    current_date = datetime.now().date()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        bulk_start = st.date_input("Start Date", datetime(1995, 1, 1).date(), max_value=current_date, key="bulk_start")
+    with col2:
+        bulk_end = st.date_input("End Date", max_value=current_date, key="bulk_end") + timedelta(days=1)
+    with col3:
+        chunk_years = st.number_input("Years per request", min_value=1, max_value=20, value=5)
+
+    if st.button("Start bulk download", disabled=not tickers):
+        progress_bar = st.progress(0.0, text="Starting...")
+
+        def report(done, total, rows):
+            progress_bar.progress(done / total, text=f"{done}/{total} requests, {rows:,} rows saved")
+
+        summary = bulk_download(tickers, bulk_start, bulk_end, years_per_request=chunk_years, progress=report)
+        progress_bar.progress(1.0, text="Done")
+        st.success(f"{summary['rows']:,} rows saved from {summary['tasks']} requests "
+                   f"({summary['skipped']} ticker-years were already on disk).")
+        for (batch, chunk_start, chunk_end), error in summary['failed'].items():
+            st.warning(f"{chunk_start} to {chunk_end} failed for {', '.join(batch)}: {error}")
+
+# Choose between one ticker and a bulk download of many
+mode = st.radio("Mode", ["Single ticker", "Bulk download"], horizontal=True)
+if mode == "Bulk download":
+    show_bulk_download(stock_tickers)
+    st.stop()
+
 # User inputs for stock selection and date range
 selected_ticker = st.selectbox("Select Stock Ticker", stock_tickers)
 current_date = datetime.now().date()
@@ -29,32 +70,31 @@ with end_date_column:
 # User input for selecting data attributes
 selected_attributes = st.multiselect("Select Attributes", ["Open", "High", "Low", "Close", "Volume", "Adj Close"])
 
-# Fetch and display data when the button is clicked
+# Fetch and display data when the button is clicked, and keep showing it so the export can be prepared
 if st.button(f"Show {selected_ticker} Data"):
-    stock_data = fetch_stock_data(selected_ticker, start_date, end_date, selected_attributes)
+    st.session_state['shown_stock_data'] = (selected_ticker, start_date, end_date, selected_attributes)
+
+if 'shown_stock_data' in st.session_state:
+    shown_ticker, shown_start, shown_end, shown_attributes = st.session_state['shown_stock_data']
+    stock_data = fetch_stock_data(shown_ticker, shown_start, shown_end, shown_attributes)
 
     # Plot the data
     fig = go.Figure()
-    for attribute in selected_attributes:
-        fig.add_trace(go.Scatter(x=stock_data.index, y=stock_data[attribute], name=attribute))
+    for attribute in shown_attributes:
+        # Volume is spiky, so its downsampling keeps each bucket's low and high
+        method = 'minmax' if attribute == 'Volume' else 'lttb'
+        fig.add_trace(line_trace(stock_data.index, stock_data[attribute], name=attribute, method=method))
     fig.update_layout(
-        title=f"{selected_ticker} Stock Data",
+        title=f"{shown_ticker} Stock Data",
         xaxis_title="Date",
         yaxis_title="Value"
     )
-    st.plotly_chart(fig)
-    st.markdown(f" #### {selected_ticker} Stock Data from {start_date} to {end_date}")
+    with span('chart_render', page='stock_data'):
+        st.plotly_chart(fig)
+    st.markdown(f" #### {shown_ticker} Stock Data from {shown_start} to {shown_end}")
     st.write(stock_data)
 
-    # Prepare and provide a CSV download
-    stock_data_reset = stock_data.reset_index()
-    stock_data_reset.rename(columns={'index': 'Date'}, inplace=True)
-    csv_data = stock_data_reset.to_csv(index=False)
-    csv_filename = f"{selected_ticker}_Stock_Data.csv"
-
-    st.download_button(
-        label=f"Download {selected_ticker} Data as CSV",
-        data=csv_data,
-        file_name=csv_filename,
-        key=f"{csv_filename}-key"
-    )
+    # Prepare and provide a download
+    stock_data_export = stock_data.rename_axis('Date')
+    show_export({shown_ticker: stock_data_export}, f"{shown_ticker}_Stock_Data", f"{shown_ticker} Data",
+                f"stock_data_export_{shown_ticker}")
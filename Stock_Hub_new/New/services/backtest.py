@@ -0,0 +1,161 @@
+import os
+import csv
+import time
+import argparse
+import itertools
+import multiprocessing
+from datetime import date
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from services.config import DATA_DIR, TICKER_FILE
+from services.forecasters import FORECASTERS, regression_metrics
+from services.price_store import get_price_matrix
+from services.ticker_universe import read_ticker_file
+
+# Walk-forward backtests for the prediction models. Every (ticker, cut-off, model)
+# job fits a forecaster on the closes before the cut-off and scores its one-step
+# predictions over the following test window with the prediction page's metrics.
+# Jobs run on a process pool with one TensorFlow/BLAS thread per worker and are handed
+# to it a few at a time, so only those jobs' series are queued for the workers. Results
+# are appended to a CSV as they finish, and a rerun skips the jobs that succeeded
+# (failed jobs are run again).
+#
+#   python -m services.backtest --models ridge,smoothing,gbt --cutoffs 12
+#   python -m services.backtest --tickers AAPL MSFT --models lstm --workers 4
+
+RESULTS_FILE = os.path.join(DATA_DIR, 'backtests', 'results.csv')
+RESULT_COLUMNS = ['ticker', 'cutoff', 'model', 'train_rows', 'test_rows', 'rmse', 'mape', 'r2', 'fit_seconds', 'error']
+MODELS = {forecaster.key: forecaster for forecaster in FORECASTERS.values()}
+
+# Jobs submitted to the pool at a time, per worker
+PENDING_JOBS_PER_WORKER = 4
+
+
+# Function to limit every worker to one TensorFlow/BLAS thread. Spawned workers
+# inherit the environment, and these variables are read when the libraries load.
+def _single_thread_environment():
+    for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                     'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+        os.environ[variable] = '1'
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+
+def run_job(ticker, cutoff, model, train_close, test_close):
+    result = {'ticker': ticker, 'cutoff': cutoff, 'model': model,
+              'train_rows': len(train_close), 'test_rows': len(test_close)}
+    started = time.perf_counter()
+    try:
+        close = np.concatenate([train_close, test_close])
+        forecaster = MODELS[model]().fit(train_close)
+        predictions = forecaster.predict_one_step(close, len(train_close))
+        result.update(regression_metrics(test_close, predictions))
+        result['error'] = ''
+    except Exception as error:
+        result.update({'rmse': None, 'mape': None, 'r2': None, 'error': str(error)})
+    result['fit_seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+# Function to read the keys of jobs that already have a successful result
+def completed_jobs(results_file):
+    if not os.path.exists(results_file):
+        return set()
+    with open(results_file, newline='') as file:
+        return {(row['ticker'], row['cutoff'], row['model']) for row in csv.DictReader(file) if not row['error']}
+
+
+# Function to run `function(*job)` for every job on the pool, with at most `max_pending` jobs
+# submitted at a time. Yields the results as they finish.
+def run_bounded(pool, function, jobs, max_pending):
+    jobs = iter(jobs)
+    pending = set()
+    while True:
+        for job in itertools.islice(jobs, max_pending - len(pending)):
+            pending.add(pool.submit(function, *job))
+        if not pending:
+            return
+        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in finished:
+            yield future.result()
+
+
+# Function to lay out the walk-forward jobs for one ticker's closes
+def plan_jobs(ticker, closes, models, n_cutoffs, step, test_days, train_days, min_train):
+    closes = closes.dropna()
+    jobs = []
+    for k in range(n_cutoffs):
+        cut = len(closes) - test_days - k * step
+        if cut < min_train:
+            break
+        train = closes.iloc[max(0, cut - train_days) if train_days else 0:cut].to_numpy()
+        test = closes.iloc[cut:cut + test_days].to_numpy()
+        cutoff = closes.index[cut].strftime('%Y-%m-%d')
+        for model in models:
+            jobs.append((ticker, cutoff, model, train, test))
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward backtests of the prediction models.')
+    parser.add_argument('--tickers', nargs='*', help='tickers to test (default: every ticker in the ticker file)')
+    parser.add_argument('--tickers-file', default=TICKER_FILE)
+    parser.add_argument('--models', default='ridge,smoothing,gbt',
+                        help=f"comma separated, from: {', '.join(MODELS)}")
+    parser.add_argument('--start', default='2015-01-01', help='first date of price history')
+    parser.add_argument('--cutoffs', type=int, default=12, help='cut-off dates per ticker')
+    parser.add_argument('--step', type=int, default=21, help='trading days between cut-offs')
+    parser.add_argument('--test-days', type=int, default=21, help='trading days scored after each cut-off')
+    parser.add_argument('--train-days', type=int, default=0, help='trailing training rows (0 = all history)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--results', default=RESULTS_FILE)
+    args = parser.parse_args()
+
+    models = [model.strip() for model in args.models.split(',') if model.strip()]
+    unknown = [model for model in models if model not in MODELS]
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)}")
+    if args.tickers:
+        tickers = args.tickers
+    else:
+        tickers = read_ticker_file(args.tickers_file)
+
+    # Load all histories up front in this process, so workers never touch the price store
+    closes = get_price_matrix(tickers, date.fromisoformat(args.start), date.today(), 'Close')
+    for ticker, error in closes.attrs['failed'].items():
+        print(f"  {ticker}: prices could not be downloaded ({error})")
+    done = completed_jobs(args.results)
+    jobs = [job for ticker in tickers
+            for job in plan_jobs(ticker, closes[ticker], models, args.cutoffs, args.step,
+                                 args.test_days, args.train_days, min_train=120)
+            if (job[0], job[1], job[2]) not in done]
+    print(f"{len(jobs)} jobs to run, {len(done)} already in {args.results}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.results)), exist_ok=True)
+    write_header = not os.path.exists(args.results)
+    started = time.perf_counter()
+    with open(args.results, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=RESULT_COLUMNS)
+        if write_header:
+            writer.writeheader()
+        _single_thread_environment()
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+            results = run_bounded(pool, run_job, jobs, args.workers * PENDING_JOBS_PER_WORKER)
+            for finished, result in enumerate(results, start=1):
+                writer.writerow(result)
+                file.flush()
+                if finished % 50 == 0 or finished == len(jobs):
+                    elapsed = time.perf_counter() - started
+                    print(f"{finished}/{len(jobs)} jobs, {finished / elapsed:.1f} jobs/s")
+
+    # A job that failed before and succeeded on a rerun has both rows; only the successful one is scored
+    results = pd.read_csv(args.results)
+    results = results[results['error'].isna()]
+    print(results.groupby('model')[['rmse', 'mape', 'r2']].mean().round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+import os
+import time
+import random
+import argparse
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from services.config import DATA_DIR, TICKER_FILE
+from services.price_store import OHLCV_COLUMNS, fetch_group
+from services.ticker_universe import read_ticker_file
+
+# Bulk historical downloads for many tickers over long date ranges. The dataset is
+# partitioned by ticker and calendar year (one Parquet file per ticker and year), so
+# the parts never depend on the requested start and end dates and reruns with other
+# dates never overlap. Consecutive years are fetched in one request per batch of
+# tickers; the requests run on a thread pool behind a shared token bucket and are
+# retried with exponential backoff. Parts of finished years are final and skipped on
+# the next run, so an interrupted download resumes; the current year is written as an
+# open part and fetched again every run. Years without bars (before a listing) are
+# written as empty parts. The source is injectable; FakeSource serves synthetic bars
+# with latency and errors.
+#
+#   python -m services.bulk_download --start 1995-01-01 --workers 4 --rate 2
+#   python -m services.bulk_download --tickers AAPL MSFT --fake --error-rate 0.3
+
+BULK_DIR = os.path.join(DATA_DIR, 'bulk')
+
+
+# Token bucket shared by the download threads: `rate` requests per second on average,
+# with bursts of up to `capacity` requests
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Raised by a source when its request failed for some of the tickers: carries the frames of the
+# tickers that came back and the error of every ticker that failed, so only those are retried
+class PartialFetchError(ConnectionError):
+    def __init__(self, frames, errors):
+        super().__init__('; '.join(f"{ticker}: {error}" for ticker, error in errors.items()))
+        self.frames = frames
+        self.errors = errors
+
+
+# Default source: one grouped yfinance request per batch of tickers. Tickers whose request failed
+# (a rate limit, a timeout) are raised as a PartialFetchError to be retried. Tickers without bars
+# in the range (not listed yet) come back as empty frames.
+def yfinance_source(tickers, start, end):
+    frames, errors = fetch_group(list(tickers), start, end)
+    if errors:
+        raise PartialFetchError({ticker: frame for ticker, frame in frames.items() if ticker not in errors}, errors)
+    return frames
+
+
+# Offline source for trying the downloader: synthetic business-day bars after a random
+# delay, failing a share of the requests and, within the other requests, a share of the
+# tickers. `listings` maps tickers to their first trading day; there are no bars before it.
+class FakeSource:
+    def __init__(self, latency=0.05, error_rate=0.2, seed=0, listings=None, ticker_error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.ticker_error_rate = ticker_error_rate
+        self.listings = listings or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.requests = []
+
+    def __call__(self, tickers, start, end):
+        with self.lock:
+            self.calls += 1
+            self.requests.append((tuple(tickers), start, end))
+            delay = self.random.uniform(0, 2 * self.latency)
+            fail = self.random.random() < self.error_rate
+            failing = {ticker for ticker in tickers if self.random.random() < self.ticker_error_rate}
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError('injected failure')
+        frames = {}
+        for ticker in tickers:
+            if ticker in failing:
+                continue
+            listed = max(start, self.listings.get(ticker, start))
+            index = pd.bdate_range(listed, end - timedelta(days=1), name='Date')
+            rng = np.random.default_rng(sum(map(ord, ticker)) * 100_003 + start.toordinal())
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))
+            frames[ticker] = pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                                           'Adj Close': close, 'Volume': rng.integers(1e5, 1e7, len(index))},
+                                          index=index)[OHLCV_COLUMNS]
+        if failing:
+            raise PartialFetchError(frames, {ticker: 'injected failure' for ticker in failing})
+        return frames
+
+
+# Function to get the calendar years that [start, end) touches, in runs of at most
+# `years_per_request` consecutive years
+def year_spans(start, end, years_per_request=5):
+    years = list(range(start.year, (end - timedelta(days=1)).year + 1))
+    return [years[i:i + years_per_request] for i in range(0, len(years), years_per_request)]
+
+
+# A year's part is final once the year is over; until then it is an open part that is fetched again
+def _is_final(year, today):
+    return date(year + 1, 1, 1) < today
+
+
+def _part_path(output, ticker, year, final=True):
+    safe_name = ticker.replace('/', '_').replace('^', '_')
+    return os.path.join(output, f"ticker={safe_name}", f"{year}.parquet" if final else f"{year}.open.parquet")
+
+
+def _write_part(frame, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame.to_parquet(path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+# Function to bring a source's frame to the dataset layout: OHLCV columns on a Date index
+def _as_bars(frame):
+    frame = frame.reindex(columns=OHLCV_COLUMNS).astype('float64')
+    frame.index = pd.DatetimeIndex(frame.index, name='Date')
+    return frame
+
+
+# Function to call the source, retrying failures with exponential backoff and jitter. After a
+# partial failure only the tickers that failed are requested again; when some still fail after
+# the last retry, a PartialFetchError carries everything that did come back.
+def fetch_with_retry(source, tickers, start, end, bucket, retries, backoff):
+    frames, pending = {}, list(tickers)
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            frames.update(source(pending, start, end))
+            return frames
+        except PartialFetchError as error:
+            frames.update(error.frames)
+            pending = [ticker for ticker in pending if ticker in error.errors]
+            if not pending:
+                return frames
+            if attempt == retries:
+                raise PartialFetchError(frames, error.errors) from error
+        except Exception as error:
+            if attempt == retries:
+                if frames:
+                    raise PartialFetchError(frames, {ticker: str(error) for ticker in pending}) from error
+                raise
+        time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+# Function to download the years that [start, end) touches for many tickers into `output`.
+# `progress(done, total, rows)` is called after every request. Returns a summary dict with the
+# requests made, the ticker-years already on disk, the rows written and the error of every
+# request (or the tickers of a request) that still failed.
+def bulk_download(tickers, start, end, output=BULK_DIR, source=yfinance_source, years_per_request=5,
+                  batch_size=20, workers=4, rate=2.0, retries=4, backoff=1.0, progress=None, today=None):
+    tickers = list(dict.fromkeys(tickers))
+    today = today or date.today()
+    tasks, skipped = [], 0
+    for years in year_spans(start, end, years_per_request):
+        years = [year for year in years if date(year, 1, 1) <= today]
+        # A ticker is requested for the span unless every year of it has a final part
+        missing = []
+        for ticker in tickers:
+            done = sum(_is_final(year, today) and os.path.exists(_part_path(output, ticker, year)) for year in years)
+            skipped += done
+            if done < len(years):
+                missing.append(ticker)
+        for i in range(0, len(missing), batch_size):
+            tasks.append((missing[i:i + batch_size], years))
+
+    bucket = TokenBucket(rate, capacity=max(1, workers))
+
+    def run(task):
+        batch, years = task
+        span_start = date(years[0], 1, 1)
+        span_end = min(date(years[-1] + 1, 1, 1), today + timedelta(days=1))
+        try:
+            frames, error = fetch_with_retry(source, batch, span_start, span_end, bucket, retries, backoff), None
+        except PartialFetchError as partial:
+            frames, error = partial.frames, partial
+        rows = 0
+        for ticker in batch:
+            if frames.get(ticker) is None:
+                continue
+            frame = _as_bars(frames[ticker])
+            for year in years:
+                # Empty years are written too, so a resumed download does not ask for them again
+                part = frame[frame.index.year == year]
+                final = _is_final(year, today)
+                _write_part(part, _part_path(output, ticker, year, final))
+                if final and os.path.exists(_part_path(output, ticker, year, final=False)):
+                    os.remove(_part_path(output, ticker, year, final=False))
+                rows += len(part)
+        # Tickers the source left out without an error have no data at all (an unknown symbol)
+        missing = [ticker for ticker in batch if frames.get(ticker) is None and not (error and ticker in error.errors)]
+        return rows, missing, error
+
+    summary = {'tasks': len(tasks), 'skipped': skipped, 'rows': 0, 'failed': {}}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run, task): task for task in tasks}
+        for done, future in enumerate(as_completed(futures), start=1):
+            batch, years = futures[future]
+            span_start, span_end = date(years[0], 1, 1), date(years[-1] + 1, 1, 1)
+            try:
+                rows, missing, error = future.result()
+                summary['rows'] += rows
+                if error:
+                    summary['failed'][(tuple(error.errors), span_start, span_end)] = error
+                if missing:
+                    summary['failed'][(tuple(missing), span_start, span_end)] = LookupError('no data returned')
+            except Exception as error:
+                summary['failed'][(tuple(batch), span_start, span_end)] = error
+            if progress:
+                progress(done, len(tasks), summary['rows'])
+    return summary
+
+
+# Function to read a bulk dataset back as one long frame (Date, Ticker, OHLCV), optionally only
+# tickers and bars in [start, end). A date stored twice (an open part next to the final part of
+# its year) is kept once, from the final part.
+def read_bulk_dataset(output=BULK_DIR, tickers=None, start=None, end=None):
+    frames = []
+    if os.path.isdir(output):
+        for folder in sorted(os.listdir(output)):
+            ticker = folder.split('=', 1)[1]
+            if tickers is not None and ticker not in tickers:
+                continue
+            # "<year>.open.parquet" sorts before "<year>.parquet", so the final part is read last
+            parts = [pd.read_parquet(os.path.join(output, folder, name))
+                     for name in sorted(os.listdir(os.path.join(output, folder))) if name.endswith('.parquet')]
+            parts = [part for part in parts if not part.empty]
+            if not parts:
+                continue
+            frame = pd.concat(parts)
+            frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+            if start is not None:
+                frame = frame[frame.index >= pd.Timestamp(start)]
+            if end is not None:
+                frame = frame[frame.index < pd.Timestamp(end)]
+            frames.append(frame.assign(Ticker=ticker).reset_index())
+    if not frames:
+        return pd.DataFrame(columns=['Date', 'Ticker'] + OHLCV_COLUMNS)
+    return pd.concat(frames, ignore_index=True)[['Date', 'Ticker'] + OHLCV_COLUMNS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk download of daily bars into a partitioned Parquet dataset.')
+    parser.add_argument('--tickers', nargs='*', help='tickers to download (default: every ticker in the ticker file)')
+    parser.add_argument('--tickers-file', default=TICKER_FILE)
+    parser.add_argument('--start', default='1990-01-01')
+    parser.add_argument('--end', default=(date.today() + timedelta(days=1)).isoformat(), help='exclusive end date')
+    parser.add_argument('--output', default=BULK_DIR)
+    parser.add_argument('--years-per-request', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=20, help='tickers per request')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=2.0, help='requests per second')
+    parser.add_argument('--retries', type=int, default=4)
+    parser.add_argument('--fake', action='store_true', help='use synthetic data instead of yfinance')
+    parser.add_argument('--latency', type=float, default=0.05, help='mean fake request latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.2, help='share of fake requests that fail')
+    parser.add_argument('--ticker-error-rate', type=float, default=0.0,
+                        help='share of tickers that fail within the other fake requests')
+    args = parser.parse_args()
+
+    if args.tickers:
+        tickers = args.tickers
+    else:
+        tickers = read_ticker_file(args.tickers_file)
+    source = (FakeSource(args.latency, args.error_rate, ticker_error_rate=args.ticker_error_rate) if args.fake
+              else yfinance_source)
+    started = time.perf_counter()
+
+    def report(done, total, rows):
+        if done % 10 == 0 or done == total:
+            print(f"{done}/{total} requests, {rows} rows, {done / (time.perf_counter() - started):.1f} requests/s")
+
+    summary = bulk_download(tickers, date.fromisoformat(args.start), date.fromisoformat(args.end), args.output,
+                            source=source, years_per_request=args.years_per_request, batch_size=args.batch_size,
+                            workers=args.workers, rate=args.rate, retries=args.retries,
+                            backoff=0.05 if args.fake else 1.0, progress=report)
+    print(f"{summary['tasks']} requests, {summary['skipped']} ticker-years already on disk, "
+          f"{summary['rows']} rows written, {len(summary['failed'])} requests failed")
+    for (batch, chunk_start, chunk_end), error in summary['failed'].items():
+        print(f"  {chunk_start} - {chunk_end} {', '.join(batch)}: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+# Shared Plotly helpers for the chart pages. Long series are downsampled before they
+# are sent to the browser (LTTB keeps the visual shape of a line, min-max keeps every
+# spike), traces switch to WebGL (Scattergl) above a point threshold, and indicator
+# panels are stacked as subplots of one figure instead of one figure each.
+
+# Most points a single line trace sends to the browser
+MAX_POINTS = 2000
+
+# Traces with more points than this are drawn with WebGL
+WEBGL_THRESHOLD = 1000
+
+
+def _as_numbers(x):
+    if isinstance(x, pd.DatetimeIndex) or np.issubdtype(np.asarray(x).dtype, np.datetime64):
+        return pd.DatetimeIndex(x).asi8.astype('float64')
+    return np.asarray(x, dtype='float64')
+
+
+# Function to pick `n_out` points of a line with Largest-Triangle-Three-Buckets. The first and
+# last points are kept, and each bucket in between keeps the point forming the largest
+# triangle with the point kept before it and the average of the next bucket.
+def lttb_indices(x, y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_numbers(x), np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x, next_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+# Function to keep the lowest and highest point of each of n_out / 2 buckets
+def minmax_indices(y, n_out):
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype='float64')
+    selected = []
+    for bucket in np.array_split(np.arange(n), n_out // 2):
+        selected.extend((bucket[np.argmin(y[bucket])], bucket[np.argmax(y[bucket])]))
+    return np.unique(selected)
+
+
+# Function to downsample one series to at most `max_points`, skipping NaN warm-up values.
+# `method` is 'lttb' for lines or 'minmax' for spiky series such as volume.
+def downsample(x, y, max_points=MAX_POINTS, method='lttb'):
+    x, y = np.asarray(x), np.asarray(y, dtype='float64')
+    valid = ~np.isnan(y)
+    if not valid.all():
+        x, y = x[valid], y[valid]
+    if len(y) <= max_points:
+        return x, y
+    indices = lttb_indices(x, y, max_points) if method == 'lttb' else minmax_indices(y, max_points)
+    return x[indices], y[indices]
+
+
+# Function to build a line trace that is downsampled and drawn with WebGL when it is long
+def line_trace(x, y, name=None, max_points=MAX_POINTS, method='lttb', **kwargs):
+    x, y = downsample(x, y, max_points, method)
+    trace = go.Scattergl if len(y) > WEBGL_THRESHOLD else go.Scatter
+    return trace(x=x, y=y, name=name, mode=kwargs.pop('mode', 'lines'), **kwargs)
+
+
+# Function to draw columns of a frame as stacked panels sharing one date axis. `panels` is a
+# list of (panel title, [columns]); columns missing from the frame are skipped, and so are
+# panels left empty. The first panel gets the most height.
+def panel_figure(data, panels, title=None, max_points=MAX_POINTS):
+    panels = [(panel_title, [column for column in columns if column in data])
+              for panel_title, columns in panels]
+    panels = [(panel_title, columns) for panel_title, columns in panels if columns]
+    if not panels:
+        return go.Figure()
+    from plotly.subplots import make_subplots
+
+    heights = [3] + [1] * (len(panels) - 1)
+    fig = make_subplots(rows=len(panels), cols=1, shared_xaxes=True, vertical_spacing=0.03,
+                        row_heights=heights, subplot_titles=[panel_title for panel_title, _ in panels])
+    for row, (_, columns) in enumerate(panels, start=1):
+        for column in columns:
+            fig.add_trace(line_trace(data.index, data[column], name=column, max_points=max_points), row=row, col=1)
+    fig.update_layout(title=title, height=350 + 180 * (len(panels) - 1), hovermode='x unified')
+    return fig
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
+
+from services.metrics import cache_lookup, span
+
+# Company profile service for the Home page cards. Each profile is one
+# Ticker.info call, trimmed to the fields the cards show, fetched on a
+# thread pool and kept in a TTL cache since company details rarely change.
+
+PROFILE_FIELDS = [
+    'longName', 'symbol', 'address1', 'city', 'state', 'country', 'industry', 'sector',
+    'previousClose', 'exchange', 'fullTimeEmployees', 'website', 'longBusinessSummary',
+    'companyOfficers',
+]
+PROFILE_TTL_SECONDS = 24 * 60 * 60
+MAX_WORKERS = 9
+
+_cache = TTLCache(maxsize=2048, ttl=PROFILE_TTL_SECONDS)
+_pending = {}
+_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='company-profiles')
+
+
+# Function to fetch one profile with a single info call
+def _fetch_profile(ticker):
+    import yfinance as yf
+    try:
+        with span('data_fetch', source='yfinance_info'):
+            info = yf.Ticker(ticker).info
+    except Exception:
+        # Not cached, so the next page view tries again
+        with _lock:
+            _pending.pop(ticker, None)
+        return {'symbol': ticker}
+    profile = {field: info.get(field) for field in PROFILE_FIELDS}
+    with _lock:
+        _cache[ticker] = profile
+        _pending.pop(ticker, None)
+    return profile
+
+
+# Function to start fetching a profile unless it is cached or already in flight
+def _submit(ticker):
+    with _lock:
+        cache_lookup('company_profiles', hit=ticker in _cache)
+        if ticker in _cache:
+            return None
+        future = _pending.get(ticker)
+        if future is None:
+            future = _pool.submit(_fetch_profile, ticker)
+            _pending[ticker] = future
+        return future
+
+
+# Function to get the profiles for a page of tickers, fetching the missing ones concurrently
+def get_profiles(tickers):
+    futures = {ticker: _submit(ticker) for ticker in tickers}
+    profiles = {}
+    for ticker, future in futures.items():
+        if future is not None:
+            profiles[ticker] = future.result()
+        else:
+            with _lock:
+                profile = _cache.get(ticker)
+            profiles[ticker] = profile if profile is not None else _fetch_profile(ticker)
+    return profiles
+
+
+# Function to warm the cache in the background, e.g. for the next page of cards
+def prefetch_profiles(tickers):
+    for ticker in tickers:
+        _submit(ticker)
@@ -0,0 +1,10 @@
+import os
+
+# Root of the Streamlit app (the folder that holds app.py)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Everything the app caches on disk lives under Data/
+DATA_DIR = os.path.join(BASE_DIR, 'Data')
+
+# Flat list of the ticker symbols the app offers, one per line
+TICKER_FILE = os.path.join(BASE_DIR, 'Tickers', 'Stock_Tickers')
@@ -0,0 +1,62 @@
+import time
+import tracemalloc
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Sliding-window datasets for the prediction models. Windows are strided views
+# over the original series, so building them copies nothing no matter how long
+# the history is.
+
+
+# Function to cut a (n, 1) or (n,) series into (lookback, 1) input windows and next-day targets.
+# Both results are read-only views into the series.
+def make_windows(series, lookback):
+    values = np.asarray(series).reshape(-1)
+    if len(values) <= lookback:
+        return np.empty((0, lookback, 1), dtype=values.dtype), np.empty(0, dtype=values.dtype)
+    x = sliding_window_view(values[:-1], lookback)[..., np.newaxis]
+    y = values[lookback:]
+    return x, y
+
+
+# Function to stream the same windows as a batched tf.data pipeline, for histories too long to feed at once
+def make_tf_dataset(series, lookback, batch_size=32, shuffle=False, seed=None):
+    import tensorflow as tf
+
+    values = np.asarray(series, dtype='float32').reshape(-1, 1)
+    return tf.keras.utils.timeseries_dataset_from_array(
+        values[:-1], values[lookback:, 0], sequence_length=lookback,
+        batch_size=batch_size, shuffle=shuffle, seed=seed)
+
+
+def _loop_windows(series, lookback):
+    x, y = [], []
+    for i in range(lookback, len(series)):
+        x.append(series[i-lookback:i, 0])
+        y.append(series[i, 0])
+    x, y = np.array(x), np.array(y)
+    return np.reshape(x, (x.shape[0], lookback, 1)), y
+
+
+def _measure(build, series, lookback, repeat=5):
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        build(series, lookback)
+    elapsed = (time.perf_counter() - started) / repeat
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+# Microbenchmark: python -m services.datasets
+if __name__ == '__main__':
+    lookback = 60
+    for years in (2, 20, 50):
+        series = np.random.default_rng(0).random((252 * years, 1))
+        loop_time, loop_peak = _measure(_loop_windows, series, lookback)
+        view_time, view_peak = _measure(make_windows, series, lookback)
+        print(f"{years:>2} years ({len(series)} rows): "
+              f"loop {loop_time * 1000:8.2f} ms, {loop_peak / 1e6:7.2f} MB peak | "
+              f"strided {view_time * 1000:6.3f} ms, {view_peak / 1e6:6.3f} MB peak")
@@ -0,0 +1,154 @@
+import os
+import gzip
+import time
+import uuid
+import zipfile
+
+from services.config import DATA_DIR
+
+# On-demand data exports for the download buttons. Frames are written to a file
+# under Data/exports only when the user asks for a download, in chunks of rows so
+# the full CSV text never sits in memory, as plain CSV, gzip CSV or Parquet.
+# Several frames are bundled into one zip archive. Old export files are removed
+# the next time an export is made. show_export() is the Prepare/Download widget
+# the pages use; it imports Streamlit itself, so the rest works without it.
+# st.download_button holds the whole file in memory for as long as it is shown, so
+# the button only appears after Prepare and goes away (with the file) once used.
+
+EXPORT_DIR = os.path.join(DATA_DIR, 'exports')
+
+# label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV (gzip)': ('.csv.gz', 'application/gzip'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+# Rows written per chunk (and per Parquet row group)
+CHUNK_ROWS = 20_000
+
+# Export files older than this are deleted
+EXPORT_TTL_SECONDS = 60 * 60
+
+
+# Function to delete export files older than `max_age` seconds
+def cleanup_exports(max_age=EXPORT_TTL_SECONDS):
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _chunks(frame):
+    for start in range(0, max(len(frame), 1), CHUNK_ROWS):
+        yield start, frame.iloc[start:start + CHUNK_ROWS]
+
+
+def _write_csv(frame, file):
+    for start, chunk in _chunks(frame):
+        chunk.to_csv(file, header=start == 0, index=True)
+
+
+def _write_parquet(frame, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for _, chunk in _chunks(frame):
+            table = pa.Table.from_pandas(chunk, preserve_index=True)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+# Function to write one frame to `path` in the given export format
+def write_frame(frame, path, export_format):
+    if export_format == 'Parquet':
+        _write_parquet(frame, path)
+    elif export_format == 'CSV (gzip)':
+        with gzip.open(path, 'wt', newline='') as file:
+            _write_csv(frame, file)
+    else:
+        with open(path, 'w', newline='') as file:
+            _write_csv(frame, file)
+
+
+def _new_path(suffix):
+    return os.path.join(EXPORT_DIR, f"{uuid.uuid4().hex}{suffix}")
+
+
+# Function to export frames for download. `frames` maps a name (e.g. the ticker) to a frame; one
+# frame becomes a single file and several become a zip archive with one file per name.
+# Returns (path on disk, file name for the download, MIME type).
+def export_frames(frames, export_format, file_name):
+    cleanup_exports()
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    extension, mime = EXPORT_FORMATS[export_format]
+
+    if len(frames) == 1:
+        path = _new_path(extension)
+        write_frame(next(iter(frames.values())), path, export_format)
+        return path, f"{file_name}{extension}", mime
+
+    path = _new_path('.zip')
+    # Plain CSV compresses well inside the archive; gzip and Parquet are already compressed
+    compression = zipfile.ZIP_DEFLATED if export_format == 'CSV' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(path, 'w', compression=compression) as archive:
+        for name, frame in frames.items():
+            member = _new_path(extension)
+            try:
+                write_frame(frame, member, export_format)
+                archive.write(member, arcname=f"{name}{extension}")
+            finally:
+                os.remove(member)
+    return path, f"{file_name}.zip", 'application/zip'
+
+
+# Function to drop a prepared export and its file, once it was downloaded or no longer matches the data
+def _discard_prepared(key):
+    import streamlit as st
+
+    prepared = st.session_state.pop(key, None)
+    if prepared:
+        try:
+            os.remove(prepared[2][0])
+        except FileNotFoundError:
+            pass
+
+
+# Function to show an export format choice and a Prepare button; the file is only written when
+# the user asks for it, and the Download button is shown until the file has been downloaded
+def show_export(frames, file_name, label, key):
+    import streamlit as st
+
+    # The prepared file belongs to this exact data; changing the selection asks for a new one
+    signature = (file_name, tuple((name, tuple(frame.columns), len(frame), str(frame.index[:1].tolist()),
+                                   str(frame.index[-1:].tolist())) for name, frame in frames.items()))
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{key}_format")
+    with col2:
+        st.write("")
+        if st.button(f"Prepare {label}", key=f"{key}_prepare"):
+            _discard_prepared(key)
+            st.session_state[key] = (signature, export_format, export_frames(frames, export_format, file_name))
+    prepared = st.session_state.get(key)
+    if not prepared:
+        return
+    if prepared[:2] != (signature, export_format) or not os.path.exists(prepared[2][0]):
+        _discard_prepared(key)
+        return
+    path, download_name, mime = prepared[2]
+    with open(path, 'rb') as file:
+        st.download_button(f"Download {label}", file, file_name=download_name, mime=mime, key=f"{key}_download",
+                           on_click=_discard_prepared, args=(key,))
@@ -0,0 +1,189 @@
+import numpy as np
+
+from services.datasets import make_windows
+
+# Pluggable forecasters for the prediction page. Every backend fits on a training
+# slice of closing prices, makes one-step-ahead predictions over a test slice and
+# forecasts a horizon of future prices, so the page and the backtests can score
+# them all with the same metrics. Only the LSTM backend needs TensorFlow, and it
+# imports it when it is first used.
+
+LOOKBACK = 60
+
+# Forecast horizon limits offered on the prediction page
+MIN_HORIZON = 7
+MAX_HORIZON = 90
+
+
+class Forecaster:
+    label = None
+    key = None
+
+    # Fit on a 1-D array of training closes
+    def fit(self, close):
+        raise NotImplementedError
+
+    # Predict close[start:], each value from the closes before it
+    def predict_one_step(self, close, start):
+        raise NotImplementedError
+
+    # Predict the `horizon` closes that follow the series
+    def forecast(self, close, horizon):
+        raise NotImplementedError
+
+
+# Autoregression on the same 60-day windows the LSTM uses. Windows and targets are
+# expressed relative to the window's last close, so tree models can follow prices
+# outside the range they were trained on.
+class WindowForecaster(Forecaster):
+    def __init__(self, lookback=LOOKBACK):
+        self.lookback = lookback
+        self.estimator = None
+
+    def make_estimator(self):
+        raise NotImplementedError
+
+    def _features(self, windows):
+        return windows / windows[:, -1:] - 1
+
+    def fit(self, close):
+        close = np.asarray(close, dtype='float64')
+        x, y = make_windows(close, self.lookback)
+        x = x[:, :, 0]
+        self.estimator = self.make_estimator()
+        self.estimator.fit(self._features(x), y / x[:, -1] - 1)
+        return self
+
+    def predict_one_step(self, close, start):
+        close = np.asarray(close, dtype='float64')
+        x, _ = make_windows(close[start - self.lookback:], self.lookback)
+        x = x[:, :, 0]
+        return x[:, -1] * (1 + self.estimator.predict(self._features(x)))
+
+    def forecast(self, close, horizon):
+        window = np.asarray(close, dtype='float64')[-self.lookback:].copy()
+        predictions = np.empty(horizon)
+        for step in range(horizon):
+            next_close = window[-1] * (1 + self.estimator.predict(self._features(window[np.newaxis, :]))[0])
+            predictions[step] = next_close
+            window[:-1] = window[1:]
+            window[-1] = next_close
+        return predictions
+
+
+class RidgeForecaster(WindowForecaster):
+    label = 'Ridge autoregression'
+    key = 'ridge'
+
+    def make_estimator(self):
+        from sklearn.linear_model import RidgeCV
+        return RidgeCV(alphas=np.logspace(-6, 1, 8))
+
+
+class GradientBoostingForecaster(WindowForecaster):
+    label = 'Gradient-boosted trees'
+    key = 'gbt'
+
+    def make_estimator(self):
+        from sklearn.ensemble import HistGradientBoostingRegressor
+        return HistGradientBoostingRegressor(max_iter=100, max_depth=3, random_state=0)
+
+
+# Holt's linear exponential smoothing. The smoothing constants are picked from a grid,
+# with every grid point filtered in the same vectorised pass over the series.
+class ExponentialSmoothingForecaster(Forecaster):
+    label = 'Exponential smoothing'
+    key = 'smoothing'
+    ALPHAS = np.linspace(0.1, 1.0, 10)
+    BETAS = np.array([0.0, 0.02, 0.05, 0.1, 0.2, 0.3])
+
+    def __init__(self):
+        self.alpha = None
+        self.beta = None
+
+    @staticmethod
+    def _filter(close, alpha, beta):
+        level = np.full(np.shape(alpha), close[0])
+        trend = np.zeros(np.shape(alpha))
+        predictions = np.empty((len(close),) + np.shape(alpha))
+        predictions[0] = close[0]
+        for t in range(1, len(close)):
+            predictions[t] = level + trend
+            new_level = alpha * close[t] + (1 - alpha) * (level + trend)
+            trend = beta * (new_level - level) + (1 - beta) * trend
+            level = new_level
+        return level, trend, predictions
+
+    def fit(self, close):
+        close = np.asarray(close, dtype='float64')
+        alpha, beta = np.meshgrid(self.ALPHAS, self.BETAS)
+        _, _, predictions = self._filter(close, alpha.ravel(), beta.ravel())
+        errors = ((predictions[1:] - close[1:, np.newaxis]) ** 2).sum(axis=0)
+        best = int(np.argmin(errors))
+        self.alpha, self.beta = alpha.ravel()[best], beta.ravel()[best]
+        return self
+
+    def predict_one_step(self, close, start):
+        _, _, predictions = self._filter(np.asarray(close, dtype='float64'), self.alpha, self.beta)
+        return predictions[start:]
+
+    def forecast(self, close, horizon):
+        level, trend, _ = self._filter(np.asarray(close, dtype='float64'), self.alpha, self.beta)
+        return level + trend * np.arange(1, horizon + 1)
+
+
+# The page's Bidirectional LSTM trained in-process, for callers such as backtests that
+# want it behind the same interface. The page itself serves it through the model
+# registry and the background training queue.
+class LSTMForecaster(Forecaster):
+    label = 'Bidirectional LSTM'
+    key = 'lstm'
+
+    def __init__(self, hyperparams=None):
+        self.hyperparams = hyperparams
+        self.model = None
+        self.scaler = None
+
+    def fit(self, close):
+        from sklearn.preprocessing import MinMaxScaler
+        from services.lstm_model import build_model, resolve_hyperparams
+
+        hyperparams = resolve_hyperparams(self.hyperparams)
+        self.scaler = MinMaxScaler()
+        scaled = self.scaler.fit_transform(np.asarray(close, dtype='float64').reshape(-1, 1))
+        x, y = make_windows(scaled, hyperparams['lookback'])
+        self.model = build_model(hyperparams)
+        self.model.fit(x, y, batch_size=hyperparams['batch_size'], epochs=hyperparams['epochs'],
+                       validation_split=hyperparams['validation_split'], verbose=0)
+        return self
+
+    def predict_one_step(self, close, start):
+        lookback = self.model.input_shape[1]
+        scaled = self.scaler.transform(np.asarray(close, dtype='float64')[start - lookback:].reshape(-1, 1))
+        x, _ = make_windows(scaled, lookback)
+        return self.scaler.inverse_transform(self.model.predict(x, verbose=0))[:, 0]
+
+    def forecast(self, close, horizon):
+        from services.forecasting import forecast_prices
+        return forecast_prices({'series': (self.model, self.scaler, close)}, horizon)['series']
+
+
+FORECASTERS = {
+    RidgeForecaster.label: RidgeForecaster,
+    ExponentialSmoothingForecaster.label: ExponentialSmoothingForecaster,
+    GradientBoostingForecaster.label: GradientBoostingForecaster,
+    LSTMForecaster.label: LSTMForecaster,
+}
+
+
+# Function to compute the metrics shown on the prediction page
+def regression_metrics(actual, predicted):
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    actual = np.asarray(actual, dtype='float64').reshape(-1)
+    predicted = np.asarray(predicted, dtype='float64').reshape(-1)
+    return {
+        'rmse': float(np.sqrt(mean_squared_error(actual, predicted))),
+        'mape': float(np.mean(np.abs((actual - predicted) / actual)) * 100),
+        'r2': float(r2_score(actual, predicted)),
+    }
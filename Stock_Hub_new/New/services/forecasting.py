@@ -0,0 +1,60 @@
+import weakref
+
+import numpy as np
+import tensorflow as tf
+
+from services.forecasters import MAX_HORIZON, MIN_HORIZON
+
+# Multi-step forecasting for the prediction models. The whole recursion runs inside
+# one compiled tf.function: each step predicts the next value for every window in
+# the batch and shifts it into a fixed-size (lookback) window buffer, so there is
+# no per-day Keras predict call and no growing history array.
+
+_compiled = weakref.WeakKeyDictionary()
+
+
+# Function to get (and cache) the compiled recursive forecast for a model
+def _recursive_forecast(model):
+    if model not in _compiled:
+        @tf.function(reduce_retracing=True)
+        def run(windows, horizon):
+            outputs = tf.TensorArray(tf.float32, size=horizon)
+            for step in tf.range(horizon):
+                prediction = tf.cast(model(windows, training=False), tf.float32)
+                outputs = outputs.write(step, prediction[:, 0])
+                windows = tf.concat([windows[:, 1:, :], prediction[:, :, tf.newaxis]], axis=1)
+            return tf.transpose(outputs.stack())
+
+        _compiled[model] = run
+    return _compiled[model]
+
+
+# Function to forecast `horizon` steps for a batch of scaled windows shaped (batch, lookback) or
+# (batch, lookback, 1). Returns scaled predictions shaped (batch, horizon).
+def forecast(model, windows, horizon):
+    if not MIN_HORIZON <= horizon <= MAX_HORIZON:
+        raise ValueError(f"Horizon must be between {MIN_HORIZON} and {MAX_HORIZON} days, got {horizon}")
+    windows = np.asarray(windows, dtype='float32')
+    windows = windows.reshape(windows.shape[0], windows.shape[1], 1)
+    return _recursive_forecast(model)(tf.constant(windows), tf.constant(horizon, dtype=tf.int32)).numpy()
+
+
+# Function to forecast prices for many tickers at once. `requests` maps each ticker to
+# (model, scaler, close_values); tickers that share a model are forecast in one batched call.
+# Returns a dict of ticker -> predicted prices for the next `horizon` days.
+def forecast_prices(requests, horizon):
+    groups = {}
+    for ticker, (model, scaler, close) in requests.items():
+        groups.setdefault(id(model), (model, []))[1].append((ticker, scaler, close))
+
+    results = {}
+    for model, members in groups.values():
+        lookback = model.input_shape[1]
+        windows = np.stack([
+            scaler.transform(np.asarray(close, dtype='float64')[-lookback:].reshape(-1, 1))[:, 0]
+            for _, scaler, close in members
+        ])
+        scaled = forecast(model, windows, horizon)
+        for (ticker, scaler, _), row in zip(members, scaled):
+            results[ticker] = scaler.inverse_transform(row.reshape(-1, 1))[:, 0]
+    return results
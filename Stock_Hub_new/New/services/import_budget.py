@@ -0,0 +1,113 @@
+import os
+import ast
+import sys
+import argparse
+import subprocess
+
+from services.config import BASE_DIR
+
+# Import-time budget check for the pages. The top-level imports of every page are
+# timed in a fresh interpreter with `python -X importtime`, and the check fails when
+# a page's cold import cost goes over its budget. Streamlit is left out: the server
+# has imported it before any page runs. tests/test_import_budget.py runs the check for
+# every page; to see the slowest imports after changing what a page or a service
+# imports at the top:
+#
+#     python -m services.import_budget
+
+PAGES_DIR = os.path.join(BASE_DIR, 'pages')
+SHARED_MODULES = {'streamlit'}
+
+# Cold import budget per page in milliseconds. Pages that chart data load pandas and plotly
+# (about 500 ms); Home is the landing page and loads neither.
+DEFAULT_BUDGET_MS = 1000
+PAGE_BUDGETS_MS = {
+    'home.py': 400,
+}
+
+
+# Function to get the source of a page's module-level import statements, without the shared modules
+def page_imports(path):
+    with open(path, encoding='utf-8') as file:
+        source = file.read()
+    statements = []
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        if any(name.split('.')[0] in SHARED_MODULES for name in names):
+            continue
+        statements.append(ast.get_source_segment(source, node))
+    return statements
+
+
+# Function to parse `-X importtime` output into [(module, cumulative ms)] for the top-level imports
+def _top_level_imports(stderr):
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if name.strip() == 'imported package':
+            continue
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 0:
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return imports
+
+
+# Function to time the statements in a fresh interpreter; returns (total ms, [(module, ms)], error)
+def measure(statements):
+    env = dict(os.environ, PYTHONPATH=BASE_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', '\n'.join(statements)],
+                            cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        error = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        return None, [], error[-1] if error else f"exit status {result.returncode}"
+    # The interpreter's own start-up imports are the same for every page and are not counted
+    baseline = {name for name, _ in _top_level_imports(
+        subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'], capture_output=True, text=True).stderr)}
+    imports = [(name, ms) for name, ms in _top_level_imports(result.stderr) if name not in baseline]
+    return sum(ms for _, ms in imports), sorted(imports, key=lambda item: -item[1]), None
+
+
+# Function to check one page against its budget; returns (total ms, budget ms, [(module, ms)], error)
+def check_page(path, default_budget_ms=DEFAULT_BUDGET_MS):
+    budget = PAGE_BUDGETS_MS.get(os.path.basename(path), default_budget_ms)
+    total, imports, error = measure(page_imports(path))
+    return total, budget, imports, error
+
+
+# Function to list every page file
+def page_paths():
+    return sorted(os.path.join(PAGES_DIR, name) for name in os.listdir(PAGES_DIR) if name.endswith('.py'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the cold import time of every page against its budget.')
+    parser.add_argument('pages', nargs='*', help='page files (default: every page)')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='budget for pages without their own entry in PAGE_BUDGETS_MS')
+    parser.add_argument('--top', type=int, default=3, help='slowest imports shown per page')
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.pages or page_paths():
+        page = os.path.basename(path)
+        total, budget, imports, error = check_page(path, args.budget_ms)
+        if error:
+            print(f"ERROR {page}: {error}")
+            failed = True
+            continue
+        over = total > budget
+        failed |= over
+        slowest = ', '.join(f"{name} {ms:.0f} ms" for name, ms in imports[:args.top])
+        print(f"{'OVER ' if over else 'ok   '} {page}: {total:.0f} ms of {budget:.0f} ms ({slowest})")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Technical indicator engine for the indicators page. Each selected indicator is
+# planned as a small dependency graph of intermediate series (rolling means and
+# standard deviations, rolling highs and lows, EMAs...), every intermediate is
+# computed once with vectorised NumPy kernels and shared by the indicators that
+# need it. The kernels work along axis 0, so the same code runs on one ticker's
+# columns or on a (dates x tickers) matrix. Results match the `ta` functions the
+# page used before, with the same windows and NaN warm-up periods.
+
+TECHNICAL_INDICATORS = [
+    "Moving average of 20", "Moving average of 50", "Standard deviation", "Relative Strength Index",
+    "Moving average convergence divergence", "Average Directional Index", "Stochastic Oscillator (%K)",
+    "Stochastic Oscillator (%D)", "Bollinger Bands (bb_bbm)", "Bollinger Bands (bb_bbh)",
+    "Bollinger Bands (bb_bbl)", "Money Flow Index",
+]
+
+INPUT_COLUMNS = {'close': 'Close', 'high': 'High', 'low': 'Low', 'volume': 'Volume'}
+
+
+# ---- kernels ---------------------------------------------------------------------------
+
+def _shift(x, periods=1):
+    shifted = np.full_like(x, np.nan)
+    shifted[periods:] = x[:-periods]
+    return shifted
+
+
+# Function to get rolling sums and counts of the non-NaN values in each window
+def _rolling_sum(x, window):
+    valid = ~np.isnan(x)
+    zero_row = np.zeros((1,) + x.shape[1:])
+    sums = np.concatenate([zero_row, np.cumsum(np.where(valid, x, 0.0), axis=0)])
+    counts = np.concatenate([zero_row, np.cumsum(valid, axis=0)])
+    lagged = np.maximum(np.arange(1, len(x) + 1) - window, 0)
+    return sums[1:] - sums[lagged], counts[1:] - counts[lagged]
+
+
+def rolling_mean(x, window, min_periods=None):
+    sums, counts = _rolling_sum(x, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts
+    return np.where(counts >= (window if min_periods is None else max(min_periods, 1)), mean, np.nan)
+
+
+# Population (ddof=0) rolling standard deviation, like ta's Bollinger bands
+def rolling_std(x, window, min_periods=None):
+    centered = x - np.nanmean(x, axis=0)
+    sums, counts = _rolling_sum(centered, window)
+    squares, _ = _rolling_sum(centered * centered, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = np.maximum(squares / counts - (sums / counts) ** 2, 0.0)
+    return np.where(counts >= (window if min_periods is None else max(min_periods, 1)), np.sqrt(variance), np.nan)
+
+
+def _rolling_extreme(x, window, reducer):
+    result = np.full_like(x, np.nan)
+    if len(x) >= window:
+        with warnings.catch_warnings():
+            # All-NaN windows are expected here and masked out below
+            warnings.simplefilter('ignore', RuntimeWarning)
+            result[window - 1:] = reducer(sliding_window_view(x, window, axis=0), axis=-1)
+    _, counts = _rolling_sum(x, window)
+    return np.where(counts >= window, result, np.nan)
+
+
+def rolling_min(x, window):
+    return _rolling_extreme(x, window, np.nanmin)
+
+
+def rolling_max(x, window):
+    return _rolling_extreme(x, window, np.nanmax)
+
+
+# Function to run y[t] = decay * y[t-1] + inputs[t] along axis 0, starting from `first`
+def _recurrence(first, inputs, decay):
+    if len(inputs) == 0:
+        return first[np.newaxis]
+    # scipy.signal takes about a second to import, so it is only loaded once an EMA is needed
+    from scipy.signal import lfilter
+    rest, _ = lfilter([1.0], [1.0, -decay], inputs, axis=0, zi=(decay * first)[np.newaxis])
+    return np.concatenate([first[np.newaxis], rest])
+
+
+# Exponential moving average with adjust=False, like pandas' ewm(...).mean()
+def ema(x, alpha, min_periods=0):
+    if np.isnan(x).any():
+        smoothed = pd.DataFrame(x.reshape(len(x), -1)).ewm(alpha=alpha, min_periods=min_periods, adjust=False).mean()
+        return smoothed.to_numpy().reshape(x.shape)
+    if len(x) == 0:
+        return x.copy()
+    smoothed = _recurrence(x[0], alpha * x[1:], 1 - alpha)
+    smoothed[:max(min_periods - 1, 0)] = np.nan
+    return smoothed
+
+
+def rsi(close, window):
+    diff = close - _shift(close)
+    with np.errstate(invalid='ignore'):
+        up = np.where(diff > 0, diff, 0.0)
+        down = np.where(diff < 0, -diff, 0.0)
+    ema_up = ema(up, 1 / window, window)
+    ema_down = ema(down, 1 / window, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(ema_down == 0, 100.0, 100 - 100 / (1 + ema_up / ema_down))
+
+
+# Average Directional Index with ta's Wilder smoothing and warm-up (zeros before the first value)
+def adx(high, low, close, window):
+    n = len(close)
+    if n < 2 * window:
+        raise ValueError(f"at least {2 * window} rows are needed, got {n}")
+    close_prev = _shift(close)
+    with np.errstate(invalid='ignore'):
+        movement = np.maximum(high, close_prev) - np.minimum(low, close_prev)
+        diff_up = high - _shift(high)
+        diff_down = _shift(low) - low
+        pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+        neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    decay = 1 - 1 / window
+
+    def smooth(values):
+        smoothed = _recurrence(values[1:window + 1].sum(axis=0), values[window + 1:n], decay)
+        return np.concatenate([smoothed, np.zeros((1,) + values.shape[1:])])
+
+    trs, dip, din = smooth(movement), smooth(pos), smooth(neg)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        di_plus = np.where(trs != 0, 100 * dip / trs, 0.0)
+        di_minus = np.where(trs != 0, 100 * din / trs, 0.0)
+        total = di_plus + di_minus
+        directional_index = np.where(total != 0, 100 * np.abs((di_plus - di_minus) / total), 0.0)
+
+    m = len(trs)
+    first = directional_index[:window].mean(axis=0)
+    tail = _recurrence(first, directional_index[window:m - 1] / window, (window - 1) / window)
+    zeros = np.zeros((window - 1 + window,) + close.shape[1:])
+    return np.concatenate([zeros, tail])
+
+
+def money_flow_index(high, low, close, volume, window):
+    typical_price = (high + low + close) / 3.0
+    previous = _shift(typical_price)
+    with np.errstate(invalid='ignore'):
+        up_down = np.where(typical_price > previous, 1, np.where(typical_price < previous, -1, 0))
+        flow = typical_price * volume * up_down
+        positive, counts = _rolling_sum(np.where(flow >= 0, flow, 0.0), window)
+        negative, _ = _rolling_sum(np.where(flow < 0, flow, 0.0), window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mfi = 100 - 100 / (1 + positive / np.abs(negative))
+    return np.where(counts >= window, mfi, np.nan)
+
+
+# ---- dependency graph ------------------------------------------------------------------
+
+# node -> (function of its dependencies, dependency nodes)
+NODES = {
+    'sma_20': (lambda close: rolling_mean(close, 20), ('close',)),
+    'sma_50': (lambda close: rolling_mean(close, 50), ('close',)),
+    'std_20': (lambda close: rolling_std(close, 20), ('close',)),
+    # ta's "Standard deviation" column uses fillna=True, so the first 19 rows use the expanding window
+    'std_20_filled': (lambda close: rolling_std(close, 20, min_periods=1), ('close',)),
+    'low_min_14': (lambda low: rolling_min(low, 14), ('low',)),
+    'high_max_14': (lambda high: rolling_max(high, 14), ('high',)),
+    'ema_12': (lambda close: ema(close, 2 / 13, 12), ('close',)),
+    'ema_26': (lambda close: ema(close, 2 / 27, 26), ('close',)),
+    'stoch_k': (lambda close, low_min, high_max: 100 * (close - low_min) / (high_max - low_min),
+                ('close', 'low_min_14', 'high_max_14')),
+}
+
+# indicator -> (function of its dependencies, dependency nodes)
+INDICATORS = {
+    "Moving average of 20": (lambda sma: sma, ('sma_20',)),
+    "Moving average of 50": (lambda sma: sma, ('sma_50',)),
+    "Standard deviation": (lambda std: 2 * std, ('std_20_filled',)),
+    "Relative Strength Index": (lambda close: rsi(close, 14), ('close',)),
+    "Moving average convergence divergence": (lambda fast, slow: fast - slow, ('ema_12', 'ema_26')),
+    "Average Directional Index": (lambda high, low, close: adx(high, low, close, 14), ('high', 'low', 'close')),
+    "Stochastic Oscillator (%K)": (lambda k: k, ('stoch_k',)),
+    "Stochastic Oscillator (%D)": (lambda k: rolling_mean(k, 3), ('stoch_k',)),
+    "Bollinger Bands (bb_bbm)": (lambda sma: sma, ('sma_20',)),
+    "Bollinger Bands (bb_bbh)": (lambda sma, std: sma + 2 * std, ('sma_20', 'std_20')),
+    "Bollinger Bands (bb_bbl)": (lambda sma, std: sma - 2 * std, ('sma_20', 'std_20')),
+    "Money Flow Index": (lambda high, low, close, volume: money_flow_index(high, low, close, volume, 14),
+                         ('high', 'low', 'close', 'volume')),
+}
+
+
+# Function to list the nodes needed for some indicators, each once, dependencies first
+def plan(indicators):
+    order = []
+
+    def visit(node):
+        if node in order or node in INPUT_COLUMNS:
+            return
+        for dependency in NODES[node][1]:
+            visit(dependency)
+        order.append(node)
+
+    for indicator in indicators:
+        for dependency in INDICATORS[indicator][1]:
+            visit(dependency)
+    return order
+
+
+# Function to compute indicators from input arrays keyed 'close', 'high', 'low', 'volume'.
+# Returns a dict of indicator -> array; an indicator that cannot be computed maps to the error.
+def compute(inputs, indicators):
+    values = {name: np.asarray(array, dtype='float64') for name, array in inputs.items()}
+    for node in plan(indicators):
+        function, dependencies = NODES[node]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values[node] = function(*(values[dependency] for dependency in dependencies))
+
+    results = {}
+    for indicator in indicators:
+        function, dependencies = INDICATORS[indicator]
+        try:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                results[indicator] = function(*(values[dependency] for dependency in dependencies))
+        except ValueError as error:
+            results[indicator] = error
+    return results
+
+
+# Function to compute indicators for an OHLCV frame
+def compute_frame(data, indicators):
+    inputs = {name: data[column].to_numpy() for name, column in INPUT_COLUMNS.items() if column in data}
+    return compute(inputs, indicators)
@@ -0,0 +1,406 @@
+import os
+import copy
+import math
+import pickle
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from services.indicator_engine import TECHNICAL_INDICATORS, compute_frame
+from services.metrics import cache_lookup, timed
+from services.price_store import PRICE_DIR
+
+# Incremental technical indicators. The state objects below carry just enough to
+# produce the next value of every indicator from one new bar in O(1): running sums
+# for the moving averages and Bollinger bands, EMA carries for MACD and RSI,
+# monotonic deques for the stochastic high/low, Wilder smoothing for ADX and a
+# rolling flow window for MFI. The state and the indicator columns are saved next
+# to the ticker's price history, so a rerun that only adds today's bar updates the
+# saved columns instead of recomputing the full history. A missing value (NaN) is
+# handled the way the engine's kernels handle it, so one gap in the prices only
+# affects the windows that contain it, as in the full computation.
+
+NAN = float('nan')
+
+# Saved entries of another version are rebuilt instead of extended, since their state objects differ
+STATE_VERSION = 2
+
+
+class RollingMean:
+    def __init__(self, window, min_periods=None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.values = deque()
+        self.total = 0.0
+        self.count = 0
+
+    def update(self, value):
+        self.values.append(value)
+        if not math.isnan(value):
+            self.total += value
+            self.count += 1
+        if len(self.values) > self.window:
+            dropped = self.values.popleft()
+            if not math.isnan(dropped):
+                self.total -= dropped
+                self.count -= 1
+        return self.total / self.count if self.count >= max(self.min_periods, 1) else NAN
+
+
+# Population (ddof=0) rolling standard deviation from running sums around a fixed anchor,
+# over the values in the window that are not NaN
+class RollingStd:
+    def __init__(self, window, min_periods=None):
+        self.window = window
+        self.min_periods = window if min_periods is None else min_periods
+        self.values = deque()
+        self.anchor = None
+        self.total = 0.0
+        self.squares = 0.0
+        self.count = 0
+
+    def update(self, value):
+        if self.anchor is None and not math.isnan(value):
+            self.anchor = value
+        shifted = value - self.anchor if self.anchor is not None else NAN
+        self.values.append(shifted)
+        if not math.isnan(shifted):
+            self.total += shifted
+            self.squares += shifted * shifted
+            self.count += 1
+        if len(self.values) > self.window:
+            dropped = self.values.popleft()
+            if not math.isnan(dropped):
+                self.total -= dropped
+                self.squares -= dropped * dropped
+                self.count -= 1
+        count = self.count
+        if count < max(self.min_periods, 1):
+            return NAN
+        return math.sqrt(max(self.squares / count - (self.total / count) ** 2, 0.0))
+
+
+# EMA with adjust=False, like pandas' ewm(...).mean(): a NaN keeps the last value, and the weight
+# of the last value decays for every NaN bar before the next value is mixed in
+class EMA:
+    def __init__(self, alpha, min_periods=0):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = None
+        self.old_weight = 1.0
+        self.count = 0
+
+    def update(self, value):
+        observed = not math.isnan(value)
+        if self.value is None:
+            if observed:
+                self.value = value
+        elif not observed:
+            self.old_weight *= 1 - self.alpha
+        elif self.old_weight == 1.0:
+            self.value = self.alpha * value + (1 - self.alpha) * self.value
+        else:
+            old_weight = self.old_weight * (1 - self.alpha)
+            self.value = (old_weight * self.value + self.alpha * value) / (old_weight + self.alpha)
+            self.old_weight = 1.0
+        self.count += observed
+        return self.value if self.value is not None and self.count >= max(self.min_periods, 1) else NAN
+
+
+class RSI:
+    def __init__(self, window):
+        self.previous = None
+        self.up = EMA(1 / window, window)
+        self.down = EMA(1 / window, window)
+
+    def update(self, close):
+        diff = 0.0 if self.previous is None else close - self.previous
+        self.previous = close
+        # A change to or from a missing close counts as no change, like the engine
+        if math.isnan(diff):
+            diff = 0.0
+        up = self.up.update(max(diff, 0.0))
+        down = self.down.update(max(-diff, 0.0))
+        if math.isnan(down):
+            return NAN
+        return 100.0 if down == 0 else 100 - 100 / (1 + up / down)
+
+
+# Rolling min or max over the last `window` bars with a monotonic deque; NaN while a
+# missing value is in the window
+class RollingExtreme:
+    def __init__(self, window, is_max):
+        self.window = window
+        self.is_max = is_max
+        self.candidates = deque()
+        self.position = -1
+        self.last_missing = -1
+
+    def update(self, value):
+        self.position += 1
+        if math.isnan(value):
+            self.last_missing = self.position
+        else:
+            while self.candidates and (self.candidates[-1][1] <= value if self.is_max else self.candidates[-1][1] >= value):
+                self.candidates.pop()
+            self.candidates.append((self.position, value))
+        if self.candidates and self.candidates[0][0] <= self.position - self.window:
+            self.candidates.popleft()
+        if self.position < self.window - 1 or self.position - self.last_missing < self.window:
+            return NAN
+        return self.candidates[0][1]
+
+
+class Stochastic:
+    def __init__(self, window, smooth_window):
+        self.lowest = RollingExtreme(window, is_max=False)
+        self.highest = RollingExtreme(window, is_max=True)
+        self.signal = RollingMean(smooth_window)
+        self.k = NAN
+        self.d = NAN
+
+    def update(self, high, low, close):
+        lowest, highest = self.lowest.update(low), self.highest.update(high)
+        span = highest - lowest
+        self.k = NAN if math.isnan(span) or span == 0 else 100 * (close - lowest) / span
+        self.d = self.signal.update(self.k)
+        return self.k
+
+
+# ADX with ta's Wilder smoothing and warm-up: zeros until bar 2*window-1, which is the
+# mean of the first `window` directional index values, then the Wilder recursion.
+class ADX:
+    def __init__(self, window):
+        self.window = window
+        self.bars = 0
+        self.previous = None
+        self.trs = self.dip = self.din = 0.0
+        self.directional_index = []
+        self.value = 0.0
+
+    def update(self, high, low, close):
+        window = self.window
+        self.bars += 1
+        if self.previous is None:
+            self.previous = (high, low, close)
+            return 0.0
+        previous_high, previous_low, previous_close = self.previous
+        self.previous = (high, low, close)
+
+        # np.maximum/np.minimum in the engine propagate NaN, Python's max/min depend on the argument order
+        if math.isnan(previous_close) or math.isnan(high) or math.isnan(low):
+            movement = NAN
+        else:
+            movement = max(high, previous_close) - min(low, previous_close)
+        diff_up, diff_down = high - previous_high, previous_low - low
+        pos = diff_up if diff_up > diff_down and diff_up > 0 else 0.0
+        neg = diff_down if diff_down > diff_up and diff_down > 0 else 0.0
+
+        bar = self.bars - 1
+        if bar <= window:
+            # The first smoothed values are plain sums over bars 1..window
+            self.trs, self.dip, self.din = self.trs + movement, self.dip + pos, self.din + neg
+            if bar < window:
+                return 0.0
+        else:
+            decay = 1 - 1 / window
+            self.trs = decay * self.trs + movement
+            self.dip = decay * self.dip + pos
+            self.din = decay * self.din + neg
+
+        di_plus = 100 * self.dip / self.trs if self.trs != 0 else 0.0
+        di_minus = 100 * self.din / self.trs if self.trs != 0 else 0.0
+        total = di_plus + di_minus
+        directional_index = 100 * abs((di_plus - di_minus) / total) if total != 0 else 0.0
+
+        if bar < 2 * window - 1:
+            self.directional_index.append(directional_index)
+            return 0.0
+        if bar == 2 * window - 1:
+            self.directional_index.append(directional_index)
+            self.value = sum(self.directional_index) / window
+            self.directional_index = []
+            return self.value
+        self.value = (self.value * (window - 1) + directional_index) / window
+        return self.value
+
+
+class MoneyFlowIndex:
+    def __init__(self, window):
+        self.window = window
+        self.previous = None
+        self.flows = deque()
+        self.positive = 0.0
+        self.negative = 0.0
+
+    def update(self, high, low, close, volume):
+        typical_price = (high + low + close) / 3.0
+        direction = 0
+        if self.previous is not None:
+            direction = 1 if typical_price > self.previous else -1 if typical_price < self.previous else 0
+        self.previous = typical_price
+        flow = typical_price * volume * direction
+        # A bar with a missing price or volume adds no flow, like the engine
+        if math.isnan(flow):
+            flow = 0.0
+        self.flows.append(flow)
+        if flow >= 0:
+            self.positive += flow
+        else:
+            self.negative += flow
+        if len(self.flows) > self.window:
+            dropped = self.flows.popleft()
+            if dropped >= 0:
+                self.positive -= dropped
+            else:
+                self.negative -= dropped
+        if len(self.flows) < self.window:
+            return NAN
+        if self.negative == 0:
+            return 100.0 if self.positive != 0 else NAN
+        return 100 - 100 / (1 + self.positive / abs(self.negative))
+
+
+# Incremental state for every indicator of the indicators page
+class IndicatorState:
+    def __init__(self):
+        self.sma_20 = RollingMean(20)
+        self.sma_50 = RollingMean(50)
+        self.std_20 = RollingStd(20)
+        self.std_20_filled = RollingStd(20, min_periods=1)
+        self.rsi = RSI(14)
+        self.ema_12 = EMA(2 / 13, 12)
+        self.ema_26 = EMA(2 / 27, 26)
+        self.adx = ADX(14)
+        self.stochastic = Stochastic(14, 3)
+        self.mfi = MoneyFlowIndex(14)
+        self.rows = 0
+
+    # Function to feed one bar and get every indicator's value for it
+    def update(self, high, low, close, volume):
+        self.rows += 1
+        sma_20, std_20 = self.sma_20.update(close), self.std_20.update(close)
+        k = self.stochastic.update(high, low, close)
+        return {
+            "Moving average of 20": sma_20,
+            "Moving average of 50": self.sma_50.update(close),
+            "Standard deviation": 2 * self.std_20_filled.update(close),
+            "Relative Strength Index": self.rsi.update(close),
+            "Moving average convergence divergence": self.ema_12.update(close) - self.ema_26.update(close),
+            "Average Directional Index": self.adx.update(high, low, close),
+            "Stochastic Oscillator (%K)": k,
+            "Stochastic Oscillator (%D)": self.stochastic.d,
+            "Bollinger Bands (bb_bbm)": sma_20,
+            "Bollinger Bands (bb_bbh)": sma_20 + 2 * std_20,
+            "Bollinger Bands (bb_bbl)": sma_20 - 2 * std_20,
+            "Money Flow Index": self.mfi.update(high, low, close, volume),
+        }
+
+
+def _bars(data):
+    return data[['High', 'Low', 'Close', 'Volume']].to_numpy(dtype='float64')
+
+
+# Function to replay a whole history through a fresh state
+def build_state(data):
+    state = IndicatorState()
+    for high, low, close, volume in _bars(data):
+        state.update(high, low, close, volume)
+    return state
+
+
+# ---- persistence next to the price store ---------------------------------------------------
+
+_lock = threading.Lock()
+
+
+def _state_path(ticker, start):
+    safe_name = ticker.replace('/', '_').replace('^', '_')
+    return os.path.join(PRICE_DIR, f"{safe_name}.{pd.Timestamp(start).date().isoformat()}.indicators.pkl")
+
+
+def _load(path):
+    try:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def _save(path, saved):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as file:
+        pickle.dump(saved, file)
+    os.replace(path + '.tmp', path)
+
+
+# Function to rebuild the saved columns and state from scratch
+def _rebuild(data):
+    results = compute_frame(data, TECHNICAL_INDICATORS)
+    if any(isinstance(values, Exception) for values in results.values()):
+        return None, results
+    bars = _bars(data)
+    # The state before the last bar is kept as well, since the last bar may still change intraday
+    state_before_last = build_state(data.iloc[:-1])
+    state = copy.deepcopy(state_before_last)
+    state.update(*bars[-1])
+    saved = {'columns': pd.DataFrame(results, index=data.index), 'bars': bars,
+             'state': state, 'state_before_last': state_before_last, 'version': STATE_VERSION}
+    return saved, results
+
+
+# Function to bring the saved columns up to date with `data`. Returns the saved entry itself when
+# nothing changed, an extended entry when bars were appended, or None if the history differs.
+def _extend(saved, data):
+    if saved.get('version') != STATE_VERSION:
+        return None
+    columns, saved_bars = saved['columns'], saved['bars']
+    bars = _bars(data)
+    known = len(columns)
+    if len(bars) <= known:
+        # A shorter (or the same) date range reads straight from the saved columns
+        unchanged = data.index.equals(columns.index[:len(bars)]) and np.array_equal(bars, saved_bars[:len(bars)])
+        return saved if unchanged else None
+    if not data.index[:known].equals(columns.index) or not np.array_equal(bars[:known - 1], saved_bars[:-1]):
+        return None
+
+    state = saved['state']
+    if not np.array_equal(bars[known - 1], saved_bars[-1]):
+        # Only the last saved bar changed (an intraday refresh): roll back one bar and replay it
+        state = copy.deepcopy(saved['state_before_last'])
+        columns = columns.iloc[:-1]
+        known -= 1
+
+    rows = []
+    for position in range(known, len(bars)):
+        if position == len(bars) - 1:
+            state_before_last = copy.deepcopy(state)
+        rows.append(state.update(*bars[position]))
+    columns = pd.concat([columns, pd.DataFrame(rows, index=data.index[known:])])
+    return {'columns': columns, 'bars': bars, 'state': state, 'state_before_last': state_before_last,
+            'version': STATE_VERSION}
+
+
+# Function to get the indicator columns for a ticker's history that starts at `start`.
+# Saved columns are reused and only new bars are pushed through the incremental state.
+# Returns a dict of indicator -> array (or the error) like indicator_engine.compute_frame.
+@timed('indicator_compute')
+def cached_indicators(ticker, start, data, selected_indicators):
+    if data.empty:
+        return compute_frame(data, selected_indicators)
+    path = _state_path(ticker, start)
+    with _lock:
+        saved = _load(path)
+        updated = _extend(saved, data) if saved is not None else None
+        cache_lookup('indicator_state', hit=updated is not None)
+        if updated is None:
+            updated, results = _rebuild(data)
+            if updated is None:
+                return {indicator: results[indicator] for indicator in selected_indicators}
+        if updated is not saved:
+            _save(path, updated)
+
+    columns = updated['columns'].iloc[:len(data)]
+    return {indicator: columns[indicator].to_numpy() for indicator in selected_indicators}
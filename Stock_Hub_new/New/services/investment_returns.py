@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# Vectorised investment scenarios for the revenue calculator. Prices for all tickers
+# come as one aligned (dates x tickers) matrix, and every scenario is reduced to two
+# row lookups: the first trading day on or after its start date and the last trading
+# day before its (exclusive) end date, both found with searchsorted over the shared
+# date index. With Adj Close prices the returns include reinvested dividends.
+
+
+# Function to compute many (ticker, start, end, amount) scenarios at once on a price matrix.
+# Dates may be anything pandas can turn into timestamps; `end` is exclusive, like the price store.
+# Returns one row per scenario with the entry/exit dates and prices, the return and the final amount;
+# scenarios without prices on both days get NaN.
+def scenario_returns(prices, tickers, starts, ends, amounts):
+    if prices.empty:
+        raise ValueError("No prices are available for the selected tickers and dates.")
+    tickers = np.asarray(tickers, dtype=object)
+    amounts = np.broadcast_to(np.asarray(amounts, dtype='float64'), tickers.shape)
+    dates = prices.index.values
+    starts = pd.to_datetime(np.broadcast_to(np.asarray(starts), tickers.shape)).values
+    ends = pd.to_datetime(np.broadcast_to(np.asarray(ends), tickers.shape)).values
+
+    columns = prices.columns.get_indexer(tickers)
+    safe_columns = np.maximum(columns, 0)
+    values = prices.to_numpy(dtype='float64')
+    n = len(dates)
+
+    # Per ticker, the next and the previous row holding a price, so a ticker that was not
+    # trading on a given day (not listed yet, a gap in the union index) uses its nearest bar
+    positions = np.arange(n)[:, np.newaxis]
+    priced = ~np.isnan(values)
+    next_priced = np.minimum.accumulate(np.where(priced, positions, n)[::-1], axis=0)[::-1]
+    previous_priced = np.maximum.accumulate(np.where(priced, positions, -1), axis=0)
+
+    entry = np.searchsorted(dates, starts, side='left')
+    exit_ = np.searchsorted(dates, ends, side='left') - 1
+    in_range = (columns >= 0) & (entry < n) & (exit_ >= 0)
+    entry = np.where(in_range, next_priced[np.minimum(entry, n - 1), safe_columns], n)
+    exit_ = np.where(in_range, previous_priced[np.maximum(exit_, 0), safe_columns], -1)
+    valid = in_range & (entry < n) & (exit_ > entry)
+
+    entry_rows, exit_rows = np.where(valid, entry, 0), np.where(valid, exit_, 0)
+    entry_price = np.where(valid, values[entry_rows, safe_columns], np.nan)
+    exit_price = np.where(valid, values[exit_rows, safe_columns], np.nan)
+    return_rate = exit_price / entry_price - 1
+
+    return pd.DataFrame({
+        'Stock Ticker': tickers,
+        'Start Date': np.where(valid, dates[entry_rows], np.datetime64('NaT')),
+        'End Date': np.where(valid, dates[exit_rows], np.datetime64('NaT')),
+        'Entry Price': entry_price,
+        'Exit Price': exit_price,
+        'Invested Amount': amounts,
+        'Return': return_rate,
+        'Final Amount': amounts * (1 + return_rate),
+        'Profit/Loss': amounts * return_rate,
+    })
+
+
+# Function to evaluate a portfolio of holdings ({ticker: amount}) over several (start, end) periods.
+# Returns the per-holding table and a per-period summary of the whole portfolio.
+def portfolio_returns(prices, holdings, periods):
+    tickers = list(holdings)
+    period_index = np.repeat(np.arange(len(periods)), len(tickers))
+    table = scenario_returns(
+        prices,
+        np.tile(tickers, len(periods)),
+        np.array([start for start, _ in periods], dtype='datetime64[ns]')[period_index],
+        np.array([end for _, end in periods], dtype='datetime64[ns]')[period_index],
+        np.tile([holdings[ticker] for ticker in tickers], len(periods)),
+    )
+    table.insert(0, 'Period', period_index + 1)
+
+    # Holdings without prices for a period are left out of that period's totals
+    priced = table.dropna(subset=['Return'])
+    summary = priced.groupby('Period').agg(**{
+        'Invested Amount': ('Invested Amount', 'sum'),
+        'Final Amount': ('Final Amount', 'sum'),
+        'Holdings': ('Stock Ticker', 'count'),
+    })
+    summary['Return'] = summary['Final Amount'] / summary['Invested Amount'] - 1
+    summary['Profit/Loss'] = summary['Final Amount'] - summary['Invested Amount']
+    summary.insert(0, 'Start', [periods[period - 1][0] for period in summary.index])
+    summary.insert(1, 'End', [periods[period - 1][1] for period in summary.index])
+    return table, summary
+
+
+# Function to buy `ticker` on every trading day in [entry_start, entry_end) and sell either after
+# `hold_days` calendar days or, when `exit_date` is given, on that date (exclusive, like `end` above).
+def rolling_entry_returns(prices, ticker, entry_start, entry_end, amount, hold_days=None, exit_date=None):
+    dates = prices.index
+    entry_dates = dates[(dates >= pd.Timestamp(entry_start)) & (dates < pd.Timestamp(entry_end))]
+    if exit_date is not None:
+        ends = np.full(len(entry_dates), pd.Timestamp(exit_date).to_datetime64())
+    else:
+        ends = (entry_dates + pd.Timedelta(days=hold_days)).values
+    table = scenario_returns(prices, np.full(len(entry_dates), ticker, dtype=object), entry_dates.values, ends, amount)
+    # A holding period that runs past the last price is not a finished scenario; the end is
+    # exclusive, so a period ending the day after the last price still sells on that price
+    if exit_date is None and len(dates):
+        last_end = (dates[-1] + pd.Timedelta(days=1)).to_datetime64()
+        table.loc[ends > last_end, ['End Date', 'Exit Price', 'Return', 'Final Amount', 'Profit/Loss']] = np.nan
+    return table.dropna(subset=['Return']).reset_index(drop=True)
+
+
+# Function to summarise the distribution of scenario returns
+def return_statistics(returns):
+    returns = pd.Series(returns).dropna()
+    if returns.empty:
+        return {}
+    return {
+        'Scenarios': len(returns),
+        'Mean return': returns.mean(),
+        'Median return': returns.median(),
+        'Worst return': returns.min(),
+        'Best return': returns.max(),
+        'Share positive': (returns > 0).mean(),
+    }
@@ -0,0 +1,48 @@
+from datetime import date
+
+import numpy as np
+
+# The two-layer Bidirectional LSTM used on the prediction page, split out of the
+# page so trained models can be saved, reloaded and fine-tuned by the registry.
+
+# Tickers offered on the prediction page and its default training start date
+PREDICTION_TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA", "JPM", "JNJ", "NVDA", "V", "NFLX"]
+DEFAULT_START = date(2022, 1, 1)
+
+DEFAULT_HYPERPARAMS = {
+    'lookback': 60,
+    'units': 64,
+    'dense_units': 32,
+    'epochs': 10,
+    'batch_size': 32,
+    'validation_split': 0.1,
+    'train_fraction': 0.95,
+}
+
+
+# Function to fill in any hyperparameters the caller left out
+def resolve_hyperparams(hyperparams=None):
+    resolved = dict(DEFAULT_HYPERPARAMS)
+    resolved.update(hyperparams or {})
+    return resolved
+
+
+# Function to create and compile a fresh model
+def build_model(hyperparams):
+    import tensorflow as tf
+
+    lookback, units = hyperparams['lookback'], hyperparams['units']
+    model = tf.keras.Sequential([
+        tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(units, return_sequences=True, input_shape=(lookback, 1))),
+        tf.keras.layers.Bidirectional(tf.keras.layers.LSTM(units)),
+        tf.keras.layers.Dense(hyperparams['dense_units']),
+        tf.keras.layers.Dense(1)
+    ])
+    model.compile(optimizer='adam', loss='mean_squared_error')
+    return model
+
+
+# Function to get the number of rows used for training
+def training_length(n_rows, hyperparams):
+    return int(np.ceil(n_rows * hyperparams['train_fraction']))
+
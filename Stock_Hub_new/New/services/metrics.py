@@ -0,0 +1,225 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from services.config import DATA_DIR
+
+# Process-wide instrumentation for the pages and services. Spans time a block of
+# code (a page run, a data fetch, a model fit, a chart render) and keep a count, a
+# sum, histogram buckets and the most recent durations for percentiles. Counters
+# count events, and cache lookups are a counter labelled hit or miss. Everything is
+# in memory; the Performance page reads it directly, and the exporter writes it in
+# Prometheus text format to Data/metrics/<process>.prom (for node_exporter's textfile
+# collector) and, when METRICS_PORT is set, serves it over HTTP at /metrics.
+
+METRICS_DIR = os.path.join(DATA_DIR, 'metrics')
+METRICS_PREFIX = 'stock_hub_'
+METRICS_PORT = os.environ.get('METRICS_PORT')
+EXPORT_INTERVAL_SECONDS = 15
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Durations kept per span for the percentiles
+RECENT_SAMPLES = 1000
+
+_spans = {}
+_counters = {}
+_lock = threading.Lock()
+_exporter_started = False
+
+
+class SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        for position, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[position] += 1
+                break
+
+
+def _key(name, labels):
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+# Function to record one duration (in seconds) for a span
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        stats = _spans.get(key)
+        if stats is None:
+            stats = _spans[key] = SpanStats()
+        stats.add(seconds)
+
+
+# Context manager timing a block; the time is recorded even when the block raises
+# (Streamlit's st.stop() and reruns end a page with an exception)
+@contextmanager
+def span(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+# Decorator timing every call of a function as a span
+def timed(name, **labels):
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+# Function to count cache lookups; `hits` and `misses` are numbers for batched lookups
+def cache_lookup(cache, hit=None, hits=0, misses=0):
+    if hit is not None:
+        hits, misses = (1, 0) if hit else (0, 1)
+    if hits:
+        count('cache_lookups', hits, cache=cache, result='hit')
+    if misses:
+        count('cache_lookups', misses, cache=cache, result='miss')
+
+
+# Function to summarise every span: count, mean and percentiles of the recent durations, in milliseconds
+def span_summary():
+    with _lock:
+        items = [(key, stats.count, stats.total, np.array(stats.recent)) for key, stats in _spans.items()]
+    rows = []
+    for (name, labels), total_count, total, recent in sorted(items, key=lambda item: item[0]):
+        p50, p90, p99 = (np.percentile(recent, [50, 90, 99]) * 1000).tolist() if len(recent) else (np.nan,) * 3
+        rows.append({'span': name, 'labels': dict(labels), 'count': total_count, 'mean_ms': total / total_count * 1000,
+                     'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99,
+                     'max_ms': float(recent.max()) * 1000 if len(recent) else np.nan})
+    return rows
+
+
+# Function to get the hits, misses and hit rate of every cache
+def cache_summary():
+    caches = {}
+    with _lock:
+        for (name, labels), value in _counters.items():
+            if name == 'cache_lookups':
+                labels = dict(labels)
+                caches.setdefault(labels['cache'], {'hit': 0, 'miss': 0})[labels['result']] += value
+    return [{'cache': cache, 'hits': counts['hit'], 'misses': counts['miss'],
+             'hit_rate': counts['hit'] / (counts['hit'] + counts['miss'])}
+            for cache, counts in sorted(caches.items())]
+
+
+# Function to get the counters other than cache lookups
+def counter_summary():
+    with _lock:
+        return [{'counter': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(_counters.items()) if name != 'cache_lookups']
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return '{' + ','.join(f'{label}="{_escape(value)}"' for label, value in pairs) + '}' if pairs else ''
+
+
+# Function to render every metric in the Prometheus text exposition format
+def prometheus_text():
+    with _lock:
+        spans = {key: (stats.count, stats.total, list(stats.buckets)) for key, stats in _spans.items()}
+        counters = dict(_counters)
+    lines = []
+    for metric in sorted({name for name, _ in spans}):
+        full_name = f"{METRICS_PREFIX}{metric}_seconds"
+        lines += [f"# HELP {full_name} Duration of {metric.replace('_', ' ')} in seconds.",
+                  f"# TYPE {full_name} histogram"]
+        for (name, labels), (total_count, total, buckets) in sorted(spans.items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f"{full_name}_bucket{_labels(labels, le=str(bound))} {cumulative}")
+            lines.append(f"{full_name}_bucket{_labels(labels, le='+Inf')} {total_count}")
+            lines.append(f"{full_name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{full_name}_count{_labels(labels)} {total_count}")
+    for metric in sorted({name for name, _ in counters}):
+        full_name = f"{METRICS_PREFIX}{metric}_total"
+        lines += [f"# HELP {full_name} Number of {metric.replace('_', ' ')}.", f"# TYPE {full_name} counter"]
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f"{full_name}{_labels(labels)} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+# Function to write the metrics to a .prom file, replacing it in one step so readers never see half a file
+def write_prometheus(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        file.write(prometheus_text())
+    os.replace(path + '.tmp', path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+# Function to start exporting this process's metrics: the .prom file is rewritten every
+# `interval` seconds, and with a port an HTTP endpoint serves them too. Runs once per process.
+def start_exporter(process_name='app', port=METRICS_PORT, interval=EXPORT_INTERVAL_SECONDS):
+    global _exporter_started
+    with _lock:
+        if _exporter_started:
+            return False
+        _exporter_started = True
+    path = os.path.join(METRICS_DIR, f"{process_name}.prom")
+
+    def export_forever():
+        while True:
+            time.sleep(interval)
+            try:
+                write_prometheus(path)
+            except OSError:
+                pass
+
+    threading.Thread(target=export_forever, name='metrics-exporter', daemon=True).start()
+    if port:
+        server = ThreadingHTTPServer(('', int(port)), _MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return True
@@ -0,0 +1,207 @@
+import gc
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+import numpy as np
+from cachetools import LRUCache
+
+from services.config import DATA_DIR
+from services.datasets import make_windows
+from services.lstm_model import build_model, resolve_hyperparams, training_length
+from services.metrics import cache_lookup, span
+
+# Registry of trained prediction models. Every model is saved with its fitted
+# MinMaxScaler under a key made of ticker, date range and hyperparameters, so an
+# unchanged request loads the saved model instead of training again. When a request
+# only adds a few new days to a saved range, that model is fine-tuned on the new days.
+# Only the most recently used models stay loaded in memory, and the metadata of the
+# saved models is indexed once per entry instead of being read on every lookup.
+
+MODEL_DIR = os.path.join(DATA_DIR, 'models')
+
+# Largest number of new rows that is handled by fine-tuning instead of a full retrain
+FINE_TUNE_MAX_NEW_ROWS = 20
+FINE_TUNE_EPOCHS = 2
+
+# Loaded Keras models kept in memory; each is tens of MB with its TensorFlow state
+MAX_LOADED_MODELS = 8
+
+_loaded = LRUCache(maxsize=MAX_LOADED_MODELS)
+# key -> (meta.json mtime, meta) for every saved model seen so far
+_meta_index = {}
+_lock = threading.Lock()
+
+
+# Function to build the registry key for a training request
+def model_key(ticker, start, end, hyperparams):
+    payload = json.dumps({'ticker': ticker, 'start': str(start), 'end': str(end),
+                          'hyperparams': hyperparams}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def _entry_dir(key):
+    return os.path.join(MODEL_DIR, key)
+
+
+# Function to get a saved model's metadata, reading meta.json only when it changed since the last read
+def _read_meta(key):
+    meta_path = os.path.join(_entry_dir(key), 'meta.json')
+    try:
+        mtime = os.path.getmtime(meta_path)
+    except OSError:
+        return None
+    indexed = _meta_index.get(key)
+    if indexed is not None and indexed[0] == mtime:
+        return indexed[1]
+    with open(meta_path) as file:
+        meta = json.load(file)
+    _meta_index[key] = (mtime, meta)
+    return meta
+
+
+# Function to keep a loaded model in memory. Keras models hold reference cycles, so when one
+# is evicted a collection is run to release it now rather than at some later GC pass.
+def _remember(key, entry):
+    with _lock:
+        evicting = key not in _loaded and len(_loaded) >= _loaded.maxsize
+        _loaded[key] = entry
+    if evicting:
+        gc.collect()
+
+
+def _load(key):
+    with _lock:
+        cache_lookup('models', hit=key in _loaded)
+        if key in _loaded:
+            return _loaded[key]
+    meta = _read_meta(key)
+    if meta is None:
+        return None
+    import joblib
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(os.path.join(_entry_dir(key), 'model.keras'))
+    scaler = joblib.load(os.path.join(_entry_dir(key), 'scaler.joblib'))
+    entry = (model, scaler, meta)
+    _remember(key, entry)
+    return entry
+
+
+def _save(key, model, scaler, meta):
+    import joblib
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    staging_dir = _entry_dir(key) + '.tmp'
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    model.save(os.path.join(staging_dir, 'model.keras'))
+    joblib.dump(scaler, os.path.join(staging_dir, 'scaler.joblib'))
+    with open(os.path.join(staging_dir, 'meta.json'), 'w') as file:
+        json.dump(meta, file)
+    shutil.rmtree(_entry_dir(key), ignore_errors=True)
+    os.replace(staging_dir, _entry_dir(key))
+    _meta_index[key] = (os.path.getmtime(os.path.join(_entry_dir(key), 'meta.json')), meta)
+    _remember(key, (model, scaler, meta))
+
+
+# Function to find a saved model for the same ticker, start and hyperparameters with an earlier end.
+# Models saved by the training worker since the last lookup are added to the index here.
+def _find_base(ticker, start, end, hyperparams, n_rows):
+    if not os.path.isdir(MODEL_DIR):
+        return None
+    best = None
+    for key in os.listdir(MODEL_DIR):
+        if key.endswith('.tmp'):
+            continue
+        meta = _read_meta(key)
+        if meta is None or meta['ticker'] != ticker or meta['start'] != str(start):
+            continue
+        if meta['hyperparams'] != hyperparams or meta['end'] >= str(end):
+            continue
+        new_rows = n_rows - meta['rows']
+        if 0 < new_rows <= FINE_TUNE_MAX_NEW_ROWS and (best is None or meta['end'] > best[1]['end']):
+            best = (key, meta)
+    return best
+
+
+def _train(close, hyperparams, callbacks):
+    from sklearn.preprocessing import MinMaxScaler
+
+    scaler = MinMaxScaler()
+    scaled_data = scaler.fit_transform(close.reshape(-1, 1))
+    train_data = scaled_data[0:training_length(len(scaled_data), hyperparams), :]
+    x_train, y_train = make_windows(train_data, hyperparams['lookback'])
+
+    model = build_model(hyperparams)
+    with span('model_fit', model='lstm', kind='train'):
+        history = model.fit(x_train, y_train, batch_size=hyperparams['batch_size'], epochs=hyperparams['epochs'],
+                            validation_split=hyperparams['validation_split'], verbose=0, callbacks=callbacks)
+    return model, scaler, history.history
+
+
+def _fine_tune(base_key, base_meta, close, hyperparams, callbacks):
+    import tensorflow as tf
+
+    base_model, scaler, _ = _load(base_key)
+    # Train a copy so the cached base model stays as it was saved
+    model = tf.keras.models.clone_model(base_model)
+    model.set_weights(base_model.get_weights())
+    model.compile(optimizer='adam', loss='mean_squared_error')
+
+    # Keep the saved scaler so the fine-tuned weights see inputs on the same scale
+    scaled_data = scaler.transform(close.reshape(-1, 1))
+    lookback = hyperparams['lookback']
+    old_train_len = training_length(base_meta['rows'], hyperparams)
+    new_train_len = training_length(len(scaled_data), hyperparams)
+    x_new, y_new = make_windows(scaled_data[max(old_train_len - lookback, 0):new_train_len], lookback)
+
+    history = dict(base_meta['history'])
+    if len(x_new):
+        with span('model_fit', model='lstm', kind='fine_tune'):
+            fit = model.fit(x_new, y_new, batch_size=hyperparams['batch_size'], epochs=FINE_TUNE_EPOCHS,
+                            verbose=0, callbacks=callbacks)
+        history['loss'] = history.get('loss', []) + fit.history['loss']
+        history.pop('val_loss', None)
+    return model, scaler, history
+
+
+def _store(ticker, start, end, close, hyperparams, model, scaler, history, status):
+    history = {name: [float(value) for value in values] for name, values in history.items()}
+    meta = {'ticker': ticker, 'start': str(start), 'end': str(end), 'hyperparams': hyperparams,
+            'rows': len(close), 'history': history}
+    _save(model_key(ticker, start, end, hyperparams), model, scaler, meta)
+    return model, scaler, history, status
+
+
+# Function to get a model without a full training run: the saved model for this exact
+# request, or a saved model for a shorter range fine-tuned on the new days.
+# Returns (model, scaler, history, status) with status 'loaded' or 'fine-tuned', or None.
+def load_model(ticker, start, end, close, hyperparams=None, callbacks=None):
+    hyperparams = resolve_hyperparams(hyperparams)
+    close = np.asarray(close, dtype='float64')
+
+    entry = _load(model_key(ticker, start, end, hyperparams))
+    if entry is not None and entry[2]['rows'] == len(close):
+        model, scaler, meta = entry
+        return model, scaler, meta['history'], 'loaded'
+
+    base = _find_base(ticker, start, end, hyperparams, len(close))
+    if base is None:
+        return None
+    model, scaler, history = _fine_tune(base[0], base[1], close, hyperparams, callbacks)
+    return _store(ticker, start, end, close, hyperparams, model, scaler, history, 'fine-tuned')
+
+
+# Function to get a trained model and its scaler for a request, training only when needed.
+# Returns (model, scaler, history, status) where status is 'loaded', 'fine-tuned' or 'trained'.
+def load_or_train(ticker, start, end, close, hyperparams=None, callbacks=None):
+    result = load_model(ticker, start, end, close, hyperparams, callbacks)
+    if result is not None:
+        return result
+    hyperparams = resolve_hyperparams(hyperparams)
+    close = np.asarray(close, dtype='float64')
+    model, scaler, history = _train(close, hyperparams, callbacks)
+    return _store(ticker, start, end, close, hyperparams, model, scaler, history, 'trained')
@@ -0,0 +1,128 @@
+import re
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+from cachetools import TTLCache
+
+from services.metrics import cache_lookup, span
+
+# News service for the Stock News page. Search results are cached per (ticker,
+# date window) for a few minutes, so page flips and other reruns reuse the articles
+# already downloaded. Syndicated copies of the same story are dropped by normalised
+# URL and by a hash of the normalised title. Further API pages are only requested
+# when pagination goes past the articles already fetched. The NewsAPI client is
+# injectable; anything with a compatible get_everything() works.
+
+NEWS_TTL_SECONDS = 10 * 60
+
+# Articles per NewsAPI request (the API maximum)
+API_PAGE_SIZE = 100
+
+_feeds = TTLCache(maxsize=256, ttl=NEWS_TTL_SECONDS)
+_lock = threading.Lock()
+
+
+# Function to create the default NewsAPI client
+def make_client(api_key):
+    from newsapi import NewsApiClient
+    return NewsApiClient(api_key=api_key)
+
+
+# Function to reduce a URL to scheme-less host and path, so tracking parameters and
+# mobile/www variants of the same article compare equal
+def normalise_url(url):
+    parts = urlsplit((url or '').strip())
+    host = parts.netloc.lower()
+    for prefix in ('www.', 'm.', 'amp.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return host + parts.path.rstrip('/').lower()
+
+
+# Function to hash a title without case, punctuation or a trailing " - Source" suffix
+def title_hash(title, source_name=None):
+    title = (title or '').strip()
+    if source_name and title.lower().endswith(f" - {source_name.lower()}"):
+        title = title[:-len(source_name) - 3]
+    words = re.sub(r'[^a-z0-9]+', ' ', title.lower()).split()
+    return hashlib.sha1(' '.join(words).encode()).hexdigest() if words else None
+
+
+class NewsFeed:
+    def __init__(self, client, ticker, from_date, to_date):
+        self.client = client
+        self.query = dict(q=ticker, language='en', from_param=from_date, to=to_date, sort_by='relevancy')
+        self.articles = []
+        self.total_results = None
+        self.api_pages = 0
+        self.exhausted = False
+        self.duplicates = 0
+        self.seen_urls = set()
+        self.seen_titles = set()
+        self.lock = threading.Lock()
+
+    def _add(self, articles):
+        for article in articles:
+            url = normalise_url(article.get('url'))
+            title = title_hash(article.get('title'), (article.get('source') or {}).get('name'))
+            if (url and url in self.seen_urls) or (title and title in self.seen_titles):
+                self.duplicates += 1
+                continue
+            self.seen_urls.add(url)
+            self.seen_titles.add(title)
+            self.articles.append(article)
+
+    # Function to request the next API page; an error after the first page (e.g. the plan's
+    # result limit) ends the feed instead of failing the page
+    def _fetch_next_page(self):
+        try:
+            with span('data_fetch', source='newsapi'):
+                response = self.client.get_everything(page=self.api_pages + 1, page_size=API_PAGE_SIZE, **self.query)
+        except Exception:
+            if self.api_pages == 0:
+                raise
+            self.exhausted = True
+            return
+        self.api_pages += 1
+        self.total_results = response.get('totalResults', 0)
+        articles = response.get('articles') or []
+        self._add(articles)
+        if len(articles) < API_PAGE_SIZE or self.api_pages * API_PAGE_SIZE >= self.total_results:
+            self.exhausted = True
+
+    # Function to get articles [start, stop), fetching more API pages only when needed
+    def get_articles(self, start, stop):
+        with self.lock:
+            while len(self.articles) < stop and not self.exhausted:
+                self._fetch_next_page()
+            return self.articles[start:stop]
+
+    # Function to get every article fetched so far, without calling the API
+    def fetched_articles(self):
+        with self.lock:
+            return list(self.articles)
+
+    # Number of distinct articles: exact once every page is fetched, otherwise the API's
+    # total less the duplicates seen so far
+    @property
+    def total(self):
+        with self.lock:
+            if self.api_pages == 0 and not self.exhausted:
+                self._fetch_next_page()
+            if self.exhausted:
+                return len(self.articles)
+            return max(len(self.articles), self.total_results - self.duplicates)
+
+
+# Function to get the cached feed for a ticker and date window, creating it on first use.
+# `client` is the NewsAPI client (or a stand-in) used when the feed is created.
+def get_news_feed(ticker, from_date, to_date, client):
+    key = (ticker, from_date, to_date)
+    with _lock:
+        feed = _feeds.get(key)
+        cache_lookup('news_feed', hit=feed is not None)
+        if feed is None:
+            feed = NewsFeed(client, ticker, from_date, to_date)
+            _feeds[key] = feed
+        return feed
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import defaultdict
+
+from services.news_feed import get_news_feed, normalise_url, title_hash
+
+# Watchlist news: fetches the news feeds of many tickers concurrently with asyncio.
+# A semaphore bounds the requests in flight and a per-host token bucket keeps the
+# request rate under the API's limits. The NewsAPI client is synchronous, so each
+# request runs in a worker thread; results go through the same per-ticker cache as
+# the single-ticker page. Feeds are yielded as soon as each ticker finishes, and
+# WatchlistFeed merges them into one de-duplicated feed sorted by publication time.
+
+NEWS_API_HOST = 'newsapi.org'
+
+# Requests in flight at once
+MAX_CONCURRENT_REQUESTS = 8
+
+# Requests per second allowed for each host, with bursts of up to the same number
+HOST_REQUESTS_PER_SECOND = {NEWS_API_HOST: 5.0}
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+
+
+# Async token bucket per host
+class HostRateLimiter:
+    def __init__(self, rates=None, default_rate=DEFAULT_REQUESTS_PER_SECOND):
+        self.rates = dict(HOST_REQUESTS_PER_SECOND if rates is None else rates)
+        self.default_rate = default_rate
+        self.tokens = {}
+        self.updated = {}
+        self.locks = defaultdict(asyncio.Lock)
+
+    async def acquire(self, host):
+        rate = self.rates.get(host, self.default_rate)
+        async with self.locks[host]:
+            while True:
+                now = time.monotonic()
+                tokens = min(rate, self.tokens.get(host, rate) + (now - self.updated.get(host, now)) * rate)
+                self.updated[host] = now
+                if tokens >= 1:
+                    self.tokens[host] = tokens - 1
+                    return
+                self.tokens[host] = tokens
+                await asyncio.sleep((1 - tokens) / rate)
+
+
+# Merged feed of many tickers: every article once, newest first, tagged with the tickers it came up for
+class WatchlistFeed:
+    def __init__(self):
+        self.articles = []
+        self.by_url = {}
+        self.by_title = {}
+        self.errors = {}
+        self.finished = []
+
+    # Function to merge one ticker's result from stream_watchlist_news (articles or an error)
+    def add(self, ticker, articles):
+        self.finished.append(ticker)
+        if isinstance(articles, Exception):
+            self.errors[ticker] = articles
+            return
+        for article in articles:
+            url = normalise_url(article.get('url'))
+            title = title_hash(article.get('title'), (article.get('source') or {}).get('name'))
+            existing = self.by_url.get(url) if url else None
+            if existing is None and title:
+                existing = self.by_title.get(title)
+            if existing is not None:
+                if ticker not in existing['tickers']:
+                    existing['tickers'].append(ticker)
+                continue
+            entry = dict(article, tickers=[ticker])
+            self.articles.append(entry)
+            if url:
+                self.by_url[url] = entry
+            if title:
+                self.by_title[title] = entry
+        self.articles.sort(key=lambda entry: entry.get('publishedAt') or '', reverse=True)
+
+
+# Function to fetch the first `per_ticker` articles of every ticker, yielding (ticker, articles or
+# the error) in the order the tickers finish
+async def stream_watchlist_news(tickers, from_date, to_date, client, per_ticker=20,
+                                max_concurrent=MAX_CONCURRENT_REQUESTS, limiter=None, host=NEWS_API_HOST):
+    semaphore = asyncio.Semaphore(max_concurrent)
+    limiter = limiter or HostRateLimiter()
+
+    async def fetch(ticker):
+        async with semaphore:
+            feed = get_news_feed(ticker, from_date, to_date, client)
+            # Cached feeds answer without a request, so only new ones wait for the rate limiter
+            if not feed.api_pages:
+                await limiter.acquire(host)
+            try:
+                return ticker, await asyncio.to_thread(feed.get_articles, 0, per_ticker)
+            except Exception as error:
+                return ticker, error
+
+    for next_result in asyncio.as_completed([fetch(ticker) for ticker in tickers]):
+        yield await next_result
@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from services.config import DATA_DIR, TICKER_FILE
+from services.indicator_engine import TECHNICAL_INDICATORS, compute_frame
+from services.price_store import adjust_prices, get_price_matrix, get_stored_history
+from services.ticker_universe import read_ticker_file
+
+# Nightly indicator snapshots for the whole ticker universe. The universe is split
+# into fixed shards that run on a process pool; each shard computes the indicators
+# page's columns (same engine, adjusted prices) for its tickers and writes one
+# Parquet file under Data/indicator_snapshots/run_date=<date>/. A shard file only
+# appears once it is complete, so a rerun with the same run date skips finished shards.
+# Only the parent process downloads; the workers read the price store from disk. The
+# screener reads a snapshot instead of computing when one exists for its as-of date.
+#
+#   python -m services.precompute_indicators --start 2015-01-01 --shard-size 50
+#   python -m services.precompute_indicators --run-date 2024-05-31 --workers 4
+
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'indicator_snapshots')
+SNAPSHOT_COLUMNS = ['Date', 'Ticker', 'Open', 'High', 'Low', 'Close', 'Volume'] + TECHNICAL_INDICATORS
+
+
+def _run_dir(output, run_date):
+    return os.path.join(output, f"run_date={run_date}")
+
+
+def _shard_path(run_dir, shard):
+    return os.path.join(run_dir, f"shard-{shard:05d}.parquet")
+
+
+# Function to compute every indicator for one shard of tickers and write it as one Parquet file.
+# The bars are read from the price store as stored; nothing is downloaded here.
+def run_shard(shard, tickers, start, end, run_dir):
+    started = time.perf_counter()
+    frames, errors = [], {}
+    for ticker in tickers:
+        stored, _ = get_stored_history(ticker)
+        data = adjust_prices(stored.loc[pd.Timestamp(start):pd.Timestamp(end) - pd.Timedelta(days=1)])
+        if data.empty:
+            errors[ticker] = 'no price history'
+            continue
+        frame = data[['Open', 'High', 'Low', 'Close', 'Volume']].copy()
+        for indicator, values in compute_frame(data, TECHNICAL_INDICATORS).items():
+            if isinstance(values, Exception):
+                errors[ticker] = f"{indicator}: {values}"
+                values = float('nan')
+            frame[indicator] = values
+        frame.insert(0, 'Ticker', ticker)
+        frames.append(frame.reset_index())
+
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+    table = table.reindex(columns=SNAPSHOT_COLUMNS)
+    path = _shard_path(run_dir, shard)
+    table.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+    return {'shard': shard, 'tickers': len(tickers), 'rows': len(table), 'errors': errors,
+            'seconds': time.perf_counter() - started}
+
+
+# Function to fix the shard layout of a run the first time it starts, so reruns shard identically
+def plan_shards(run_dir, tickers, shard_size, start):
+    manifest_path = os.path.join(run_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as file:
+            return json.load(file)
+    tickers = sorted(dict.fromkeys(tickers))
+    manifest = {
+        'start': start,
+        'shards': [tickers[i:i + shard_size] for i in range(0, len(tickers), shard_size)],
+    }
+    os.makedirs(run_dir, exist_ok=True)
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+# Function to list the run dates that have snapshots, oldest first
+def snapshot_dates(output=SNAPSHOT_DIR):
+    if not os.path.isdir(output):
+        return []
+    return sorted(name.split('=', 1)[1] for name in os.listdir(output) if name.startswith('run_date='))
+
+
+# Function to get the tickers and start date of a finished run (every shard written), or None
+def snapshot_coverage(run_date, output=SNAPSHOT_DIR):
+    run_dir = _run_dir(output, run_date)
+    manifest_path = os.path.join(run_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as file:
+        manifest = json.load(file)
+    if not all(os.path.exists(_shard_path(run_dir, shard)) for shard in range(len(manifest['shards']))):
+        return None
+    return {'tickers': {ticker for members in manifest['shards'] for ticker in members}, 'start': manifest['start']}
+
+
+# Function to read precomputed indicator columns, from the latest run unless `run_date` is given.
+# Returns a long frame (Date, Ticker, OHLCV, indicators), optionally limited to some tickers and columns.
+def read_snapshot(tickers=None, columns=None, run_date=None, output=SNAPSHOT_DIR):
+    dates = snapshot_dates(output)
+    run_date = run_date or (dates[-1] if dates else None)
+    if run_date is None or run_date not in dates:
+        return pd.DataFrame(columns=SNAPSHOT_COLUMNS if columns is None else ['Date', 'Ticker'] + list(columns))
+    run_dir = _run_dir(output, run_date)
+    paths = sorted(os.path.join(run_dir, name) for name in os.listdir(run_dir) if name.endswith('.parquet'))
+    read_columns = None if columns is None else ['Date', 'Ticker'] + [c for c in columns if c not in ('Date', 'Ticker')]
+    filters = None if tickers is None else [('Ticker', 'in', list(tickers))]
+    frames = [pd.read_parquet(path, columns=read_columns, filters=filters) for path in paths]
+    if not frames:
+        return pd.DataFrame(columns=read_columns or SNAPSHOT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute technical indicator snapshots for the ticker universe.')
+    parser.add_argument('--tickers', nargs='*', help='tickers to compute (default: every ticker in the ticker file)')
+    parser.add_argument('--tickers-file', default=TICKER_FILE)
+    parser.add_argument('--start', default='2015-01-01', help='first date of price history')
+    parser.add_argument('--run-date', default=date.today().isoformat(),
+                        help='snapshot date; bars up to the day before are used (default: today)')
+    parser.add_argument('--shard-size', type=int, default=50, help='tickers per shard')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    if args.tickers:
+        tickers = args.tickers
+    else:
+        tickers = read_ticker_file(args.tickers_file)
+
+    run_dir = _run_dir(args.output, args.run_date)
+    manifest = plan_shards(run_dir, tickers, args.shard_size, args.start)
+    start, end = date.fromisoformat(manifest['start']), date.fromisoformat(args.run_date)
+    pending = [(shard, members) for shard, members in enumerate(manifest['shards'])
+               if not os.path.exists(_shard_path(run_dir, shard))]
+    print(f"{len(pending)} of {len(manifest['shards'])} shards to compute in {run_dir}")
+    if not pending:
+        return
+
+    # Download missing history once, in grouped requests from this process, so the
+    # workers only read the price store from disk
+    closes = get_price_matrix([ticker for _, members in pending for ticker in members], start, end, 'Close')
+    for ticker, error in closes.attrs['failed'].items():
+        print(f"  {ticker}: prices could not be downloaded ({error})")
+
+    started = time.perf_counter()
+    done_tickers = 0
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+        futures = [pool.submit(run_shard, shard, members, start, end, run_dir) for shard, members in pending]
+        for finished, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            done_tickers += result['tickers']
+            elapsed = time.perf_counter() - started
+            print(f"shard {result['shard']:05d}: {result['tickers']} tickers, {result['rows']} rows "
+                  f"in {result['seconds']:.1f}s | {finished}/{len(futures)} shards, "
+                  f"{done_tickers / elapsed:.1f} tickers/s")
+            for ticker, error in result['errors'].items():
+                print(f"  {ticker}: {error}")
+
+
+if __name__ == '__main__':
+    main()
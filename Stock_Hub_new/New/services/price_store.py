@@ -0,0 +1,345 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from services.config import DATA_DIR
+from services.metrics import cache_lookup, span
+
+# Shared on-disk OHLCV store used by every page instead of calling yfinance directly.
+# Each ticker is kept as one Parquet file plus a small JSON sidecar that records
+# which [start, end) date ranges have already been downloaded, so widening a range
+# only fetches the days that are not on disk yet. yfinance is imported on the first
+# download, so pages that only read cached prices never pay for it.
+
+PRICE_DIR = os.path.join(DATA_DIR, 'prices')
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+# Upper bound on grouped requests running at the same time
+MAX_CONCURRENT_FETCHES = 4
+
+# Bars for the current trading day are still moving, so they are refetched after this many seconds
+LIVE_REFRESH_SECONDS = 15 * 60
+
+# An empty download for a range shorter than this is treated as "no trading days" (weekend, holiday)
+# rather than as a failed request, and is recorded as covered
+EMPTY_RANGE_DAYS = 7
+
+_entries = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+# yfinance 0.2.x collects every download's results in module globals (shared._DFS, _ERRORS) that
+# each call resets, so concurrent calls overwrite each other's tickers. Until the pin moves to a
+# version that keeps results per call, yf.download only ever runs one call at a time.
+_yfinance_lock = threading.Lock()
+
+# yfinance error messages that mean "no bars in this range" (before a listing, after a delisting)
+# rather than a failed request
+NO_BARS_ERRORS = ('no price data found', 'possibly delisted', "data doesn't exist")
+
+
+# Function to get the lock that serialises reads and writes for one ticker
+def _ticker_lock(ticker):
+    with _locks_guard:
+        if ticker not in _locks:
+            _locks[ticker] = threading.Lock()
+        return _locks[ticker]
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def _paths(ticker):
+    safe_name = ticker.replace('/', '_').replace('^', '_')
+    return os.path.join(PRICE_DIR, f"{safe_name}.parquet"), os.path.join(PRICE_DIR, f"{safe_name}.json")
+
+
+def _empty_frame():
+    frame = pd.DataFrame(columns=OHLCV_COLUMNS, dtype='float64')
+    frame.index = pd.DatetimeIndex([], name='Date')
+    return frame
+
+
+# Function to bring a yfinance download into the store's column layout
+def _normalise(frame):
+    if frame is None or frame.empty:
+        return _empty_frame()
+    frame = frame.copy()
+    if isinstance(frame.columns, pd.MultiIndex):
+        frame.columns = frame.columns.get_level_values(0)
+    if frame.index.tz is not None:
+        frame.index = frame.index.tz_localize(None)
+    frame.index = pd.DatetimeIndex(frame.index).normalize()
+    frame.index.name = 'Date'
+    for column in OHLCV_COLUMNS:
+        if column not in frame.columns:
+            frame[column] = float('nan')
+    return frame[OHLCV_COLUMNS]
+
+
+# Function to merge overlapping or touching [start, end) ranges
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+# Function to list the parts of [start, end) that are not covered yet
+def _missing_ranges(coverage, start, end):
+    missing = []
+    cursor = start
+    for covered_start, covered_end in coverage:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _load_entry(ticker):
+    data_path, meta_path = _paths(ticker)
+    mtime = os.path.getmtime(meta_path) if os.path.exists(meta_path) else None
+    entry = _entries.get(ticker)
+    if entry is not None and entry['mtime'] == mtime:
+        return entry
+
+    frame, coverage, live = _empty_frame(), [], None
+    if mtime is not None:
+        with open(meta_path) as file:
+            meta = json.load(file)
+        coverage = [[_to_date(s), _to_date(e)] for s, e in meta.get('coverage', [])]
+        live = meta.get('live')
+        if os.path.exists(data_path):
+            frame = pd.read_parquet(data_path)
+    entry = {'frame': frame, 'coverage': coverage, 'live': live, 'mtime': mtime}
+    _entries[ticker] = entry
+    return entry
+
+
+def _save_entry(ticker, entry):
+    os.makedirs(PRICE_DIR, exist_ok=True)
+    data_path, meta_path = _paths(ticker)
+    entry['frame'].to_parquet(data_path + '.tmp')
+    os.replace(data_path + '.tmp', data_path)
+    meta = {
+        'coverage': [[s.isoformat(), e.isoformat()] for s, e in entry['coverage']],
+        'live': entry['live'],
+    }
+    with open(meta_path + '.tmp', 'w') as file:
+        json.dump(meta, file)
+    os.replace(meta_path + '.tmp', meta_path)
+    entry['mtime'] = os.path.getmtime(meta_path)
+
+
+# Function to work out which ranges have to be downloaded for a request
+def _plan_fetch(entry, start, end, today):
+    ranges = _missing_ranges(entry['coverage'], start, min(end, today))
+    if end > today:
+        live = entry['live']
+        fresh = live and live['date'] == today.isoformat() and time.time() - live['fetched_at'] < LIVE_REFRESH_SECONDS
+        if not fresh:
+            ranges.append((max(start, today), end))
+    return _merge_ranges(ranges)
+
+
+# Function to fold freshly downloaded bars into a ticker's entry. The `failed` ranges were
+# requested but the request errored, so they are left uncovered and fetched again next time.
+def _apply_fetch(entry, fetched, ranges, today, failed=()):
+    frame = entry['frame']
+    if not fetched.empty:
+        frame = pd.concat([frame[~frame.index.isin(fetched.index)], fetched]).sort_index()
+    known_start = frame.index.min().date() if not frame.empty else None
+    known_end = frame.index.max().date() if not frame.empty else None
+
+    failed = {tuple(r) for r in failed}
+    coverage = list(entry['coverage'])
+    for start, end in ranges:
+        historical_end = min(end, today)
+        if historical_end <= start or (start, end) in failed:
+            continue
+        got_rows = not fetched.empty and fetched.index.to_series().between(
+            pd.Timestamp(start), pd.Timestamp(historical_end), inclusive='left').any()
+        inside_known = known_start is not None and known_start <= start and historical_end <= known_end
+        if got_rows or inside_known or (historical_end - start).days < EMPTY_RANGE_DAYS:
+            coverage.append([start, historical_end])
+    if any(end > today and (start, end) not in failed for start, end in ranges):
+        entry['live'] = {'date': today.isoformat(), 'fetched_at': time.time()}
+
+    entry['frame'] = frame
+    entry['coverage'] = _merge_ranges(coverage)
+
+
+# Function to download tickers in one request and split the result per ticker. Returns
+# ({ticker: OHLCV frame}, {ticker: error message}); the errors are the failed requests only,
+# tickers that simply have no bars in the range get an empty frame and no error.
+# The store keeps both Close and Adj Close, so yfinance must not auto-adjust (newer versions do by default).
+def fetch_group(tickers, start, end):
+    import yfinance as yf
+    from yfinance import shared
+    tickers = list(tickers)
+    with _yfinance_lock, span('data_fetch', source='yfinance'):
+        if len(tickers) == 1:
+            raw = yf.download(tickers[0], start=start, end=end, auto_adjust=False, progress=False)
+        else:
+            raw = yf.download(tickers, start=start, end=end, group_by='ticker', auto_adjust=False,
+                              threads=True, progress=False)
+        reported = dict(getattr(shared, '_ERRORS', None) or {})
+    errors = {ticker: str(reported[ticker]) for ticker in tickers
+              if ticker in reported and not any(text in str(reported[ticker]).lower() for text in NO_BARS_ERRORS)}
+
+    frames = {}
+    for ticker in tickers:
+        if len(tickers) == 1:
+            frames[ticker] = _normalise(raw)
+        elif isinstance(raw.columns, pd.MultiIndex) and ticker in raw.columns.get_level_values(0):
+            frames[ticker] = _normalise(raw[ticker].dropna(how='all'))
+        else:
+            frames[ticker] = _empty_frame()
+    return frames, errors
+
+
+# Function to download one ticker; returns (OHLCV frame, error message or None)
+def _download(ticker, start, end):
+    frames, errors = fetch_group([ticker], start, end)
+    return frames[ticker], errors.get(ticker)
+
+
+# Function to download several tickers in one grouped request and split the result per ticker.
+# Returns ({ticker: OHLCV frame}, {ticker: error message}) like fetch_group; this is the default
+# downloader of get_price_matrix.
+def download_group(tickers, start, end):
+    return fetch_group(tickers, start, end)
+
+
+# Function to get daily OHLCV bars for [start, end), downloading only what is not stored yet
+def get_price_history(ticker, start, end, adjusted=False):
+    start, end = _to_date(start), _to_date(end)
+    if start >= end:
+        return _empty_frame()
+    today = date.today()
+
+    with _ticker_lock(ticker):
+        entry = _load_entry(ticker)
+        ranges = _plan_fetch(entry, start, end, today)
+        cache_lookup('prices', hit=not ranges)
+        if ranges:
+            fetched, failed = [], []
+            for range_start, range_end in ranges:
+                frame, error = _download(ticker, range_start, range_end)
+                fetched.append(frame)
+                if error:
+                    failed.append((range_start, range_end))
+            fetched = pd.concat(fetched)
+            fetched = fetched[~fetched.index.duplicated(keep='last')]
+            _apply_fetch(entry, fetched, ranges, today, failed)
+            _save_entry(ticker, entry)
+        frame = entry['frame']
+
+    window = frame.loc[pd.Timestamp(start):pd.Timestamp(end) - pd.Timedelta(days=1)].copy()
+    if adjusted:
+        window = adjust_prices(window)
+    return window
+
+
+# Function to get every bar stored for a ticker, with a version that changes whenever the store rewrites it
+def get_stored_history(ticker):
+    with _ticker_lock(ticker):
+        entry = _load_entry(ticker)
+        return entry['frame'], entry['mtime']
+
+
+# Function to get one field (Close by default) for many tickers as a single wide frame.
+# Tickers that need the same date ranges are fetched together in one grouped request,
+# and the groups run in parallel with at most MAX_CONCURRENT_FETCHES in flight. `downloader` is
+# any function like download_group (the yfinance one runs its requests one at a time).
+# Tickers whose download failed are left uncovered and listed in the result's attrs['failed']
+# as {ticker: error message}, so the page can say which columns are missing.
+def get_price_matrix(tickers, start, end, field='Close', downloader=download_group):
+    tickers = list(dict.fromkeys(tickers))
+    start, end = _to_date(start), _to_date(end)
+    today = date.today()
+
+    groups = {}
+    for ticker in tickers:
+        with _ticker_lock(ticker):
+            ranges = _plan_fetch(_load_entry(ticker), start, end, today)
+        if ranges:
+            groups.setdefault(tuple(map(tuple, ranges)), []).append(ticker)
+    missing = sum(len(group) for group in groups.values())
+    cache_lookup('prices', hits=len(tickers) - missing, misses=missing)
+
+    def fetch_ranges(ranges, group):
+        pieces = {ticker: [] for ticker in group}
+        failed = {ticker: {} for ticker in group}
+        for range_start, range_end in ranges:
+            frames, errors = downloader(group, range_start, range_end)
+            for ticker in group:
+                if ticker in frames:
+                    pieces[ticker].append(frames[ticker])
+                # A ticker the downloader left out is as good as failed
+                if ticker in errors or ticker not in frames:
+                    failed[ticker][(range_start, range_end)] = errors.get(ticker, 'no data returned')
+        return ranges, pieces, failed
+
+    failures = {}
+    if groups:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES) as pool:
+            results = list(pool.map(lambda item: fetch_ranges(*item), groups.items()))
+        for ranges, pieces, failed in results:
+            for ticker, frames in pieces.items():
+                fetched = pd.concat(frames) if frames else _empty_frame()
+                fetched = fetched[~fetched.index.duplicated(keep='last')]
+                with _ticker_lock(ticker):
+                    entry = _load_entry(ticker)
+                    _apply_fetch(entry, fetched, [list(r) for r in ranges], today, failed[ticker])
+                    _save_entry(ticker, entry)
+                if failed[ticker]:
+                    failures[ticker] = str(list(failed[ticker].values())[-1])
+
+    lower, upper = pd.Timestamp(start), pd.Timestamp(end) - pd.Timedelta(days=1)
+    columns = {}
+    for ticker in tickers:
+        with _ticker_lock(ticker):
+            columns[ticker] = _load_entry(ticker)['frame'].loc[lower:upper, field]
+
+    # Preallocate the wide frame on the shared date index and fill it column by column
+    index = pd.DatetimeIndex(sorted(set().union(*(series.index for series in columns.values()))), name='Date')
+    values = np.full((len(index), len(tickers)), np.nan)
+    for position, ticker in enumerate(tickers):
+        series = columns[ticker]
+        values[index.get_indexer(series.index), position] = series.to_numpy(dtype='float64')
+    matrix = pd.DataFrame(values, index=index, columns=tickers)
+    matrix.attrs['failed'] = failures
+    return matrix
+
+
+# Function to scale OHLC by the Adj Close ratio, like yfinance's auto_adjust=True does
+def adjust_prices(frame):
+    frame = frame.copy()
+    ratio = frame['Adj Close'] / frame['Close']
+    for column in ['Open', 'High', 'Low']:
+        frame[column] = frame[column] * ratio
+    frame['Close'] = frame['Adj Close']
+    return frame.drop(columns=['Adj Close'])
@@ -0,0 +1,132 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from services.metrics import cache_lookup
+from services.price_store import PRICE_DIR, get_price_history, get_stored_history
+
+# Cumulative log-return index per ticker, kept next to the price cache. For every
+# stored trading day the index holds log(price / first price), and a calendar array
+# maps every calendar day to the trading day on or after it and the one before it.
+# The return between any two dates is then two array reads and a subtraction,
+# however long the history is. Indexes are rebuilt when the price store rewrites
+# the ticker, and are built for both Close and Adj Close (dividends reinvested).
+
+INDEX_FIELDS = ['Close', 'Adj Close']
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+class ReturnIndex:
+    def __init__(self, dates, log_prices):
+        # dates: datetime64[D] trading days, log_prices: {field: cumulative log returns}
+        self.dates = dates
+        self.log_prices = log_prices
+        self.first_day = dates[0] if len(dates) else None
+        days = (dates - self.first_day).astype(int) if len(dates) else np.array([], dtype=int)
+        span = days[-1] + 1 if len(days) else 0
+        # next_trading[d]: first trading position on or after calendar day d (len(dates) if none)
+        # previous_trading[d]: last trading position on or before calendar day d
+        self.next_trading = np.searchsorted(days, np.arange(span + 1), side='left')
+        self.previous_trading = np.searchsorted(days, np.arange(span + 1), side='right') - 1
+
+    # Function to turn calendar dates into trading positions in O(1) per date: the first trading
+    # day on or after `starts` and the last trading day before the exclusive `ends`
+    def positions(self, starts, ends):
+        n = len(self.dates)
+        if n == 0:
+            return np.zeros(np.shape(starts), dtype=int), np.full(np.shape(ends), -1)
+        span = len(self.next_trading) - 1
+        start_days = (np.asarray(starts, dtype='datetime64[D]') - self.first_day).astype(int)
+        end_days = (np.asarray(ends, dtype='datetime64[D]') - self.first_day).astype(int) - 1
+        entry = np.where(start_days > span, n, self.next_trading[np.clip(start_days, 0, span)])
+        exit_ = np.where(end_days < 0, -1, self.previous_trading[np.clip(end_days, 0, span)])
+        return entry, exit_
+
+    # Function to get the returns for [start, end) ranges (scalars or arrays); NaN where the
+    # range holds fewer than two trading days
+    def range_returns(self, starts, ends, field='Close'):
+        entry, exit_ = self.positions(starts, ends)
+        valid = exit_ > entry
+        log_prices = self.log_prices[field]
+        entry, exit_ = np.where(valid, entry, 0), np.where(valid, exit_, 0)
+        return np.where(valid, np.expm1(log_prices[exit_] - log_prices[entry]), np.nan)
+
+    # Function to get the return for one range with the trading days it runs between,
+    # as (return, entry date, exit date); the return is None without two trading days
+    def range_return(self, start, end, field='Close'):
+        entry, exit_ = self.positions(np.datetime64(pd.Timestamp(start), 'D'), np.datetime64(pd.Timestamp(end), 'D'))
+        if exit_ <= entry:
+            return None, None, None
+        log_prices = self.log_prices[field]
+        return float(np.expm1(log_prices[exit_] - log_prices[entry])), self.dates[entry], self.dates[exit_]
+
+    # Function to get day-over-day returns for the trading days in [start, end), like
+    # pct_change() on the range (the first day has no return)
+    def daily_returns(self, start, end, field='Close'):
+        entry, exit_ = self.positions(np.datetime64(pd.Timestamp(start), 'D'), np.datetime64(pd.Timestamp(end), 'D'))
+        if exit_ < entry:
+            return pd.Series(dtype='float64', index=pd.DatetimeIndex([], name='Date'))
+        returns = np.concatenate([[np.nan], np.expm1(np.diff(self.log_prices[field][entry:exit_ + 1]))])
+        return pd.Series(returns, index=pd.DatetimeIndex(self.dates[entry:exit_ + 1], name='Date'))
+
+
+# Function to build an index from an OHLCV frame; bars without a price are skipped
+def build_index(frame):
+    frame = frame.dropna(subset=INDEX_FIELDS)
+    frame = frame[(frame[INDEX_FIELDS] > 0).all(axis=1)]
+    dates = frame.index.values.astype('datetime64[D]')
+    log_prices = {}
+    for field in INDEX_FIELDS:
+        values = np.log(frame[field].to_numpy(dtype='float64'))
+        log_prices[field] = values - values[0] if len(values) else values
+    return ReturnIndex(dates, log_prices)
+
+
+def _index_path(ticker):
+    safe_name = ticker.replace('/', '_').replace('^', '_')
+    return os.path.join(PRICE_DIR, f"{safe_name}.returns.npz")
+
+
+def _load_index(path, version):
+    try:
+        with np.load(path) as saved:
+            if float(saved['version']) != version:
+                return None
+            return ReturnIndex(saved['dates'], {field: saved[f"log_{field}"] for field in INDEX_FIELDS})
+    except (FileNotFoundError, KeyError, ValueError, OSError):
+        return None
+
+
+def _save_index(path, index, version):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as file:
+        np.savez(file, version=version, dates=index.dates,
+                 **{f"log_{field}": index.log_prices[field] for field in INDEX_FIELDS})
+    os.replace(path + '.tmp', path)
+
+
+# Function to get a ticker's return index covering at least [start, end). The prices are
+# fetched through the price store first, and the index is rebuilt only when they changed.
+def get_return_index(ticker, start=None, end=None):
+    if start is not None and end is not None:
+        get_price_history(ticker, start, end)
+    frame, version = get_stored_history(ticker)
+    version = float(version or 0)
+    with _lock:
+        cached = _indexes.get(ticker)
+        if cached is not None and cached[0] == version:
+            cache_lookup('return_index', hit=True)
+            return cached[1]
+        path = _index_path(ticker)
+        index = _load_index(path, version)
+        cache_lookup('return_index', hit=index is not None)
+        if index is None:
+            index = build_index(frame)
+            if version:
+                _save_index(path, index, version)
+        _indexes[ticker] = (version, index)
+        return index
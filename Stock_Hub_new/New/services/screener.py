@@ -0,0 +1,123 @@
+import operator
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from services.indicator_engine import TECHNICAL_INDICATORS, compute
+from services.metrics import timed
+from services.precompute_indicators import read_snapshot, snapshot_coverage
+from services.price_store import get_price_matrix
+
+# Cross-sectional screener for the indicators page. The whole ticker universe is
+# loaded as aligned (dates x tickers) matrices, one per OHLCV field, and the
+# indicator engine runs on those matrices column-wise in a single pass. Only the
+# latest row is compared against the screening conditions. When the nightly
+# snapshot (services.precompute_indicators) was run for the screen's as-of date,
+# its precomputed latest rows are used instead.
+
+# Calendar days of history loaded for screening: enough trading days for the 50-day
+# average and for the EMA/ADX recursions to settle
+SCREEN_LOOKBACK_DAYS = 400
+
+SCREEN_COLUMNS = ['Close'] + TECHNICAL_INDICATORS
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+# Function to load split/dividend adjusted high, low, close and volume for many tickers, aligned
+# on one date index. Tickers with any missing bar in the window are left out and returned
+# separately, so the engine's kernels stay on the NaN-free fast path; `failed` maps the tickers
+# whose download failed to the error.
+def load_universe(tickers, end=None, lookback_days=SCREEN_LOOKBACK_DAYS, use_snapshot=True):
+    end = end or date.today() + timedelta(days=1)
+    if use_snapshot:
+        universe = load_snapshot_universe(tickers, end)
+        if universe is not None:
+            return universe
+    start = end - timedelta(days=lookback_days)
+    fields = {field: get_price_matrix(tickers, start, end, field)
+              for field in ['High', 'Low', 'Close', 'Adj Close', 'Volume']}
+
+    failed = {}
+    for matrix in fields.values():
+        failed.update(matrix.attrs.get('failed', {}))
+    index = fields['Close'].index
+    fields = {field: matrix.reindex(index) for field, matrix in fields.items()}
+    complete = np.full(len(tickers), len(index) > 0)
+    for matrix in fields.values():
+        complete &= matrix.notna().all(axis=0).to_numpy()
+
+    ratio = (fields['Adj Close'] / fields['Close']).to_numpy()[:, complete]
+    kept = [ticker for ticker, keep in zip(tickers, complete) if keep]
+    skipped = [ticker for ticker, keep in zip(tickers, complete) if not keep]
+    inputs = {
+        'close': fields['Adj Close'].to_numpy()[:, complete],
+        'high': fields['High'].to_numpy()[:, complete] * ratio,
+        'low': fields['Low'].to_numpy()[:, complete] * ratio,
+        'volume': fields['Volume'].to_numpy()[:, complete],
+    }
+    return {'dates': index, 'tickers': kept, 'skipped': skipped, 'failed': failed, 'inputs': inputs,
+            'source': 'prices'}
+
+
+# Function to load the latest indicator row of every ticker from the snapshot run for `end`, which
+# holds the bars before `end`. Tickers without a bar on the snapshot's last date are skipped.
+# Returns None when no finished snapshot for that date covers all the tickers.
+def load_snapshot_universe(tickers, end):
+    coverage = snapshot_coverage(end.isoformat())
+    if coverage is None or not coverage['tickers'].issuperset(tickers):
+        return None
+    table = read_snapshot(tickers, SCREEN_COLUMNS, run_date=end.isoformat())
+    latest = table.sort_values('Date').groupby('Ticker').tail(1).set_index('Ticker')
+    last_date = latest['Date'].max() if not latest.empty else None
+    kept = [ticker for ticker in tickers if ticker in latest.index and latest.at[ticker, 'Date'] == last_date]
+    skipped = [ticker for ticker in tickers if ticker not in kept]
+    dates = pd.DatetimeIndex([] if last_date is None else [last_date], name='Date')
+    return {'dates': dates, 'tickers': kept, 'skipped': skipped, 'failed': {},
+            'latest': latest.loc[kept, SCREEN_COLUMNS], 'source': 'snapshot'}
+
+
+# Function to list the indicator columns a screen needs
+def _needed_columns(conditions, rank_by):
+    columns = {rank_by} if rank_by else set()
+    for left, _, right in conditions:
+        columns.add(left)
+        if isinstance(right, str):
+            columns.add(right)
+    return [column for column in SCREEN_COLUMNS if column in columns]
+
+
+# Function to screen a loaded universe. `conditions` is a list of (column, operator, column or number)
+# tuples that must all hold on the latest bar, e.g. ("Relative Strength Index", "<", 30) and
+# ("Close", ">", "Moving average of 50"). Returns the matching tickers ranked by `rank_by`.
+@timed('screen')
+def screen(universe, conditions, rank_by=None, ascending=True):
+    columns = _needed_columns(conditions, rank_by)
+    if 'latest' in universe:
+        table = universe['latest'][columns].astype('float64')
+    else:
+        indicators = [column for column in columns if column != 'Close']
+        results = compute(universe['inputs'], indicators)
+        for indicator, values in results.items():
+            if isinstance(values, Exception):
+                raise ValueError(f"Unable to calculate {indicator} for the screen: {values}")
+
+        latest = {'Close': universe['inputs']['close'][-1]}
+        latest.update({indicator: values[-1] for indicator, values in results.items()})
+        table = pd.DataFrame(latest, index=pd.Index(universe['tickers'], name='Ticker'))[columns]
+
+    matches = np.ones(len(table), dtype=bool)
+    for left, symbol, right in conditions:
+        other = table[right].to_numpy() if isinstance(right, str) else right
+        with np.errstate(invalid='ignore'):
+            matches &= OPERATORS[symbol](table[left].to_numpy(), other)
+    table = table[matches]
+    if rank_by:
+        table = table.sort_values(rank_by, ascending=ascending)
+    return table
@@ -0,0 +1,163 @@
+import re
+import math
+import hashlib
+import threading
+
+import pandas as pd
+from cachetools import LRUCache
+
+from services.metrics import cache_lookup, span
+
+# Sentiment scoring for news articles. Articles are scored in batches and every
+# score is cached by the scorer and a hash of the article, so re-rendering a page
+# or flipping back to it costs nothing. Two scorers are available: TextBlob's
+# polarity (what the news page always used) and a much faster VADER-style lexicon
+# scorer, which uses NLTK's VADER lexicon when it is installed and a small built-in
+# lexicon otherwise. Both return a score between -1 and 1.
+
+_scores = LRUCache(maxsize=50_000)
+_lock = threading.Lock()
+
+
+# Function to get the text to score: the description, or the title when there is none
+def article_text(article):
+    return (article.get('description') or article.get('title') or '').strip()
+
+
+def article_key(article):
+    return hashlib.sha1(f"{article.get('url') or ''}\n{article_text(article)}".encode()).hexdigest()
+
+
+class TextBlobScorer:
+    key = 'textblob'
+    label = 'TextBlob'
+
+    def score_batch(self, texts):
+        from textblob import TextBlob
+        return [TextBlob(text).sentiment.polarity if text else 0.0 for text in texts]
+
+
+# Built-in valence lexicon (VADER scale, -4 to 4) for when NLTK's lexicon is not installed
+BUILTIN_LEXICON = {
+    'gain': 2.0, 'gains': 2.0, 'rise': 1.5, 'rises': 1.5, 'rising': 1.5, 'rose': 1.5, 'surge': 2.2, 'surges': 2.2,
+    'soar': 2.5, 'soars': 2.5, 'jump': 1.5, 'jumps': 1.5, 'rally': 2.0, 'rallies': 2.0, 'beat': 1.8, 'beats': 1.8,
+    'record': 1.2, 'growth': 1.8, 'grow': 1.5, 'grows': 1.5, 'profit': 1.9, 'profits': 1.9, 'profitable': 2.0,
+    'strong': 2.0, 'stronger': 2.0, 'upgrade': 2.0, 'upgraded': 2.0, 'outperform': 2.0, 'bullish': 2.3,
+    'positive': 2.3, 'optimistic': 2.3, 'optimism': 2.2, 'boost': 1.7, 'boosts': 1.7, 'win': 2.8, 'wins': 2.7,
+    'success': 2.7, 'successful': 2.8, 'good': 1.9, 'great': 3.1, 'best': 3.2, 'better': 1.9, 'improve': 1.9,
+    'improved': 2.1, 'improves': 1.9, 'recovery': 1.6, 'recover': 1.5, 'dividend': 0.8, 'buy': 0.9,
+    'innovative': 2.2, 'innovation': 1.8, 'breakthrough': 2.4, 'approval': 2.0, 'approved': 2.0,
+    'fall': -1.5, 'falls': -1.5, 'fell': -1.5, 'falling': -1.5, 'drop': -1.6, 'drops': -1.6, 'dropped': -1.6,
+    'decline': -1.7, 'declines': -1.7, 'declined': -1.7, 'plunge': -2.5, 'plunges': -2.5, 'slump': -2.2,
+    'slumps': -2.2, 'tumble': -2.2, 'tumbles': -2.2, 'crash': -2.9, 'crashes': -2.9, 'loss': -2.0,
+    'losses': -2.0, 'lose': -1.8, 'loses': -1.8, 'miss': -1.4, 'misses': -1.4, 'missed': -1.4, 'weak': -1.9,
+    'weaker': -1.9, 'downgrade': -2.0, 'downgraded': -2.0, 'underperform': -2.0, 'bearish': -2.3,
+    'negative': -2.3, 'pessimistic': -2.2, 'concern': -1.4, 'concerns': -1.4, 'worry': -1.9, 'worries': -1.9,
+    'fear': -2.2, 'fears': -2.2, 'risk': -1.1, 'risks': -1.1, 'lawsuit': -1.9, 'sued': -1.8, 'fraud': -3.0,
+    'probe': -1.2, 'investigation': -1.2, 'recall': -1.6, 'layoffs': -2.1, 'layoff': -2.1, 'cut': -1.1,
+    'cuts': -1.1, 'bad': -2.5, 'worse': -2.1, 'worst': -3.1, 'fail': -2.5, 'fails': -2.5, 'failed': -2.3,
+    'failure': -2.6, 'bankruptcy': -3.0, 'bankrupt': -3.0, 'debt': -1.0, 'volatile': -1.0, 'volatility': -0.8,
+    'sell': -0.6, 'selloff': -2.0, 'warning': -1.5, 'warns': -1.5, 'scandal': -2.8, 'delay': -1.3,
+    'delays': -1.3, 'slowdown': -1.6, 'recession': -2.3, 'inflation': -0.9, 'uncertainty': -1.4,
+}
+
+NEGATIONS = {'not', 'no', 'never', 'none', 'nobody', 'nothing', 'neither', 'nor', 'without', "isn't", "aren't",
+             "wasn't", "weren't", "don't", "doesn't", "didn't", "won't", "can't", "cannot", "couldn't",
+             "shouldn't", "hasn't", "haven't"}
+BOOSTERS = {'very': 0.293, 'extremely': 0.293, 'highly': 0.293, 'significantly': 0.293, 'sharply': 0.293,
+            'strongly': 0.293, 'hugely': 0.293, 'slightly': -0.293, 'somewhat': -0.293, 'marginally': -0.293}
+
+_TOKEN = re.compile(r"[a-z][a-z'\-]*")
+_lexicon = None
+
+
+# Function to load the lexicon once: NLTK's VADER lexicon when its data is installed, else the built-in one
+def load_lexicon():
+    global _lexicon
+    if _lexicon is None:
+        lexicon = dict(BUILTIN_LEXICON)
+        try:
+            import nltk
+            with nltk.data.find('sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt').open() as file:
+                for line in file.read().decode('utf-8').splitlines():
+                    word, valence = line.split('\t')[:2]
+                    lexicon[word] = float(valence)
+        except (ImportError, LookupError, ValueError, OSError):
+            pass
+        _lexicon = lexicon
+    return _lexicon
+
+
+# VADER-style scorer: sums word valences with negation and booster rules and squashes the
+# sum into [-1, 1] with VADER's normalisation
+class LexiconScorer:
+    key = 'lexicon'
+    label = 'Lexicon (fast)'
+    ALPHA = 15
+    NEGATION_SCALE = -0.74
+
+    def __init__(self):
+        self.lexicon = load_lexicon()
+
+    def score(self, text):
+        tokens = _TOKEN.findall(text.lower())
+        total = 0.0
+        for position, token in enumerate(tokens):
+            valence = self.lexicon.get(token)
+            if valence is None:
+                continue
+            for distance, previous in enumerate(reversed(tokens[max(0, position - 3):position]), start=1):
+                booster = BOOSTERS.get(previous)
+                if booster:
+                    # Boosters further away count less, like VADER's 0.95/0.9 damping
+                    scale = booster * (1, 0.95, 0.9)[distance - 1]
+                    valence += scale if valence > 0 else -scale
+                if previous in NEGATIONS:
+                    valence *= self.NEGATION_SCALE
+            total += valence
+        return total / math.sqrt(total * total + self.ALPHA) if total else 0.0
+
+    def score_batch(self, texts):
+        return [self.score(text) for text in texts]
+
+
+SCORERS = {
+    TextBlobScorer.label: TextBlobScorer,
+    LexiconScorer.label: LexiconScorer,
+}
+
+
+# Function to score articles in one batch per call. Cached scores are reused and only the
+# articles not seen before by this scorer are passed to it.
+def score_articles(articles, scorer):
+    keys = [(scorer.key, article_key(article)) for article in articles]
+    with _lock:
+        scores = [_scores.get(key) for key in keys]
+    missing = [position for position, score in enumerate(scores) if score is None]
+    cache_lookup('sentiment', hits=len(keys) - len(missing), misses=len(missing))
+    if missing:
+        with span('sentiment_scoring', scorer=scorer.key):
+            new_scores = scorer.score_batch([article_text(articles[position]) for position in missing])
+        with _lock:
+            for position, score in zip(missing, new_scores):
+                scores[position] = float(score)
+                _scores[keys[position]] = float(score)
+    return scores
+
+
+# Function to average article sentiment per publication day, with the article count per day
+def daily_sentiment(articles, scorer):
+    if not articles:
+        return pd.DataFrame(columns=['Sentiment', 'Articles'], index=pd.DatetimeIndex([], name='Date'))
+    frame = pd.DataFrame({
+        'Date': pd.to_datetime([article.get('publishedAt') for article in articles], utc=True, errors='coerce'),
+        'Sentiment': score_articles(articles, scorer),
+    }).dropna(subset=['Date'])
+    frame['Date'] = frame['Date'].dt.tz_localize(None).dt.normalize()
+    return frame.groupby('Date')['Sentiment'].agg(Sentiment='mean', Articles='count')
+
+
+# Function to build a (dates x tickers) frame of daily mean sentiment from {ticker: articles}
+def daily_sentiment_by_ticker(articles_by_ticker, scorer):
+    series = {ticker: daily_sentiment(articles, scorer)['Sentiment'] for ticker, articles in articles_by_ticker.items()}
+    return pd.DataFrame(series).sort_index()
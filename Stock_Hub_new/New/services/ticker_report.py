@@ -0,0 +1,104 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
+
+from services.metrics import cache_lookup, span
+
+# Lazy report engine for the Ticker Insights Report. Datasets are only fetched
+# for the sections a user opens, a ticker's datasets are fetched concurrently,
+# and each dataset is cached with an expiry that matches how often it changes.
+# The datasets of one section come from the same Yahoo endpoint, so they are read
+# one after another from a single shared Ticker, which requests that endpoint once.
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Ticker attribute -> (title shown on the page, cache expiry in seconds)
+REPORT_DATASETS = {
+    'info': ('Company Info', HOUR),
+    'income_stmt': ('Income Statement', 3 * DAY),
+    'balance_sheet': ('Balance Sheet', 3 * DAY),
+    'news': ('Latest News', 10 * MINUTE),
+    'major_holders': ('Major Holders', DAY),
+    'institutional_holders': ('Institutional Holders', DAY),
+    'mutualfund_holders': ('Mutual Fund Holders', DAY),
+    'insider_transactions': ('Insider Transactions', 12 * HOUR),
+    'insider_purchases': ('Insider Purchases', 12 * HOUR),
+    'insider_roster_holders': ('Insider Roster Holders', 12 * HOUR),
+    'recommendations': ('Recommendations', 6 * HOUR),
+    'recommendations_summary': ('Recommendations Summary', 6 * HOUR),
+    'upgrades_downgrades': ('Upgrades and Downgrades', 6 * HOUR),
+}
+
+REPORT_SECTIONS = {
+    'Overview': ['info'],
+    'Financial Statements': ['income_stmt', 'balance_sheet'],
+    'News': ['news'],
+    'Holders': ['major_holders', 'institutional_holders', 'mutualfund_holders'],
+    'Insiders': ['insider_transactions', 'insider_purchases', 'insider_roster_holders'],
+    'Analyst Ratings': ['recommendations', 'recommendations_summary', 'upgrades_downgrades'],
+}
+
+MAX_WORKERS = 8
+
+_caches = {name: TTLCache(maxsize=512, ttl=ttl) for name, (_, ttl) in REPORT_DATASETS.items()}
+# A Ticker keeps the responses it fetched, so it is replaced as often as the shortest dataset expiry
+_tickers = TTLCache(maxsize=256, ttl=min(ttl for _, ttl in REPORT_DATASETS.values()))
+_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='ticker-report')
+
+
+# Function to get the shared Ticker for a symbol
+def _ticker(ticker):
+    import yfinance as yf
+    with _lock:
+        instance = _tickers.get(ticker)
+        if instance is None:
+            instance = _tickers[ticker] = yf.Ticker(ticker)
+        return instance
+
+
+# Function to fetch datasets one after another from the shared Ticker; returns {name: value or error}
+def _fetch_datasets(ticker, names):
+    instance = _ticker(ticker)
+    values = {}
+    for name in names:
+        try:
+            with span('data_fetch', source='yfinance_report'):
+                value = getattr(instance, name)
+        except Exception as error:
+            values[name] = error
+            continue
+        with _lock:
+            _caches[name][ticker] = value
+        values[name] = value
+    return values
+
+
+def _section_of(name):
+    return next(section for section, names in REPORT_SECTIONS.items() if name in names)
+
+
+# Function to get the requested datasets for one ticker, fetching the uncached sections concurrently
+def get_datasets(ticker, names):
+    results, groups = {}, {}
+    with _lock:
+        for name in names:
+            if ticker in _caches[name]:
+                results[name] = _caches[name][ticker]
+    cache_lookup('ticker_report', hits=len(results), misses=len(names) - len(results))
+    for name in names:
+        if name not in results:
+            groups.setdefault(_section_of(name), []).append(name)
+    futures = [_pool.submit(_fetch_datasets, ticker, group) for group in groups.values()]
+    for future in futures:
+        results.update(future.result())
+    return {name: results[name] for name in names}
+
+
+# Function to get the datasets behind a list of report sections
+def get_sections(ticker, sections):
+    names = [name for section in sections for name in REPORT_SECTIONS[section]]
+    return get_datasets(ticker, names)
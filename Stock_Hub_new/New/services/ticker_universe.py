@@ -0,0 +1,182 @@
+import os
+import json
+import bisect
+import difflib
+import argparse
+import threading
+import time
+
+from services.config import DATA_DIR, TICKER_FILE
+
+# Ticker universe shared by every page and command line tool. The ticker file is read
+# once per process (again only when it changes) and the symbols are joined with cached
+# company metadata: name, sector, industry and exchange. The metadata comes from the
+# same Ticker.info profiles the Home page cards use; it is kept in a JSON file and
+# refreshed from the command line, so filtering by sector never calls Yahoo. Search
+# uses a sorted symbol list for prefixes, a name index for words and difflib for typos.
+
+METADATA_FILE = os.path.join(DATA_DIR, 'ticker_metadata.json')
+METADATA_FIELDS = {'name': 'longName', 'sector': 'sector', 'industry': 'industry', 'exchange': 'exchange'}
+METADATA_MAX_AGE_DAYS = 30
+UNKNOWN = 'Unknown'
+
+_universe = None
+_lock = threading.Lock()
+
+
+# Function to read the ticker file: one symbol per line, blank lines and repeats dropped
+def read_ticker_file(path=TICKER_FILE):
+    with open(path) as file:
+        return list(dict.fromkeys(line.strip().upper() for line in file if line.strip()))
+
+
+def _read_metadata(path=METADATA_FILE):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_metadata(metadata, path=METADATA_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(metadata, file, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class TickerUniverse:
+    def __init__(self, symbols, metadata):
+        self.symbols = symbols
+        self.metadata = {symbol: metadata.get(symbol, {}) for symbol in symbols}
+        self.sorted_symbols = sorted(symbols)
+        self.by_sector = {}
+        self.by_industry = {}
+        self.by_exchange = {}
+        self.name_words = {}
+        for symbol in symbols:
+            info = self.metadata[symbol]
+            self.by_sector.setdefault(info.get('sector') or UNKNOWN, []).append(symbol)
+            self.by_industry.setdefault(info.get('industry') or UNKNOWN, []).append(symbol)
+            self.by_exchange.setdefault(info.get('exchange') or UNKNOWN, []).append(symbol)
+            for word in (info.get('name') or '').lower().replace(',', ' ').replace('.', ' ').split():
+                self.name_words.setdefault(word, set()).add(symbol)
+        self.sorted_words = sorted(self.name_words)
+
+    def sectors(self):
+        return sorted(self.by_sector, key=lambda sector: (sector == UNKNOWN, sector))
+
+    def industries(self, sectors=None):
+        symbols = set(self.filter(sectors))
+        return sorted(industry for industry, members in self.by_industry.items() if symbols.intersection(members))
+
+    # Function to get the symbols in any of the given sectors/industries/exchanges, in file order;
+    # an empty or None filter does not restrict
+    def filter(self, sectors=None, industries=None, exchanges=None):
+        selected = set(self.symbols)
+        for groups, wanted in ((self.by_sector, sectors), (self.by_industry, industries), (self.by_exchange, exchanges)):
+            if wanted:
+                selected &= {symbol for group in wanted for symbol in groups.get(group, [])}
+        return [symbol for symbol in self.symbols if symbol in selected]
+
+    def _prefixed(self, values, prefix):
+        start = bisect.bisect_left(values, prefix)
+        stop = bisect.bisect_left(values, prefix + '\uffff')
+        return values[start:stop]
+
+    # Function to search symbols and company names: exact and prefix symbol matches first,
+    # then company name words starting with the query. Close (misspelt) matches are only
+    # used when nothing matches exactly or by prefix, so "AAPL" does not also list AAL or APA.
+    def search(self, query, limit=20):
+        query = query.strip()
+        if not query:
+            return []
+        matches = []
+        symbol_query = query.upper()
+        if symbol_query in self.metadata:
+            matches.append(symbol_query)
+        matches += self._prefixed(self.sorted_symbols, symbol_query)
+        words = query.lower().split()
+        name_matches = None
+        for word in words:
+            found = {symbol for name_word in self._prefixed(self.sorted_words, word) for symbol in self.name_words[name_word]}
+            name_matches = found if name_matches is None else name_matches & found
+        matches += sorted(name_matches or [])
+        if not matches:
+            matches += difflib.get_close_matches(symbol_query, self.sorted_symbols, n=limit, cutoff=0.6)
+            for word in words:
+                for name_word in difflib.get_close_matches(word, self.sorted_words, n=limit, cutoff=0.75):
+                    matches += sorted(self.name_words[name_word])
+        return list(dict.fromkeys(matches))[:limit]
+
+    # Function to label a symbol for selection widgets, e.g. "AAPL - Apple Inc."
+    def label(self, symbol):
+        name = self.metadata.get(symbol, {}).get('name')
+        return f"{symbol} - {name}" if name else symbol
+
+
+# Function to get the process-wide universe, rebuilt only when the ticker or metadata file changes
+def get_universe(path=TICKER_FILE, metadata_path=METADATA_FILE):
+    global _universe
+    version = (path, metadata_path, _mtime(path), _mtime(metadata_path))
+    with _lock:
+        if _universe is None or _universe[0] != version:
+            _universe = (version, TickerUniverse(read_ticker_file(path), _read_metadata(metadata_path)))
+        return _universe[1]
+
+
+# Function to store metadata from company profiles (as returned by company_profiles.get_profiles)
+def record_profiles(profiles, metadata_path=METADATA_FILE):
+    with _lock:
+        metadata = _read_metadata(metadata_path)
+        changed = False
+        for symbol, profile in profiles.items():
+            entry = {key: profile.get(field) for key, field in METADATA_FIELDS.items()}
+            if not any(entry.values()):
+                continue
+            entry['updated'] = time.time()
+            metadata[symbol] = entry
+            changed = True
+        if changed:
+            _write_metadata(metadata, metadata_path)
+
+
+# Function to fetch the metadata of the symbols without it or with metadata older than `max_age_days`
+def refresh_metadata(symbols, max_age_days=METADATA_MAX_AGE_DAYS, batch_size=50, metadata_path=METADATA_FILE,
+                     progress=None):
+    from services.company_profiles import get_profiles
+    metadata = _read_metadata(metadata_path)
+    cutoff = time.time() - max_age_days * 24 * 60 * 60
+    stale = [symbol for symbol in symbols if metadata.get(symbol, {}).get('updated', 0) < cutoff]
+    for start in range(0, len(stale), batch_size):
+        record_profiles(get_profiles(stale[start:start + batch_size]), metadata_path)
+        if progress is not None:
+            progress(min(start + batch_size, len(stale)), len(stale))
+    return stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the cached sector/industry/exchange metadata of the tickers.')
+    parser.add_argument('--tickers-file', default=TICKER_FILE)
+    parser.add_argument('--max-age-days', type=int, default=METADATA_MAX_AGE_DAYS,
+                        help='refetch metadata older than this (0 refetches everything)')
+    args = parser.parse_args()
+
+    symbols = read_ticker_file(args.tickers_file)
+    refreshed = refresh_metadata(symbols, args.max_age_days,
+                                 progress=lambda done, total: print(f"{done}/{total} profiles fetched"))
+    universe = get_universe(args.tickers_file)
+    print(f"Refreshed {len(refreshed)} of {len(symbols)} tickers")
+    for sector in universe.sectors():
+        print(f"  {sector}: {len(universe.by_sector[sector])}")
+
+
+if __name__ == '__main__':
+    main()
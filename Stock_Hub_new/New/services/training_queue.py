@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+
+import psutil
+
+from services.config import BASE_DIR, DATA_DIR
+from services.lstm_model import resolve_hyperparams
+from services.model_registry import model_key
+
+# File-based job queue shared by the Streamlit pages and the training worker
+# process (services/training_worker.py). A job's id is its model registry key,
+# so submitting the same ticker, range and hyperparameters twice gives one job.
+
+JOB_DIR = os.path.join(DATA_DIR, 'training_jobs')
+WORKER_PID_FILE = os.path.join(JOB_DIR, 'worker.pid')
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+_spawn_lock = threading.Lock()
+
+
+def _job_path(job_id):
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+
+# Function to read a job, or None if it does not exist
+def get_job(job_id):
+    try:
+        with open(_job_path(job_id)) as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+# Function to write a job atomically so readers never see half a file
+def save_job(job):
+    os.makedirs(JOB_DIR, exist_ok=True)
+    path = _job_path(job['id'])
+    with open(path + '.tmp', 'w') as file:
+        json.dump(job, file)
+    os.replace(path + '.tmp', path)
+
+
+# Function to update some fields of a job
+def update_job(job_id, **fields):
+    job = get_job(job_id)
+    if job is not None:
+        job.update(fields)
+        save_job(job)
+    return job
+
+
+# Function to get the job for a training request, or None if it was never submitted
+def find_job(ticker, start, end, hyperparams=None):
+    return get_job(model_key(ticker, start, end, resolve_hyperparams(hyperparams)))
+
+
+# Function to queue a training job; an unfinished job for the same request is reused
+def submit_job(ticker, start, end, hyperparams=None):
+    hyperparams = resolve_hyperparams(hyperparams)
+    job_id = model_key(ticker, start, end, hyperparams)
+    job = get_job(job_id)
+    if job is not None and job['status'] in (QUEUED, RUNNING):
+        return job
+    job = {
+        'id': job_id,
+        'ticker': ticker,
+        'start': str(start),
+        'end': str(end),
+        'hyperparams': hyperparams,
+        'status': QUEUED,
+        'progress': {'epoch': 0, 'epochs': hyperparams['epochs'], 'loss': None},
+        'submitted_at': time.time(),
+        'error': None,
+    }
+    save_job(job)
+    return job
+
+
+# Function to list jobs with a given status, oldest first
+def list_jobs(status=None):
+    if not os.path.isdir(JOB_DIR):
+        return []
+    jobs = []
+    for name in os.listdir(JOB_DIR):
+        if name.endswith('.json'):
+            job = get_job(name[:-len('.json')])
+            if job is not None and (status is None or job['status'] == status):
+                jobs.append(job)
+    return sorted(jobs, key=lambda job: job['submitted_at'])
+
+
+# Function to get the pid of the running worker, or None
+def worker_pid():
+    try:
+        with open(WORKER_PID_FILE) as file:
+            pid = int(file.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+    return pid if psutil.pid_exists(pid) else None
+
+
+# Function to start the training worker process if none is running
+def ensure_worker():
+    with _spawn_lock:
+        if worker_pid() is not None:
+            return
+        subprocess.Popen([sys.executable, '-m', 'services.training_worker'], cwd=BASE_DIR,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Give the worker a moment to claim the pid file so reruns do not spawn another
+        for _ in range(20):
+            if worker_pid() is not None:
+                break
+            time.sleep(0.1)
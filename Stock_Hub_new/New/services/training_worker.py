@@ -0,0 +1,128 @@
+import os
+import time
+import argparse
+from datetime import date, datetime, timedelta
+
+import tensorflow as tf
+
+from services import training_queue
+from services.lstm_model import DEFAULT_START, PREDICTION_TICKERS
+from services.metrics import METRICS_DIR, start_exporter, write_prometheus
+from services.model_registry import load_or_train
+from services.price_store import get_price_history
+
+# Training worker process. It takes jobs from services.training_queue one at a time,
+# trains (or fine-tunes) the model through the registry and reports epoch progress
+# back into the job file for the prediction page to show.
+#
+#   python -m services.training_worker                  # serve queued jobs, exit when idle
+#   python -m services.training_worker --nightly 02:00  # also queue every prediction ticker each night
+
+IDLE_EXIT_SECONDS = 10 * 60
+POLL_SECONDS = 1
+
+
+class ProgressCallback(tf.keras.callbacks.Callback):
+    def __init__(self, job_id, epochs):
+        super().__init__()
+        self.job_id = job_id
+        self.epochs = epochs
+
+    def on_epoch_end(self, epoch, logs=None):
+        loss = (logs or {}).get('loss')
+        training_queue.update_job(self.job_id, progress={
+            'epoch': epoch + 1, 'epochs': self.epochs, 'loss': None if loss is None else float(loss)})
+
+
+# Function to claim the pid file; returns False if another worker is alive
+def _claim_worker():
+    os.makedirs(training_queue.JOB_DIR, exist_ok=True)
+    while True:
+        try:
+            fd = os.open(training_queue.WORKER_PID_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if training_queue.worker_pid() is not None:
+                return False
+            # Left behind by a worker that is no longer running
+            try:
+                os.remove(training_queue.WORKER_PID_FILE)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, 'w') as file:
+            file.write(str(os.getpid()))
+        return True
+
+
+# Function to put jobs left running by a worker that died back in the queue
+def _requeue_orphans():
+    for job in training_queue.list_jobs(training_queue.RUNNING):
+        training_queue.update_job(job['id'], status=training_queue.QUEUED)
+
+
+def run_job(job):
+    job_id = job['id']
+    training_queue.update_job(job_id, status=training_queue.RUNNING, started_at=time.time())
+    try:
+        start = date.fromisoformat(job['start'])
+        end = date.fromisoformat(job['end'])
+        df = get_price_history(job['ticker'], start, end)
+        if df.empty:
+            raise ValueError(f"No price data for {job['ticker']} between {start} and {end}")
+        callback = ProgressCallback(job_id, job['hyperparams']['epochs'])
+        _, _, _, status = load_or_train(job['ticker'], start, end, df['Close'].values,
+                                        job['hyperparams'], callbacks=[callback])
+        training_queue.update_job(job_id, status=training_queue.DONE, model_status=status,
+                                  finished_at=time.time())
+    except Exception as error:
+        training_queue.update_job(job_id, status=training_queue.FAILED, error=str(error),
+                                  finished_at=time.time())
+
+
+# Function to queue a warm model for every prediction ticker, matching the page defaults
+def submit_nightly_jobs(run_date):
+    for ticker in PREDICTION_TICKERS:
+        training_queue.submit_job(ticker, DEFAULT_START, run_date)
+
+
+def _next_run(at_time, now):
+    run = datetime.combine(now.date(), at_time)
+    return run if run > now else run + timedelta(days=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train prediction models from the job queue.')
+    parser.add_argument('--nightly', metavar='HH:MM',
+                        help='stay running and pre-train all prediction tickers every day at this time')
+    args = parser.parse_args()
+
+    if not _claim_worker():
+        return
+    _requeue_orphans()
+    start_exporter('training_worker', port=None)
+
+    nightly_at = datetime.strptime(args.nightly, '%H:%M').time() if args.nightly else None
+    next_nightly = _next_run(nightly_at, datetime.now()) if nightly_at else None
+    idle_since = time.time()
+    try:
+        while True:
+            if next_nightly and datetime.now() >= next_nightly:
+                submit_nightly_jobs(date.today())
+                next_nightly = _next_run(nightly_at, datetime.now())
+
+            queued = training_queue.list_jobs(training_queue.QUEUED)
+            if queued:
+                run_job(queued[0])
+                idle_since = time.time()
+            elif not nightly_at and time.time() - idle_since > IDLE_EXIT_SECONDS:
+                break
+            else:
+                time.sleep(POLL_SECONDS)
+    finally:
+        write_prometheus(os.path.join(METRICS_DIR, 'training_worker.prom'))
+        if training_queue.worker_pid() == os.getpid():
+            os.remove(training_queue.WORKER_PID_FILE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import importlib
+import threading
+
+# Warm-up for a new server process. app.py starts it on the first run; it loads the
+# ticker universe, imports the libraries the services defer (so the first chart,
+# screen or export does not wait for them) and fetches the company profiles for the
+# first page of Home cards. Everything runs on a background thread, once per process,
+# so the first page renders without waiting for it.
+
+DEFERRED_MODULES = ['yfinance', 'scipy.signal', 'plotly.subplots', 'pyarrow.parquet']
+
+# Company cards on the first Home page
+HOME_PAGE_TICKERS = 9
+
+_started = False
+_lock = threading.Lock()
+
+
+def _warm_up():
+    from services.ticker_universe import get_universe
+    universe = get_universe()
+    for module in DEFERRED_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+    from services.company_profiles import prefetch_profiles
+    prefetch_profiles(universe.symbols[:HOME_PAGE_TICKERS])
+
+
+# Function to start the warm-up thread unless it already ran in this process
+def start_warm_up():
+    global _started
+    with _lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(target=_warm_up, name='warm-up', daemon=True).start()
+    return True
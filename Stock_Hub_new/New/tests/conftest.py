@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The services are imported as `services.x`, like the app does when it runs from this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Point the price store at an empty folder, so tests never read or write the real cache
+@pytest.fixture
+def price_dir(tmp_path, monkeypatch):
+    from services import price_store
+    monkeypatch.setattr(price_store, 'PRICE_DIR', str(tmp_path / 'prices'))
+    monkeypatch.setattr(price_store, '_entries', {})
+    return tmp_path / 'prices'
@@ -0,0 +1,41 @@
+import csv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.backtest import RESULT_COLUMNS, completed_jobs, run_bounded
+
+
+# Failed jobs are not counted as done, so a rerun tries them again
+def test_completed_jobs_skips_failed_rows(tmp_path):
+    path = tmp_path / 'results.csv'
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerow({'ticker': 'AAA', 'cutoff': '2024-01-02', 'model': 'ridge', 'rmse': 1.0, 'error': ''})
+        writer.writerow({'ticker': 'AAA', 'cutoff': '2024-01-02', 'model': 'gbt', 'error': 'fit failed'})
+    assert completed_jobs(str(path)) == {('AAA', '2024-01-02', 'ridge')}
+
+
+# Only `max_pending` jobs are handed to the pool at a time, and every job still runs once
+def test_run_bounded_limits_submitted_jobs():
+    submitted, peak = [0], [0]
+    lock = threading.Lock()
+
+    def job(value):
+        time.sleep(0.002)
+        with lock:
+            submitted[0] -= 1
+        return value * 2
+
+    class CountingPool(ThreadPoolExecutor):
+        def submit(self, function, *args):
+            with lock:
+                submitted[0] += 1
+                peak[0] = max(peak[0], submitted[0])
+            return super().submit(function, *args)
+
+    with CountingPool(max_workers=2) as pool:
+        results = list(run_bounded(pool, job, ((value,) for value in range(50)), max_pending=4))
+    assert sorted(results) == [value * 2 for value in range(50)]
+    assert peak[0] <= 4
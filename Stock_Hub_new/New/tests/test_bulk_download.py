@@ -0,0 +1,103 @@
+import os
+from datetime import date
+
+import pandas as pd
+
+from services.bulk_download import FakeSource, bulk_download, read_bulk_dataset
+
+START, END = date(2018, 1, 1), date(2022, 1, 1)
+TODAY = date(2022, 6, 15)
+TICKERS = ['AAA', 'BBB', 'CCC']
+
+
+def _download(output, source, start=START, end=END, **kwargs):
+    kwargs = dict(dict(years_per_request=2, batch_size=2, workers=4, rate=1000, backoff=0, today=TODAY), **kwargs)
+    return bulk_download(TICKERS, start, end, str(output), source=source, **kwargs)
+
+
+# Requests that fail a few times are retried until they succeed
+def test_retries_recover_failed_requests(tmp_path):
+    source = FakeSource(latency=0, error_rate=0.5, seed=1)
+    summary = _download(tmp_path, source, retries=10)
+    assert summary['failed'] == {}
+    assert source.calls > summary['tasks']
+    assert read_bulk_dataset(str(tmp_path)).groupby('Ticker').size().to_dict() == {
+        ticker: len(FakeSource(latency=0, error_rate=0)([ticker], START, END)[ticker]) for ticker in TICKERS}
+
+
+# Requests still failing after the retries are reported with their tickers and years, and nothing is written for them
+def test_failures_are_reported(tmp_path):
+    summary = _download(tmp_path, FakeSource(latency=0, error_rate=1), retries=0)
+    assert summary['rows'] == 0
+    assert sorted(summary['failed']) == [(('AAA', 'BBB'), date(2018, 1, 1), date(2020, 1, 1)),
+                                         (('AAA', 'BBB'), date(2020, 1, 1), date(2022, 1, 1)),
+                                         (('CCC',), date(2018, 1, 1), date(2020, 1, 1)),
+                                         (('CCC',), date(2020, 1, 1), date(2022, 1, 1))]
+    assert all(isinstance(error, ConnectionError) for error in summary['failed'].values())
+    assert read_bulk_dataset(str(tmp_path)).empty
+
+
+# A rerun only requests the years that are missing, whatever its start and end, and reads back without duplicates
+def test_rerun_resumes_without_duplicates(tmp_path):
+    first = _download(tmp_path, FakeSource(latency=0, error_rate=0), end=date(2020, 1, 1))
+    assert first['failed'] == {}
+    source = FakeSource(latency=0, error_rate=0)
+    second = _download(tmp_path, source, start=date(2018, 3, 1), end=date(2022, 6, 16))
+    assert second['failed'] == {}
+    assert second['skipped'] == 2 * len(TICKERS)
+    assert {start for _, start, _ in source.requests} == {date(2020, 1, 1), date(2022, 1, 1)}
+    dataset = read_bulk_dataset(str(tmp_path))
+    assert not dataset.duplicated(['Ticker', 'Date']).any()
+    assert dataset['Date'].min() == pd.Timestamp('2018-01-01') and dataset['Date'].max() == pd.Timestamp('2022-06-15')
+
+
+# The current year is an open part: fetched again on every run, and replaced by the final part once the year is over
+def test_current_year_is_never_final(tmp_path):
+    _download(tmp_path, FakeSource(latency=0, error_rate=0), start=date(2022, 1, 1), end=date(2022, 6, 16))
+    assert os.path.exists(tmp_path / 'ticker=AAA' / '2022.open.parquet')
+    source = FakeSource(latency=0, error_rate=0)
+    summary = _download(tmp_path, source, start=date(2022, 1, 1), end=date(2022, 6, 16))
+    assert summary['skipped'] == 0 and source.calls == 2
+    _download(tmp_path, FakeSource(latency=0, error_rate=0), start=date(2022, 1, 1), end=date(2023, 1, 1),
+              today=date(2023, 1, 5))
+    assert os.listdir(tmp_path / 'ticker=AAA') == ['2022.parquet']
+
+
+# Years before a listing come back empty: they are written as empty parts and not requested again
+def test_years_before_listing_are_stored_empty(tmp_path):
+    listings = {'CCC': date(2021, 3, 1)}
+    summary = _download(tmp_path, FakeSource(latency=0, error_rate=0, listings=listings))
+    assert summary['failed'] == {}
+    assert sorted(os.listdir(tmp_path / 'ticker=CCC')) == ['2018.parquet', '2019.parquet', '2020.parquet', '2021.parquet']
+    assert read_bulk_dataset(str(tmp_path), ['CCC'])['Date'].min() == pd.Timestamp('2021-03-01')
+    source = FakeSource(latency=0, error_rate=0, listings=listings)
+    summary = _download(tmp_path, source)
+    assert source.calls == 0 and summary['skipped'] == 4 * len(TICKERS)
+
+
+# When a request fails for part of its batch, the tickers that came back are kept and only the failed ones are retried
+def test_partial_failures_retry_only_the_failed_tickers(tmp_path):
+    source = FakeSource(latency=0.01, error_rate=0, ticker_error_rate=0.4, seed=3)
+    summary = _download(tmp_path, source, retries=10, batch_size=3)
+    assert summary['failed'] == {}
+    assert source.calls > summary['tasks']
+    requests = {}
+    for tickers, start, _ in source.requests:
+        requests.setdefault(start, []).append(tickers)
+    for span_requests in requests.values():
+        assert span_requests[0] == tuple(TICKERS)
+        assert all(len(tickers) < len(TICKERS) for tickers in span_requests[1:])
+    assert set(read_bulk_dataset(str(tmp_path))['Ticker']) == set(TICKERS)
+
+
+# Tickers still failing after the retries are reported with their error; the rest of the batch is on disk
+def test_partial_failures_are_reported_per_ticker(tmp_path):
+    summary = _download(tmp_path, FakeSource(latency=0.01, error_rate=0, ticker_error_rate=0.5, seed=5),
+                        retries=0, batch_size=3)
+    assert summary['failed']
+    stored = read_bulk_dataset(str(tmp_path))
+    for (tickers, start, end), error in summary['failed'].items():
+        assert isinstance(error, ConnectionError) and 'injected failure' in str(error)
+        assert 0 < len(tickers) < len(TICKERS)
+        span = stored[(stored['Date'] >= pd.Timestamp(start)) & (stored['Date'] < pd.Timestamp(end))]
+        assert set(span['Ticker']) == set(TICKERS) - set(tickers)
@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+from services.import_budget import check_page, page_paths
+
+
+# Every page's top-level imports stay within its cold import budget
+@pytest.mark.parametrize('path', page_paths(), ids=os.path.basename)
+def test_page_import_budget(path):
+    total, budget, imports, error = check_page(path)
+    if error and error.startswith('ModuleNotFoundError'):
+        pytest.skip(f"optional dependency missing: {error}")
+    assert error is None, error
+    slowest = ', '.join(f"{name} {ms:.0f} ms" for name, ms in imports[:3])
+    assert total <= budget, f"{total:.0f} ms of {budget:.0f} ms ({slowest})"
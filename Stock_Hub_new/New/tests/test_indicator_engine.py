@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.indicator_engine import TECHNICAL_INDICATORS, compute, compute_frame
+
+ta = pytest.importorskip('ta')
+
+
+# Ten years of synthetic daily bars: a random walk with intraday ranges and volumes
+def _ohlcv(rows=2520, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, rows)))
+    high = close * (1 + rng.uniform(0, 0.02, rows))
+    low = close * (1 - rng.uniform(0, 0.02, rows))
+    volume = rng.integers(100_000, 10_000_000, rows).astype('float64')
+    return pd.DataFrame({'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                        index=pd.bdate_range('2010-01-04', periods=rows, name='Date'))
+
+
+# The `ta` calls the indicators page made before the engine replaced them
+def _ta_reference(data):
+    close, high, low, volume = data['Close'], data['High'], data['Low'], data['Volume']
+    return {
+        "Moving average of 20": ta.trend.sma_indicator(close, window=20),
+        "Moving average of 50": ta.trend.sma_indicator(close, window=50),
+        "Standard deviation": ta.volatility.bollinger_mavg(close, window=20, fillna=True)
+                              - ta.volatility.bollinger_lband(close, window=20, window_dev=2, fillna=True),
+        "Relative Strength Index": ta.momentum.rsi(close, window=14),
+        "Moving average convergence divergence": ta.trend.macd(close),
+        "Average Directional Index": ta.trend.adx(high, low, close, window=14),
+        "Stochastic Oscillator (%K)": ta.momentum.stoch(high, low, close, window=14, smooth_window=3),
+        "Stochastic Oscillator (%D)": ta.momentum.stoch_signal(high, low, close, window=14, smooth_window=3),
+        "Bollinger Bands (bb_bbm)": ta.volatility.bollinger_mavg(close, window=20),
+        "Bollinger Bands (bb_bbh)": ta.volatility.bollinger_hband(close, window=20, window_dev=2),
+        "Bollinger Bands (bb_bbl)": ta.volatility.bollinger_lband(close, window=20, window_dev=2),
+        "Money Flow Index": ta.volume.money_flow_index(high, low, close, volume, window=14),
+    }
+
+
+@pytest.mark.parametrize('rows', [2520, 40])
+def test_engine_matches_ta(rows):
+    data = _ohlcv(rows)
+    results = compute_frame(data, TECHNICAL_INDICATORS)
+    for indicator, expected in _ta_reference(data).items():
+        # NaN positions (the warm-up) must match too, which assert_allclose checks by default
+        np.testing.assert_allclose(results[indicator], expected.to_numpy(dtype='float64'), rtol=1e-9, atol=1e-9,
+                                   err_msg=indicator)
+
+
+# On a (dates x tickers) matrix every column matches the indicator computed on that ticker alone
+def test_matrix_columns_match_single_series():
+    frames = [_ohlcv(600, seed) for seed in range(3)]
+    inputs = {name: np.column_stack([frame[column] for frame in frames])
+              for name, column in {'close': 'Close', 'high': 'High', 'low': 'Low', 'volume': 'Volume'}.items()}
+    matrix = compute(inputs, TECHNICAL_INDICATORS)
+    for position, frame in enumerate(frames):
+        single = compute_frame(frame, TECHNICAL_INDICATORS)
+        for indicator in TECHNICAL_INDICATORS:
+            np.testing.assert_allclose(matrix[indicator][:, position], single[indicator], rtol=1e-9, atol=1e-9,
+                                       err_msg=indicator)
+
+
+# With too few rows for ADX the error is returned for that indicator only
+def test_adx_on_short_series_returns_the_error():
+    results = compute_frame(_ohlcv(20), ["Average Directional Index", "Moving average of 20"])
+    assert isinstance(results["Average Directional Index"], ValueError)
+    assert np.isfinite(results["Moving average of 20"][-1])
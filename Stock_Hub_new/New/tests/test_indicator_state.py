@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.indicator_engine import TECHNICAL_INDICATORS, compute_frame
+from services.indicator_state import IndicatorState
+
+
+def _ohlcv(rows=300, seed=11):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, rows)))
+    return pd.DataFrame({'High': close * (1 + rng.uniform(0, 0.02, rows)), 'Low': close * (1 - rng.uniform(0, 0.02, rows)),
+                         'Close': close, 'Volume': rng.integers(100_000, 10_000_000, rows).astype('float64')},
+                        index=pd.bdate_range('2020-01-01', periods=rows, name='Date'))
+
+
+def _replay(data):
+    state = IndicatorState()
+    rows = [state.update(*bar) for bar in data[['High', 'Low', 'Close', 'Volume']].to_numpy()]
+    return pd.DataFrame(rows, index=data.index)
+
+
+# Bar by bar updates give the engine's values, also around missing prices: a gap only affects
+# the windows that contain it instead of every later value
+@pytest.mark.parametrize('missing', [None, ['Close'], ['High', 'Low', 'Close', 'Volume'], ['Volume']])
+def test_state_matches_engine_with_missing_values(missing):
+    data = _ohlcv()
+    if missing:
+        data.loc[data.index[100], missing] = np.nan
+    expected = compute_frame(data, TECHNICAL_INDICATORS)
+    replayed = _replay(data)
+    for indicator in TECHNICAL_INDICATORS:
+        np.testing.assert_allclose(replayed[indicator], expected[indicator], rtol=1e-7, atol=1e-7, err_msg=indicator)
+    if missing:
+        recovered = replayed.iloc[-1]
+        for indicator in ["Moving average of 20", "Bollinger Bands (bb_bbh)", "Relative Strength Index",
+                          "Moving average convergence divergence", "Stochastic Oscillator (%D)", "Money Flow Index"]:
+            assert np.isfinite(recovered[indicator]), indicator
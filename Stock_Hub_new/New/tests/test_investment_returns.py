@@ -0,0 +1,14 @@
+import numpy as np
+import pandas as pd
+
+from services.investment_returns import rolling_entry_returns
+
+PRICES = pd.DataFrame({'AAA': np.arange(1.0, 11.0)}, index=pd.date_range('2024-01-01', periods=10, name='Date'))
+
+
+# The holding end is exclusive: a period ending the day after the last price sells on the last price
+def test_rolling_entry_keeps_periods_ending_after_last_price():
+    table = rolling_entry_returns(PRICES, 'AAA', '2024-01-01', '2024-01-11', 100, hold_days=3)
+    assert list(table['Start Date']) == list(pd.date_range('2024-01-01', '2024-01-08'))
+    last = table.iloc[-1]
+    assert last['End Date'] == pd.Timestamp('2024-01-10') and last['Exit Price'] == 10.0
@@ -0,0 +1,54 @@
+import gc
+import json
+import os
+import weakref
+
+import pytest
+
+from services import model_registry
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'MODEL_DIR', str(tmp_path / 'models'))
+    monkeypatch.setattr(model_registry, '_loaded', model_registry.LRUCache(maxsize=model_registry.MAX_LOADED_MODELS))
+    monkeypatch.setattr(model_registry, '_meta_index', {})
+    return tmp_path / 'models'
+
+
+# Stand-in for a Keras model: an object caught in a reference cycle, like a model and its layers
+class FakeModel:
+    def __init__(self):
+        self.cycle = self
+
+
+def test_loaded_models_are_bounded_and_released(registry):
+    gc.disable()
+    try:
+        refs = []
+        for position in range(model_registry.MAX_LOADED_MODELS + 2):
+            model = FakeModel()
+            refs.append(weakref.ref(model))
+            model_registry._remember(f"key{position}", (model, None, {}))
+            del model
+        assert len(model_registry._loaded) == model_registry.MAX_LOADED_MODELS
+        # The least recently used models are gone from memory, without waiting for a GC pass
+        assert [ref() is None for ref in refs[:3]] == [True, True, False]
+    finally:
+        gc.enable()
+
+
+def test_find_base_reads_each_meta_once(registry, monkeypatch):
+    hyperparams = {'lookback': 60}
+    for end, rows in [('2024-01-02', 100), ('2024-01-09', 105), ('2023-06-01', 10)]:
+        os.makedirs(registry / end)
+        with open(registry / end / 'meta.json', 'w') as file:
+            json.dump({'ticker': 'AAA', 'start': '2020-01-01', 'end': end, 'hyperparams': hyperparams, 'rows': rows}, file)
+
+    reads = []
+    original_load = json.load
+    monkeypatch.setattr(json, 'load', lambda file: reads.append(file.name) or original_load(file))
+    for _ in range(3):
+        key, meta = model_registry._find_base('AAA', '2020-01-01', '2024-01-16', hyperparams, 110)
+        assert key == '2024-01-09' and meta['rows'] == 105
+    assert len(reads) == 3
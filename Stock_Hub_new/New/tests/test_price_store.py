@@ -0,0 +1,119 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from services import price_store
+from services.price_store import OHLCV_COLUMNS, get_price_history, get_price_matrix
+
+START, END = date(2020, 1, 1), date(2020, 7, 1)
+
+
+# Local stand-in for download_group: every request costs `latency` seconds, however many tickers it asks for.
+# Tickers in `failing` get an error instead of bars, and tickers in `dropped` are left out of the result.
+class FakeDownloader:
+    def __init__(self, latency, failing=(), dropped=()):
+        self.latency = latency
+        self.failing = set(failing)
+        self.dropped = set(dropped)
+        self.requests = []
+
+    def __call__(self, tickers, start, end):
+        self.requests.append(list(tickers))
+        time.sleep(self.latency)
+        index = pd.bdate_range(start, end - timedelta(days=1), name='Date')
+        frames = {ticker: pd.DataFrame({column: np.arange(1.0, len(index) + 1) + position for column in OHLCV_COLUMNS},
+                                       index=index)
+                  for position, ticker in enumerate(tickers) if ticker not in self.dropped}
+        errors = {ticker: 'rate limited' for ticker in tickers if ticker in self.failing}
+        for ticker in errors:
+            frames[ticker] = frames[ticker].iloc[:0]
+        return frames, errors
+
+
+def _timed_matrix(tickers, downloader):
+    started = time.perf_counter()
+    matrix = get_price_matrix(tickers, START, END, downloader=downloader)
+    return matrix, time.perf_counter() - started
+
+
+def test_time_scales_with_requests_not_tickers(price_dir):
+    few, many = FakeDownloader(0.3), FakeDownloader(0.3)
+    _, few_time = _timed_matrix([f"T{i}" for i in range(2)], few)
+    matrix, many_time = _timed_matrix([f"M{i}" for i in range(40)], many)
+
+    # Both fetches are one grouped request, so 20 times the tickers takes about the same time
+    assert len(few.requests) == len(many.requests) == 1
+    assert many_time < few_time + 0.3
+    assert matrix.shape == (len(pd.bdate_range(START, END - timedelta(days=1))), 40)
+    assert not matrix.isna().any().any()
+
+
+def test_time_scales_with_batches(price_dir):
+    # Tickers missing different date ranges go in different requests, which run concurrently
+    get_price_matrix(['A'], START, date(2020, 4, 1), downloader=FakeDownloader(0))
+    downloader = FakeDownloader(0.3)
+    _, elapsed = _timed_matrix(['A', 'B', 'C'], downloader)
+    assert sorted(map(sorted, downloader.requests)) == [['A'], ['B', 'C']]
+    assert elapsed < 2 * 0.3
+
+    # Stored prices are not requested again
+    repeat = FakeDownloader(0.3)
+    _timed_matrix(['A', 'B', 'C'], repeat)
+    assert repeat.requests == []
+
+
+def test_yfinance_downloads_never_overlap(price_dir, monkeypatch):
+    import yfinance
+
+    running, overlaps = [0], []
+    lock = threading.Lock()
+
+    def fake_download(tickers, start, end, **kwargs):
+        assert kwargs['auto_adjust'] is False
+        with lock:
+            running[0] += 1
+            overlaps.append(running[0] > 1)
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        index = pd.bdate_range(start, end - timedelta(days=1), name='Date')
+        # Like yfinance 0.2: flat columns for one ticker, (ticker, field) columns for a group
+        columns = OHLCV_COLUMNS if isinstance(tickers, str) else pd.MultiIndex.from_product([tickers, OHLCV_COLUMNS])
+        return pd.DataFrame(1.0, index=index, columns=columns)
+
+    monkeypatch.setattr(yfinance, 'download', fake_download)
+    get_price_matrix(['A'], START, date(2020, 2, 1), downloader=FakeDownloader(0))
+    get_price_matrix(['B'], START, date(2020, 3, 1), downloader=FakeDownloader(0))
+    matrix = get_price_matrix(['A', 'B', 'C', 'D'], START, END)
+
+    assert not any(overlaps)
+    assert not matrix.isna().all().any()
+
+
+# A failed or missing ticker is reported, stays uncovered and is requested again on the next call
+def test_failed_tickers_are_reported_and_refetched(price_dir):
+    matrix = get_price_matrix(['A', 'B', 'C'], START, END, downloader=FakeDownloader(0, failing=['B'], dropped=['C']))
+    assert matrix.attrs['failed'] == {'B': 'rate limited', 'C': 'no data returned'}
+    assert matrix['B'].isna().all() and matrix['C'].isna().all() and matrix['A'].notna().all()
+
+    retry = FakeDownloader(0)
+    matrix = get_price_matrix(['A', 'B', 'C'], START, END, downloader=retry)
+    assert retry.requests == [['B', 'C']]
+    assert matrix.attrs['failed'] == {} and not matrix.isna().any().any()
+
+
+# A short range whose request failed is not recorded as "no trading days"
+def test_failed_short_range_is_not_covered(price_dir, monkeypatch):
+    calls = []
+
+    def failing_fetch(tickers, start, end):
+        calls.append((start, end))
+        return {ticker: price_store._empty_frame() for ticker in tickers}, {ticker: 'rate limited' for ticker in tickers}
+
+    monkeypatch.setattr(price_store, 'fetch_group', failing_fetch)
+    assert get_price_history('A', date(2020, 1, 6), date(2020, 1, 9)).empty
+    assert get_price_history('A', date(2020, 1, 6), date(2020, 1, 9)).empty
+    assert calls == [(date(2020, 1, 6), date(2020, 1, 9))] * 2
@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from services import precompute_indicators, price_store, screener
+from services.precompute_indicators import plan_shards, run_shard
+from services.screener import SCREEN_LOOKBACK_DAYS, load_universe, screen
+
+TICKERS = ['AAA', 'BBB', 'CCC', 'DDD']
+END = date(2021, 6, 1)
+CONDITIONS = [("Relative Strength Index", "<", 60.0), ("Close", ">", "Moving average of 50")]
+
+
+# Random-walk bars for any tickers and dates, in download_group's return format
+def random_downloader(tickers, start, end):
+    index = pd.bdate_range(start, end - timedelta(days=1), name='Date')
+    frames = {}
+    for ticker in tickers:
+        rng = np.random.default_rng(sum(map(ord, ticker)))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))
+        frames[ticker] = pd.DataFrame({'Open': close, 'High': close * 1.01, 'Low': close * 0.99, 'Close': close,
+                                       'Adj Close': close * 0.98, 'Volume': rng.integers(1e5, 1e6, len(index))},
+                                      index=index).astype('float64')
+    return frames, {}
+
+
+# Workers only read the store: a shard for tickers that were never downloaded has no rows and downloads nothing
+def test_run_shard_reads_only_the_store(price_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, 'fetch_group', lambda *args: (_ for _ in ()).throw(AssertionError('download')))
+    (tmp_path / 'run').mkdir()
+    result = run_shard(0, ['AAA'], END - timedelta(days=100), END, str(tmp_path / 'run'))
+    assert result['rows'] == 0 and result['errors'] == {'AAA': 'no price history'}
+
+
+# A finished snapshot for the as-of date gives the same screen as computing from the prices
+def test_screen_reads_a_fresh_snapshot(price_dir, tmp_path, monkeypatch):
+    start = END - timedelta(days=SCREEN_LOOKBACK_DAYS)
+    price_store.get_price_matrix(TICKERS, start, END, downloader=random_downloader)
+    computed = screen(load_universe(TICKERS, END, use_snapshot=False), CONDITIONS, "Relative Strength Index")
+
+    output = tmp_path / 'snapshots'
+    monkeypatch.setattr(screener, 'read_snapshot', partial(precompute_indicators.read_snapshot, output=str(output)))
+    monkeypatch.setattr(screener, 'snapshot_coverage', partial(precompute_indicators.snapshot_coverage, output=str(output)))
+    run_dir = precompute_indicators._run_dir(str(output), END.isoformat())
+    manifest = plan_shards(run_dir, TICKERS, 3, start.isoformat())
+    # Only one of two shards written: the run is not finished and the screen computes from prices
+    run_shard(0, manifest['shards'][0], start, END, run_dir)
+    assert load_universe(TICKERS, END)['source'] == 'prices'
+    run_shard(1, manifest['shards'][1], start, END, run_dir)
+
+    universe = load_universe(TICKERS, END)
+    assert universe['source'] == 'snapshot' and universe['tickers'] == TICKERS
+    from_snapshot = screen(universe, CONDITIONS, "Relative Strength Index")
+    pd.testing.assert_frame_equal(from_snapshot, computed, check_names=False)
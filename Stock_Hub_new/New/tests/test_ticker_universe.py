@@ -0,0 +1,26 @@
+from services.ticker_universe import TickerUniverse
+
+METADATA = {
+    'AAPL': {'name': 'Apple Inc.'},
+    'AAL': {'name': 'American Airlines Group Inc.'},
+    'APA': {'name': 'APA Corporation'},
+    'AMZN': {'name': 'Amazon.com, Inc.'},
+    'MSFT': {'name': 'Microsoft Corporation'},
+}
+UNIVERSE = TickerUniverse(list(METADATA), METADATA)
+
+
+# An exact symbol lists only what matches it, not close symbols, even with a large limit
+def test_exact_query_has_no_fuzzy_matches():
+    assert UNIVERSE.search('AAPL', limit=len(METADATA)) == ['AAPL']
+
+
+def test_prefix_and_name_matches():
+    assert UNIVERSE.search('AA', limit=len(METADATA)) == ['AAL', 'AAPL']
+    assert UNIVERSE.search('micro', limit=len(METADATA)) == ['MSFT']
+
+
+# Misspelt queries with no exact or prefix match still find close symbols and names
+def test_typos_fall_back_to_close_matches():
+    assert 'AAPL' in UNIVERSE.search('APPL')
+    assert UNIVERSE.search('amazn') == ['AMZN']